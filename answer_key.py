@@ -0,0 +1,129 @@
+from sheet_keys import SheetKeys
+
+# the three answers of a game, each followed by a blank column
+ANSWER_COLUMNS = (3, 5, 7)
+
+
+class AnswerKey():
+    """A snapshot of the answer key worksheet (sheet 1 of the leaderboard book).
+
+    The whole sheet is read once with get_all_values and every lookup is answered from memory,
+    indexed by game id (GM1, GM2...). Cells we update are written to google drive and into the
+    snapshot so later lookups in the same cycle see them.
+    """
+
+    worksheet = None
+    lines = None
+
+    def __init__(self, worksheet, lines):
+        self.worksheet = worksheet
+        self.lines = lines
+        self._rows = {}
+
+        # first matching line wins, same as scanning the sheet top down
+        for x in range(len(lines)):
+            game_id = lines[x][0] if lines[x] else ""
+            if game_id and game_id not in self._rows:
+                self._rows[game_id] = x + 1
+
+    def _get_cell(self, row, column):
+        """returns the value at row/column (both starting at 1) or "" if the sheet doesn't go that far"""
+        if row > len(self.lines):
+            return ""
+        line = self.lines[row - 1]
+        return line[column - 1] if column <= len(line) else ""
+
+    def _set_cell(self, row, column, value):
+        """writes value to google drive and into the snapshot"""
+        self.worksheet.update_cell(row, column, value)
+
+        line = self.lines[row - 1]
+        while len(line) < column:
+            line.append("")
+        line[column - 1] = value
+
+    def get_row(self, game_id):
+        """returns the row number of game_id in the answer key or None if it isn't there"""
+        return self._rows.get(game_id)
+
+    def get_start_time(self, game_id):
+        """returns the start time written for game_id or None if the game isn't in the answer key"""
+        row = self.get_row(game_id)
+        if not row:
+            return None
+        return self._get_cell(row, SheetKeys.START_TIME_COLUMN.value)
+
+    def is_ready(self, game_id):
+        """checks if an admin has marked game_id as ready to be scored"""
+        row = self.get_row(game_id)
+        return bool(row) and self._get_cell(row, SheetKeys.READY_COLUMN.value).lower() == "yes"
+
+    def is_written(self, game_id):
+        """checks if game_id has already been added to the leaderboard"""
+        row = self.get_row(game_id)
+        return (bool(row) and
+                self._get_cell(row, SheetKeys.LEADERBOARD_ADDED_COLUMN.value).lower() == SheetKeys.LEADER_WRITTEN_SUCCESS.value)
+
+    def get_title_override(self, game_number):
+        """returns the thread title an admin has written for game number game_number or None
+        if there isn't one. Game X lives on row X + 1, under the header.
+        """
+        title = self._get_cell(int(game_number) + 1, SheetKeys.TITLE_COLUMN.value)
+        return title if title != "" else None
+
+    def get_game_list(self):
+        """returns a list of [game id, ready] pairs for every game in the answer key"""
+        return [[line[0], self._get_cell(x + 1, SheetKeys.READY_COLUMN.value).title()]
+                for x, line in enumerate(self.lines)
+                if x > 0 and line and line[0] != ""]
+
+    def get_unwritten_games(self):
+        """returns the games that are ready to be scored but haven't been written to the
+        leaderboard yet, along with the row to mark once they are.
+        """
+        unwritten_games = []
+        for game_id, row in sorted(self._rows.items(), key=lambda x: x[1]):
+            if row > 1 and self.is_ready(game_id) and not self.is_written(game_id):
+                unwritten_games.append({'game': self.lines[row - 1], 'row': row})
+        return unwritten_games
+
+    def get_written_games(self):
+        """returns the id of every game that has been added to the leaderboard"""
+        return [game_id for game_id, row in sorted(self._rows.items(), key=lambda x: x[1])
+                if row > 1 and self.is_written(game_id)]
+
+    def get_provisional_game(self):
+        """returns the newest game that has answers filled in but isn't marked ready yet, along
+        with its row, or None if the newest game with answers is already ready or written.
+        """
+        for game_id, row in sorted(self._rows.items(), key=lambda x: -x[1]):
+            if row > 1 and any(self._get_cell(row, column).strip() for column in ANSWER_COLUMNS):
+                if self.is_ready(game_id) or self.is_written(game_id):
+                    return None
+                return {'game': self.lines[row - 1], 'row': row}
+        return None
+
+    def get_game_result(self, game_id):
+        """returns the answer key headers and the line for game_id, minus the trigger columns
+        at the end of the sheet. 'result' is empty if the game isn't in the answer key.
+        """
+        results = {'title': [], 'result': []}
+        if not self.lines:
+            return results
+
+        # add title bar minus that last 3 elements (since those are the trigger for file running) but add points column.
+        results['title'] = self.lines[0][:-3] + ["Points", "Ramblings"]
+
+        row = self.get_row(game_id)
+        if row:
+            results['result'] = self.lines[row - 1][:-3]
+        return results
+
+    def set_start_time(self, game_id, start_time):
+        """overwrites the start time of game_id"""
+        self._set_cell(self.get_row(game_id), SheetKeys.START_TIME_COLUMN.value, start_time)
+
+    def mark_written(self, rows):
+        """marks every row in rows as added to the leaderboard"""
+        for row in rows:
+            self._set_cell(row, SheetKeys.LEADERBOARD_ADDED_COLUMN.value, SheetKeys.LEADER_WRITTEN_SUCCESS.value)
@@ -0,0 +1,292 @@
+"""Accounting for every call we make to an outside API.
+
+Calls are counted where they leave the process: the gspread HTTP session, the authorized
+http connection behind the drive discovery service, the NHL statsapi fetch in
+ScheduleCache and the requestor praw sends everything through. Each call is recorded with the
+API, the method of ours that made it, latency, response bytes and the class of error it raised,
+and totalled per polling cycle. At the end of a cycle the totals, along with how often the
+shared connection pools reused a connection, are logged and written to a Prometheus text file
+for node_exporter's textfile collector.
+
+Nothing is wrapped unless metrics.enable() has been called, so it costs nothing when it's off.
+"""
+import logging
+import os
+import sys
+import threading
+from time import perf_counter, time
+
+# per program, like the outbox files
+METRICS_FILE = 'api_metrics_%s.prom'
+# frames in these modules are never reported as the caller
+SKIP_MODULES = ('api_metrics', 'http_transport', 'gspread', 'googleapiclient', 'apiclient', 'httplib2', 'oauth2client',
+                'requests', 'urllib3', 'urllib', 'http', 'praw', 'prawcore', 'threading', 'concurrent')
+
+log = logging.getLogger("api_metrics")
+
+
+def _get_caller():
+    """returns module.function of the first public function of ours on the stack. Private helpers
+    (like DriveManager._open_worksheet) are skipped so the cost lands on the method that needed it.
+    """
+    frame = sys._getframe(2)
+    fallback = None
+
+    while frame:
+        module = frame.f_globals.get('__name__', '')
+        if not module.split('.')[0] in SKIP_MODULES:
+            name = frame.f_code.co_name
+            owner = frame.f_locals.get('self')
+            label = "%s.%s" % (type(owner).__name__ if owner is not None else module, name)
+            if fallback is None:
+                fallback = label
+            if not name.startswith('_') and name != '<lambda>':
+                return label
+        frame = frame.f_back
+
+    return fallback or "unknown"
+
+
+class _Track():
+    """times one call and records it when the with block ends"""
+
+    def __init__(self, metrics, api, method, caller):
+        self.metrics = metrics
+        self.api = api
+        self.method = method
+        self.caller = caller
+        self.bytes = 0
+        self.error = None
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        error = self.error or (exc_type.__name__ if exc_type else None)
+        self.metrics.record(self.api, self.method, self.caller, perf_counter() - self.start, self.bytes, error)
+        return False
+
+
+class _NoTrack():
+    bytes = 0
+    error = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NO_TRACK = _NoTrack()
+
+
+class ApiMetrics():
+    """Per cycle totals of every outside API call, keyed by (api, caller, method)"""
+
+    enabled = False
+    metrics_file = None
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.cycle_start = time()
+
+    def enable(self, metrics_file=None):
+        """turns accounting on. metrics_file is where the Prometheus text file is written, None to only log"""
+        self.enabled = True
+        self.metrics_file = metrics_file
+
+    def track(self, api, method):
+        """context manager that records the call made inside it. Set .bytes and .error on it if known"""
+        if not self.enabled:
+            return _NO_TRACK
+        return _Track(self, api, method, _get_caller())
+
+    def record(self, api, method, caller, latency, num_bytes=0, error=None):
+        key = (api, caller, method)
+        with self.lock:
+            stats = self.calls.get(key)
+            if stats is None:
+                stats = self.calls[key] = {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'bytes': 0, 'errors': {}}
+            stats['calls'] += 1
+            stats['seconds'] += latency
+            stats['max_seconds'] = max(stats['max_seconds'], latency)
+            stats['bytes'] += num_bytes or 0
+            if error:
+                stats['errors'][error] = stats['errors'].get(error, 0) + 1
+
+    def instrument_gspread(self, gc):
+        """counts every request a gspread client sends"""
+        if not self.enabled:
+            return gc
+
+        session = gc.session
+        request = session.request
+
+        def tracked_request(method, url, *args, **kwargs):
+            with self.track("gspread", "%s %s" % (method, _feed_name(url))) as call:
+                response = request(method, url, *args, **kwargs)
+                call.bytes = len(response.content or b"")
+                return response
+
+        session.request = tracked_request
+        return gc
+
+    def instrument_http(self, http, api="drive"):
+        """counts every request made through an (authorized) httplib2.Http, like the one behind
+        the drive discovery service
+        """
+        if not self.enabled:
+            return http
+
+        request = http.request
+
+        def tracked_request(uri, method="GET", *args, **kwargs):
+            with self.track(api, "%s %s" % (method, _feed_name(uri))) as call:
+                response, content = request(uri, method, *args, **kwargs)
+                call.bytes = len(content or b"")
+                if int(response.status) >= 400:
+                    call.error = "HTTP %s" % response.status
+                return response, content
+
+        http.request = tracked_request
+        return http
+
+    def instrument_praw(self, reddit):
+        """counts every request praw sends to reddit"""
+        if not self.enabled:
+            return reddit
+
+        try:
+            requestor = reddit._core._authorizer._authenticator._requestor
+        except AttributeError:
+            log.error("Unable to find praw's requestor, reddit calls won't be counted")
+            return reddit
+
+        request = requestor.request
+
+        def tracked_request(method, url, *args, **kwargs):
+            with self.track("reddit", "%s %s" % (method, _feed_name(url))) as call:
+                response = request(method, url, *args, **kwargs)
+                call.bytes = len(response.content or b"")
+                if response.status_code >= 400:
+                    call.error = "HTTP %s" % response.status_code
+                return response
+
+        requestor.request = tracked_request
+        return reddit
+
+    def start_cycle(self):
+        """throws away anything recorded so far and starts a new cycle"""
+        with self.lock:
+            self.calls = {}
+            self.cycle_start = time()
+
+    def end_cycle(self):
+        """logs the totals of this cycle, writes them to the metrics file and starts a new cycle.
+        Returns the totals
+        """
+        if not self.enabled:
+            return {}
+
+        with self.lock:
+            calls = self.calls
+            cycle_start = self.cycle_start
+            self.calls = {}
+            self.cycle_start = time()
+
+        # imported here so importing api_metrics (the poster does on every run) doesn't load requests
+        from http_transport import transport
+        pools = transport.get_pool_stats()
+        self._log_summary(calls, time() - cycle_start)
+        self._log_pools(pools)
+        if self.metrics_file:
+            self._write_prometheus(calls, cycle_start, pools)
+        return calls
+
+    def _log_summary(self, calls, duration):
+        total = sum(stats['calls'] for stats in calls.values())
+        seconds = sum(stats['seconds'] for stats in calls.values())
+        num_bytes = sum(stats['bytes'] for stats in calls.values())
+        errors = sum(sum(stats['errors'].values()) for stats in calls.values())
+
+        log.info("API calls this cycle: %s calls, %.2fs waiting, %s bytes, %s errors in a %.1fs cycle" %
+                 (total, seconds, num_bytes, errors, duration))
+        for (api, caller, method), stats in sorted(calls.items(), key=lambda x: -x[1]['seconds']):
+            log.info("    %-8s %-45s %-20s %4s calls %7.3fs (max %.3fs) %9s bytes%s" %
+                     (api, caller, method, stats['calls'], stats['seconds'], stats['max_seconds'], stats['bytes'],
+                      " errors %s" % stats['errors'] if stats['errors'] else ""))
+
+    def _log_pools(self, pools):
+        num_requests = sum(stats['requests'] for stats in pools.values())
+        reused = sum(stats['reused'] for stats in pools.values())
+        log.info("Connections this cycle: %s requests, %s new connections, %.0f%% reused" %
+                 (num_requests, num_requests - reused, 100.0 * reused / num_requests if num_requests else 0))
+        for host, stats in sorted(pools.items()):
+            log.info("    %-40s %4s requests %4s new connections %3s open sockets" %
+                     (host, stats['requests'], stats['connections'], stats['open_sockets']))
+
+    def _write_prometheus(self, calls, cycle_start, pools=None):
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append("# HELP %s %s" % (name, help_text))
+            lines.append("# TYPE %s %s" % (name, kind))
+            for labels, value in samples:
+                label_text = ",".join('%s="%s"' % (key, _escape(val)) for key, val in labels)
+                lines.append("%s{%s} %s" % (name, label_text, value) if label_text else "%s %s" % (name, value))
+
+        def labels(key):
+            return [('api', key[0]), ('caller', key[1]), ('method', key[2])]
+
+        metric("gwg_api_cycle_calls", "gauge", "API calls made in the last polling cycle",
+               [(labels(key), stats['calls']) for key, stats in sorted(calls.items())])
+        metric("gwg_api_cycle_seconds", "gauge", "Seconds spent waiting on API calls in the last polling cycle",
+               [(labels(key), "%.6f" % stats['seconds']) for key, stats in sorted(calls.items())])
+        metric("gwg_api_cycle_max_seconds", "gauge", "Slowest API call in the last polling cycle",
+               [(labels(key), "%.6f" % stats['max_seconds']) for key, stats in sorted(calls.items())])
+        metric("gwg_api_cycle_bytes", "gauge", "Response bytes received in the last polling cycle",
+               [(labels(key), stats['bytes']) for key, stats in sorted(calls.items())])
+        metric("gwg_api_cycle_errors", "gauge", "API calls that failed in the last polling cycle",
+               [(labels(key) + [('error', error)], count)
+                for key, stats in sorted(calls.items()) for error, count in sorted(stats['errors'].items())])
+        pools = pools or {}
+        metric("gwg_http_pool_cycle_requests", "gauge", "Requests sent through the shared connection pools in the last polling cycle",
+               [([('host', host)], stats['requests']) for host, stats in sorted(pools.items())])
+        metric("gwg_http_pool_cycle_new_connections", "gauge", "Connections (TLS handshakes) opened in the last polling cycle",
+               [([('host', host)], stats['connections']) for host, stats in sorted(pools.items())])
+        metric("gwg_http_pool_cycle_reuse_ratio", "gauge", "Share of requests in the last polling cycle that reused a connection",
+               [([('host', host)], "%.3f" % (float(stats['reused']) / stats['requests']))
+                for host, stats in sorted(pools.items()) if stats['requests']])
+        metric("gwg_http_pool_open_sockets", "gauge", "Idle keep-alive sockets held by the pool at the end of the cycle",
+               [([('host', host)], stats['open_sockets']) for host, stats in sorted(pools.items())])
+        metric("gwg_api_cycle_start_timestamp_seconds", "gauge", "When the last polling cycle started",
+               [([], "%.3f" % cycle_start)])
+
+        try:
+            temp_file = self.metrics_file + ".tmp"
+            with open(temp_file, "w") as metrics_data:
+                metrics_data.write("\n".join(lines) + "\n")
+            # node_exporter must never see a half written file
+            os.replace(temp_file, self.metrics_file)
+
+        except IOError as error:
+            log.error("Unable to write api metrics to %s: %s" % (self.metrics_file, error))
+
+
+def _feed_name(url):
+    """a short, low cardinality name for a request url, the first two words of its path. Eg.
+    /feeds/cells/<key>/od6/private/full is feeds/cells
+    """
+    path = str(url).split("?")[0].split("://")[-1]
+    parts = [part for part in path.split("/")[1:] if part]
+    words = [part for part in parts if part.isalpha() and not (len(part) > 20)]
+    return "/".join(words[:2]) or "/"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = ApiMetrics()
@@ -0,0 +1,231 @@
+"""Micro benchmarks for the scoring and ranking code.
+
+Builds synthetic response sheets and standings for 1k, 10k and 100k users, times each hot path
+on its own against the in-memory gspread stand-in in mocks/ and writes the results to a JSON
+file so runs from different commits can be compared.
+
+    python benchmarks.py
+    python benchmarks.py --sizes 1000 10000 --repeat 5 --output before.json
+    python benchmarks.py --compare before.json
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+from datetime import datetime as dt
+from statistics import median
+from time import perf_counter
+
+sys.path.insert(0, './mocks')
+
+import scoring
+from drive_manager import DriveManager
+from gwg_leader_updater import GWGLeaderUpdater
+from standings_index import StandingsIndex
+
+from mock_gspread import MockGspreadClient
+from mock_secret_manager import MockSecretManager
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_OUTPUT = "bench_output.json"
+# a benchmark this much slower than the one it's compared with is reported as a regression
+REGRESSION_RATIO = 1.2
+
+PLAYERS = ["Scheifele", "Laine", "Wheeler", "Ehlers", "Connor", "Little", "Byfuglien", "Trouba", "Myers", "none"]
+ANSWER_LINE = ["GM5", "2018/10/05 19:00", "Laine, scheifele", "", "Wheeler", "", "Yes,No", "", "yes", "yes", ""]
+
+
+class BenchDriveManager():
+    """the few DriveManager calls create_game_history makes, answered from memory"""
+
+    def __init__(self, result):
+        self.result = result
+
+    def get_drive_filetype(self, filetype):
+        return {'id': 'leaderboard'}
+
+    def get_all_books_sheets(self, bookid):
+        return ["Leaderboard", "Answer Key"]
+
+    def get_games_result(self, game_id):
+        return self.result
+
+    def convert_rank(self, rank):
+        return int(str(rank).replace("T", ""))
+
+
+def make_response_rows(num_users, rand):
+    """rows of a google form response sheet: timestamp, username and the three answers"""
+    rows = []
+    for x in range(num_users):
+        minute = rand.randint(0, 89)
+        rows.append(["05/10/2018 %s:%02d:%02d" % (18 + minute // 60, minute % 60, rand.randint(0, 59)),
+                     "user%s" % x,
+                     rand.choice(PLAYERS),
+                     rand.choice(PLAYERS),
+                     rand.choice(["Yes", "No"]),
+                     ""])
+    return rows
+
+
+def make_standings(num_users, rand):
+    """standings like the ones add_user_rankings returns"""
+    data = {"user%s" % x: {'curr': rand.randint(0, 60), 'played': rand.randint(1, 30),
+                           'last': rand.randint(0, 3), 'last_rank': 0}
+            for x in range(num_users)}
+    return data
+
+
+def make_game_points(num_users, rand):
+    """points for a game played by about half the users"""
+    return {"user%s" % x: rand.randint(0, 3) for x in range(num_users) if rand.random() < 0.5}
+
+
+def make_game_sheet(gc, num_users, rand):
+    """a leaderboard book with a scored game sheet laid out like create_new_sheet writes it"""
+    book = gc.add_book('leaderboard')
+    book.add_sheet("Leaderboard")
+    book.add_sheet("Answer Key")
+
+    rows = [[], ["", "Date", "username"], ["", "2018/10/05 19:00", ""], []]
+    for x in range(num_users):
+        minute = rand.randint(0, 89)
+        rows.append(["", "2018/10/05 %s:%02d" % (18 + minute // 60, minute % 60), " User%s " % x,
+                     "", "", "", "", "", str(rand.randint(0, 3)), ""])
+    book.add_sheet("GM5", rows)
+
+
+def time_call(func, repeat, number=1):
+    """runs func number times, repeat times over, and returns the per call times in seconds"""
+    times = []
+    for x in range(repeat):
+        start = perf_counter()
+        for y in range(number):
+            func()
+        times.append((perf_counter() - start) / number)
+    return times
+
+
+def run_benchmarks(sizes, repeat):
+    gwg_args = lambda: None
+    gwg_args.test = True
+
+    updater = GWGLeaderUpdater(BenchDriveManager(None), MockSecretManager(), gwg_args)
+    answers = updater.get_gwg_answers(ANSWER_LINE)
+    game_time = dt.strptime(ANSWER_LINE[1], "%Y/%m/%d %H:%M")
+    results = []
+
+    def record(name, size, times, number=1):
+        results.append({'name': name, 'size': size, 'number': number, 'repeat': len(times),
+                        'min': min(times), 'median': median(times)})
+        print("%-40s %7s %.6fs" % (name, size, min(times)))
+
+    record("get_gwg_answers", 1, time_call(lambda: updater.get_gwg_answers(ANSWER_LINE), repeat, number=1000), 1000)
+
+    for size in sizes:
+        rand = random.Random(size)
+
+        # scoring
+        rows = make_response_rows(size, rand)
+        record("get_players_points", size,
+               time_call(lambda: [updater.get_players_points(row, answers) for row in rows], repeat))
+        record("scoring.score_entries", size,
+               time_call(lambda: scoring.score_entries([row[0] for row in rows],
+                                                       [[row[2 + x] for row in rows] for x in range(3)],
+                                                       answers, game_time), repeat))
+
+        game_result = {'title': ["Game", "Date", "GWG", "", "Q2", "", "Q3", "", "Points", "Ramblings"],
+                       'result': ANSWER_LINE[:-3]}
+        updater.gdrive = BenchDriveManager(game_result)
+        game = {'name': "GM5", 'data': [["Timestamp", "Username", "GWG", "Q2", "Q3", "CQC"]] + rows}
+        record("create_game_history", size, time_call(lambda: updater.create_game_history(game), repeat))
+
+        # ranking
+        standings = make_standings(size, rand)
+        record("add_user_rankings", size, time_call(lambda: updater.add_user_rankings(standings), repeat))
+
+        leaders = updater.add_user_rankings(standings)
+        points = make_game_points(size, rand)
+        record("add_new_user_points", size,
+               time_call(lambda: updater.add_new_user_points(dict(points), dict(leaders)), repeat))
+
+        index_times = []
+        for x in range(repeat):
+            index = StandingsIndex(leaders)
+            index_times += time_call(lambda: index.apply_game(points), 1)
+        record("StandingsIndex.apply_game", size, index_times)
+
+        # sheet reads against the in-memory gspread
+        gc = MockGspreadClient()
+        make_game_sheet(gc, size, rand)
+        gdrive = DriveManager(MockSecretManager(), team="-1", update=False)
+        gdrive.gc = gc
+        record("_get_valid_player_entries", size,
+               time_call(lambda: (gdrive.clear_handle_cache(), gdrive._get_valid_player_entries('leaderboard', 2)), repeat))
+
+    return results
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, previous_file):
+    """prints how every benchmark changed against a previous results file. Returns the regressions"""
+    with open(previous_file) as json_data:
+        previous = json.load(json_data)
+
+    before = {(result['name'], result['size']): result['min'] for result in previous['results']}
+    regressions = []
+
+    print("\nCompared with %s (commit %s)" % (previous_file, previous.get('commit')))
+    for result in results:
+        old = before.get((result['name'], result['size']))
+        if not old:
+            continue
+        ratio = result['min'] / old
+        flag = ""
+        if ratio > REGRESSION_RATIO:
+            flag = "  REGRESSION"
+            regressions.append(result)
+        print("%-40s %7s %.2fx%s" % (result['name'], result['size'], ratio, flag))
+
+    return regressions
+
+
+def parse_args():
+    """Handle arguments"""
+
+    parser = argparse.ArgumentParser(description="Times the scoring and ranking code")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='number of users to benchmark with')
+    parser.add_argument('--repeat', type=int, default=3, help='times to run every benchmark, the fastest is reported')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='JSON file to write the results to')
+    parser.add_argument('--compare', default=None, help='results file from an earlier run to compare with')
+
+    return parser.parse_args()
+
+
+def main():
+    bench_args = parse_args()
+
+    results = run_benchmarks(bench_args.sizes, bench_args.repeat)
+    output = {'commit': get_commit(),
+              'time': dt.now().isoformat(),
+              'python': platform.python_version(),
+              'numpy': scoring.np is not None,
+              'results': results}
+
+    with open(bench_args.output, "w") as json_data:
+        json.dump(output, json_data, indent=2)
+    print("\nWrote %s" % bench_args.output)
+
+    if bench_args.compare and compare(results, bench_args.compare):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -3,15 +3,12 @@ from __future__ import print_function
 import os
 import sys
 import json
-import httplib2
+import threading
 import traceback
 import logging
-from datetime import datetime as dt
-from dateutil import tz
+from time import time
+from datetime import datetime, timedelta
 import dateutil.parser
-from time import sleep
-from enum import Enum
-from urllib.request import urlopen
 
 sys.path.insert(0, "./gspread")
 import gspread
@@ -21,6 +18,15 @@ from oauth2client import client
 from oauth2client import tools
 from oauth2client.file import Storage
 
+from answer_key import AnswerKey
+from entry_table import EntryTable, RESULT_TIME_FORMAT, get_timezone, parse_epoch
+from api_metrics import metrics
+from http_transport import transport
+from response_cache import ResponseCache, RESPONSE_CACHE_FILE, hash_row, hash_rows, trim_row
+from request_scheduler import SheetsError, sheets_requests, drive_requests
+from schedule_cache import ScheduleCache
+from sheet_keys import SheetKeys
+
 # If modifying these scopes, delete your previously saved credentials
 # at ~/.credentials/drive-python-quickstart.json
 SCOPES = 'https://www.googleapis.com/auth/drive'
@@ -34,22 +40,189 @@ try:
 except ImportError:
     flags = None
 
-# Special google drive keys for certain columns or expected phrases
-class SheetKeys(Enum):
-    ANSWERKEY_SHEET = 1
-    DATE_COLUMN = 1
-    READY_COLUMN = 8
-    LEADERBOARD_ADDED_COLUMN = 9
-    LEADER_WRITTEN_SUCCESS = "yes"
-    RESULT_USERNAME = 3
-    RESULT_POINTS = 9
-    RESULT_DATETIME = 2
+# the only drive file fields we read. Asking for just these keeps the listing responses small.
+DRIVE_FILE_FIELDS = "id, title, mimeType, createdDate, alternateLink, embedLink"
+DRIVE_PAGE_SIZE = 1000
+DRIVE_CHANGE_FIELDS = ("nextPageToken, newStartPageToken, "
+                       "items(fileId, deleted, file(%s, parents(id), labels(trashed)))" % DRIVE_FILE_FIELDS)
+# saved change token and file catalog for a team, so restarts can keep polling incrementally
+DRIVE_CHANGES_FILE = 'drive_changes_%s.json'
+# new response rows are read this many at a time, form response sheets come with lots of blank rows
+RESPONSE_CHUNK_ROWS = 200
+# google caps batch requests at 100 calls
+DRIVE_BATCH_SIZE = 100
+
+# how overwrite_leaderboard sends the leaderboard to google drive.
+# "batch" builds the whole block in memory and sends it as one ranged update,
+# "cell" is the legacy mode that updates every cell with its own request,
+# "diff" only sends the cells that differ from what was last published.
+LEADERBOARD_WRITE_MODES = ["batch", "cell", "diff"]
+# provisional standings are published to this worksheet of the leaderboard book. It isn't a game
+PROVISIONAL_SHEET = "Provisional"
+PROVISIONAL_HEADERS = ["Rank", "Delta", "Username", "Points", "Last", "Played", "Winner"]
+# changed cells this many rows apart or closer share one ranged read of their cell handles
+DIFF_ROW_GAP = 10
+# the shared access token is refreshed once it has less than this long left. Credentials that
+# don't say when they expire are refreshed this often instead
+TOKEN_REFRESH_MARGIN = 5 * 60
+# the drive v2 discovery document, so the drive service is built without asking google for it
+DISCOVERY_CACHE_FILE = 'drive_v2_discovery.json'
+DISCOVERY_CACHE_MAX_AGE = 7 * 24 * 60 * 60
+
+class GoogleAuth():
+    """Google credentials shared by every DriveManager in the process.
+
+    The credentials are loaded once for all teams and the access token is only refreshed when
+    it is about to expire. Each thread gets its own authorized http session, gspread client
+    and drive service (the google clients aren't thread safe), and keeps reusing them for every
+    team it works on. The updater and the poster daemon keep one team pool for all their cycles
+    (team_pool.new_team_pool), so they're only built once per pool thread. They all send through
+    the shared connection pools of http_transport. The drive service is built from a discovery
+    document cached on disk.
+    """
+
+    discovery_cache_file = DISCOVERY_CACHE_FILE
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.credentials = None
+        self.refreshed = 0
+        self.discovery_document = None
+        self.clients = threading.local()
+
+    def _get_credentials(self):
+        """Gets valid user credentials from storage.
+
+        If nothing has been stored, or if the stored credentials are invalid,
+        the OAuth2 flow is completed to obtain the new credentials.
+
+        Returns:
+            Credentials, the obtained credential.
+        """
+        home_dir = os.path.expanduser('~')
+        credential_dir = os.path.join(home_dir, '.credentials')
+        if not os.path.exists(credential_dir):
+            os.makedirs(credential_dir)
+        credential_path = os.path.join(credential_dir,
+                                       'gwg-leaderboard-helper.json')
+
+        store = Storage(credential_path)
+        credentials = store.get()
+        if not credentials or credentials.invalid:
+            flow = client.flow_from_clientsecrets(CLIENT_SECRET_FILE, SCOPES)
+            flow.user_agent = APPLICATION_NAME
+            if flags:
+                credentials = tools.run_flow(flow, store, flags)
+            else: # Needed only for compatibility with Python 2.6
+                credentials = tools.run(flow, store)
+            logging.getLogger("drive_manager").debug('Storing credentials to ' + credential_path)
+        return credentials
+
+    def _expires_soon(self):
+        """True if the access token has less than TOKEN_REFRESH_MARGIN left (or we don't have one)"""
+        if not self.credentials.access_token:
+            return True
+        expiry = self.credentials.token_expiry
+        if expiry is None:
+            return time() - self.refreshed >= TOKEN_REFRESH_MARGIN
+        return expiry - datetime.utcnow() < timedelta(seconds=TOKEN_REFRESH_MARGIN)
+
+    def refresh(self):
+        """loads the credentials the first time and refreshes the access token if it is about to expire"""
+        with self.lock:
+            if self.credentials is None:
+                self.credentials = self._get_credentials()
+
+            if self._expires_soon():
+                logging.getLogger("drive_manager").debug("Refreshing the google access token")
+                self.credentials.refresh(transport.http())
+                self.refreshed = time()
+
+            return self.credentials
+
+    def _load_discovery_document(self):
+        """returns the cached discovery document if there is one younger than DISCOVERY_CACHE_MAX_AGE"""
+        try:
+            if time() - os.path.getmtime(self.discovery_cache_file) < DISCOVERY_CACHE_MAX_AGE:
+                with open(self.discovery_cache_file) as document:
+                    text = document.read()
+                json.loads(text)
+                return text
+        except (IOError, OSError, ValueError):
+            pass
+        return None
+
+    def get_discovery_document(self, http):
+        """returns the drive v2 discovery document. It is fetched with http and saved to
+        discovery_cache_file the first time, then read from there (once per process)
+        """
+        with self.lock:
+            if self.discovery_document is None:
+                self.discovery_document = self._load_discovery_document()
+
+            if self.discovery_document is None:
+                url = discovery.DISCOVERY_URI.format(api='drive', apiVersion='v2')
+                response, content = http.request(url, "GET")
+                if int(response.status) != 200:
+                    raise errors.HttpError(response, content, uri=url)
+
+                self.discovery_document = content.decode("utf-8") if isinstance(content, bytes) else content
+                try:
+                    temp_file = self.discovery_cache_file + ".tmp"
+                    with open(temp_file, "w") as document:
+                        document.write(self.discovery_document)
+                    os.replace(temp_file, self.discovery_cache_file)
+                    logging.getLogger("drive_manager").debug("Saved the drive discovery document to %s" % self.discovery_cache_file)
+                except IOError as error:
+                    logging.getLogger("drive_manager").error("Unable to save the drive discovery document: %s" % error)
+
+            return self.discovery_document
+
+    def get_clients(self):
+        """returns this thread's (gspread client, drive service), built the first time and reused after"""
+        credentials = self.refresh()
+        clients = self.clients
+
+        if getattr(clients, 'gc', None) is None:
+            # every attempt is counted, the scheduler retries around it
+            http = drive_requests.wrap_http(metrics.instrument_http(credentials.authorize(transport.http())))
+            # gspread 'cursor' to read workbooks and sheets, its connections are pooled with drive's
+            gc = transport.route_gspread(gspread.authorize(credentials))
+            clients.gc = sheets_requests.wrap_gspread(metrics.instrument_gspread(gc))
+            clients.service = discovery.build_from_document(self.get_discovery_document(http), http=http)
+
+        elif clients.gc.session.headers.get('Authorization') != "Bearer %s" % credentials.access_token:
+            # the drive http picks up a refreshed token by itself but gspread sends the one it had
+            # at login. The token is fresh so logging in again only swaps the header
+            clients.gc.login()
+
+        return clients.gc, clients.service
+
+google_auth = GoogleAuth()
+
+def _sheets_error(error, message):
+    """wraps error in a SheetsError unless it already is one (eg. the scheduler ran out of retries)"""
+    if isinstance(error, SheetsError):
+        return error
+    sheets_error = SheetsError("%s: %s" % (message, error), getattr(error, 'status', None))
+    sheets_error.__cause__ = error
+    return sheets_error
 
 class DriveManager():
     gc = None
     service = None
     drive_files = None
     secrets = None
+    write_requests = 0
+    answer_key = None
+    drive_catalog = None
+    changes_token = None
+    handle_cache_hits = 0
+    handle_cache_misses = 0
+    response_cache = None
+    provisional_snapshot = None
+    leaderboard_snapshot = None
+    leaderboard_cells_changed = 0
 
     def __init__(self, secrets, team="52", debug=False, update=True):
         """init google drive management objects"""
@@ -64,20 +237,13 @@ class DriveManager():
 
         self.secrets = secrets
         self.team_folder = team
+        self.clear_handle_cache()
         if update:
             self.update_drive_files()
 
     def refresh_gdrive_credentials(self):
         """refreshes google drive credentials so we can talk to google drive again"""
-
-        credentials = self._get_credentials()
-        http = credentials.authorize(httplib2.Http())
-
-        credentials.refresh(http)
-
-        # gspread 'cursor' to read workbooks and sheets
-        self.gc = gspread.authorize(credentials)
-        self.service = discovery.build('drive', 'v2', http=http)
+        self.gc, self.service = google_auth.get_clients()
 
     def _get_sheet_index(self, game):
         """take a string of a worksheet name and steal all the numbers from it.
@@ -89,29 +255,137 @@ class DriveManager():
         """
         return int(''.join(filter(lambda x: x.isdigit(), game)))
 
-    def _get_gameday_data(self, game_day, team):
-        """returns the game day data"""
-        parts = game_day.split("/")
-        today = str(parts[0]) + "-" + str(parts[1]) + "-" + str(parts[2])
+    def clear_handle_cache(self):
+        """Forgets every spreadsheet and worksheet handle we've opened, along with the answer key
+        snapshot, and resets the cache stats.
+
+        Handles are only trusted for a single polling cycle so edits made in google drive between
+        cycles (new tabs, renamed tabs) are always picked up.
+        """
+        self._spreadsheets = {}
+        self._worksheets = {}
+        self.answer_key = None
+        self.handle_cache_hits = 0
+        self.handle_cache_misses = 0
+        self.leaderboard_cells_changed = 0
+
+    def get_answer_key(self):
+        """returns the answer key snapshot for this cycle, reading the whole sheet the first time it's needed"""
+        if self.answer_key:
+            return self.answer_key
 
-        if str(team) == "-1":
-            team = "52" 
+        leader_sheet_id = self.drive_files['leaderboard']['id']
+        try:
+            log.debug("Reading answer key from file %s" % leader_sheet_id)
+            worksheet = self._open_worksheet(leader_sheet_id, SheetKeys.ANSWERKEY_SHEET.value)
+            self.answer_key = AnswerKey(worksheet, worksheet.get_all_values())
+            return self.answer_key
 
-        attempts = 0
-        while attempts < 5:
-            try:
-                attempts += 1
-                data = urlopen("https://statsapi.web.nhl.com/api/v1/schedule?expand=schedule.linescore&startDate=" + today + "&endDate=" + today + "&teamId=" + str(team))
-                data = json.load(data)
-                return data['dates'][0]['games'][0]['linescore']['periods'][0]['startTime']
-            except KeyError:
-                # NHL website wasn't updated so use regular game time
-                return data['dates'][0]['games'][0]['gameDate']
-            except Exception as e:
-                log.error("exception occurred in is_game_day. Trying again shortly")
-                log.error('An error occurred: %s' % e)
-                log.error(traceback.print_exc())
-                sleep(15)
+        except Exception as error:
+            log.error('attempted to open with key: %s on sheet %s' % (leader_sheet_id, SheetKeys.ANSWERKEY_SHEET.value))
+            log.error('An error occurred: %s' % error)
+            log.error(traceback.print_exc())
+            raise _sheets_error(error, "Unable to read the answer key of %s" % leader_sheet_id)
+
+    def get_handle_cache_stats(self):
+        """returns how many spreadsheet/worksheet opens the handle cache has saved this cycle"""
+        return {'hits': self.handle_cache_hits, 'misses': self.handle_cache_misses}
+
+    def _invalidate_handles(self, file_id):
+        """drops every cached handle for file_id. Needed after we add or remove worksheets
+        since the worksheet indexes can move around.
+        """
+        self._spreadsheets.pop(file_id, None)
+        for key in [key for key in self._worksheets if key[0] == file_id]:
+            del self._worksheets[key]
+
+    def _open_spreadsheet(self, file_id):
+        """returns the spreadsheet handle for file_id, opening it if we haven't this cycle"""
+        spreadsheet = self._spreadsheets.get(file_id)
+        if spreadsheet:
+            self.handle_cache_hits += 1
+            return spreadsheet
+
+        self.handle_cache_misses += 1
+        spreadsheet = self.gc.open_by_key(file_id)
+        self._spreadsheets[file_id] = spreadsheet
+        return spreadsheet
+
+    def _open_worksheet(self, file_id, sheet=0):
+        """returns the worksheet handle at index sheet in file_id, opening it if we haven't this cycle"""
+        worksheet = self._worksheets.get((file_id, sheet))
+        if worksheet:
+            self.handle_cache_hits += 1
+            return worksheet
+
+        self.handle_cache_misses += 1
+        worksheet = self._open_spreadsheet(file_id).get_worksheet(sheet)
+        self._worksheets[(file_id, sheet)] = worksheet
+        return worksheet
+
+    def _get_worksheets(self, file_id):
+        """returns every worksheet handle in file_id, listing them if we haven't this cycle"""
+        worksheets = self._worksheets.get((file_id, None))
+        if worksheets:
+            self.handle_cache_hits += 1
+            return worksheets
+
+        self.handle_cache_misses += 1
+        worksheets = self._open_spreadsheet(file_id).worksheets()
+        self._worksheets[(file_id, None)] = worksheets
+        return worksheets
+
+    def _a1_notation(self, row, col):
+        """takes a row and column number and returns the A1 notation for that cell.
+
+        Eg. (1, 1) returns A1
+            (3, 28) returns AB3
+        """
+        letters = ""
+        while col > 0:
+            col, remainder = divmod(col - 1, 26)
+            letters = chr(ord('A') + remainder) + letters
+        return letters + str(row)
+
+    def _write_block(self, worksheet, rows, start_row=1, start_col=1):
+        """Writes a block of rows into worksheet with its top left corner at start_row/start_col.
+
+        The cell handles for the whole block are fetched with a single ranged read and sent back
+        with a single batched update, growing the worksheet first if the block doesn't fit.
+        Rows shorter than the widest row are padded with blanks.
+
+        returns the number of write requests it took
+        """
+        if not rows:
+            return 0
+
+        writes = 0
+        width = max(len(row) for row in rows)
+        last_row = start_row + len(rows) - 1
+        last_col = start_col + width - 1
+
+        if worksheet.row_count < last_row or worksheet.col_count < last_col:
+            worksheet.resize(rows=max(worksheet.row_count, last_row),
+                             cols=max(worksheet.col_count, last_col))
+            writes += 1
+
+        cells = worksheet.range("%s:%s" % (self._a1_notation(start_row, start_col),
+                                           self._a1_notation(last_row, last_col)))
+        for cell in cells:
+            row = rows[cell.row - start_row]
+            offset = cell.col - start_col
+            value = row[offset] if offset < len(row) else ""
+            cell.value = "" if value is None else value
+
+        worksheet.update_cells(cells)
+        writes += 1
+
+        self.write_requests += writes
+        return writes
+
+    def _get_gameday_data(self, game_day, team):
+        """returns the game day data"""
+        return ScheduleCache(team).get_start_time(game_day)
 
     def _get_start_time(self, game_date, team):
         """retrieves the puck drop time and returns the UTC python object
@@ -126,8 +400,8 @@ class DriveManager():
 
         game_time = self._get_gameday_data(game_date, team)
 
-        from_zone = tz.gettz('UTC')
-        to_zone = tz.gettz('America/Winnipeg')
+        from_zone = get_timezone('UTC')
+        to_zone = get_timezone('America/Winnipeg')
 
         # date formated like "2017-11-17T01:08:08Z"
         the_date = dateutil.parser.parse(game_time)
@@ -154,27 +428,32 @@ class DriveManager():
         """
 
         log.debug("Getting valid player entries from file %s sheet %s" % (fileid, sheet_index))
-        game_start = self.get_game_results_game_start(fileid, sheet_index)
-        times = self.get_sheet_single_column(fileid, SheetKeys.RESULT_DATETIME.value, sheet=sheet_index, remove_headers=remove_headers)
-        users = self.get_sheet_single_column(fileid, SheetKeys.RESULT_USERNAME.value, sheet=sheet_index, remove_headers=remove_headers)
-        points = self.get_sheet_single_column(fileid, SheetKeys.RESULT_POINTS.value, sheet=sheet_index, remove_headers=remove_headers)
+        columns = self.get_sheet_columns(fileid,
+                                         [SheetKeys.RESULT_DATETIME.value,
+                                          SheetKeys.RESULT_USERNAME.value,
+                                          SheetKeys.RESULT_POINTS.value],
+                                         sheet=sheet_index)
+
+        # the official game start time is written under the headers in the date column
+        game_start = columns[SheetKeys.RESULT_DATETIME.value][2]
+        log.debug("game start time was %s " % game_start)
+
+        times = columns[SheetKeys.RESULT_DATETIME.value][remove_headers:]
+        users = columns[SheetKeys.RESULT_USERNAME.value][remove_headers:]
+        points = columns[SheetKeys.RESULT_POINTS.value][remove_headers:]
 
         users =[item.strip().lower() for item in users]
         points =[item.strip().lower() for item in points]
 
         # parse late entries from this list
         results = {}
-        game_time = None
-        game_time = dt.strptime(game_start, "%Y/%m/%d %H:%M")
+        entries = EntryTable(times, time_format=RESULT_TIME_FORMAT, skip_blank=True)
+        game_time = parse_epoch(game_start, RESULT_TIME_FORMAT)
 
-        for x in range(len(times)):
-            if not times[x]:
-                continue
-            entry_time = dt.strptime(times[x], '%Y/%m/%d %H:%M') 
-            if entry_time <= game_time:
-                results[users[x]] = points[x]
-            else:
-                log.debug("Late Entry %s for user %s" % (times[x], users[x]))
+        for x in entries.on_time_rows(game_time):
+            results[users[x]] = points[x]
+        for x in entries.late_rows(game_time):
+            log.debug("Late Entry %s for user %s" % (times[x], users[x]))
 
         return results
 
@@ -188,34 +467,6 @@ class DriveManager():
             return "GM32202" 
         return "GM" + title.split()[1]
 
-    def _get_credentials(self):
-        """Gets valid user credentials from storage.
-
-        If nothing has been stored, or if the stored credentials are invalid,
-        the OAuth2 flow is completed to obtain the new credentials.
-
-        Returns:
-            Credentials, the obtained credential.
-        """
-        home_dir = os.path.expanduser('~')
-        credential_dir = os.path.join(home_dir, '.credentials')
-        if not os.path.exists(credential_dir):
-            os.makedirs(credential_dir)
-        credential_path = os.path.join(credential_dir,
-                                       'gwg-leaderboard-helper.json')
-
-        store = Storage(credential_path)
-        credentials = store.get()
-        if not credentials or credentials.invalid:
-            flow = client.flow_from_clientsecrets(CLIENT_SECRET_FILE, SCOPES)
-            flow.user_agent = APPLICATION_NAME
-            if flags:
-                credentials = tools.run_flow(flow, store, flags)
-            else: # Needed only for compatibility with Python 2.6
-                credentials = tools.run(flow, store)
-            log.debug('Storing credentials to ' + credential_path)
-        return credentials
-
     def _remove_values_from_list(self, the_list, val=""):
         """Goes through the_list passed and removes any items that contain val. Taken generously from SO.
 
@@ -225,28 +476,44 @@ class DriveManager():
         return [value for value in the_list if value != val]
 
     def _get_game_list(self, fileid):
-        """Gets two columns from the answer table and combines them into a single list. Returns that result"""
+        """Gets the game and ready columns from the answer key as a list of pairs. Returns that result"""
 
         log.debug("Getting game list for file %s" % fileid)
-        games = self._remove_values_from_list(self.get_sheet_single_column(fileid, 1, sheet=SheetKeys.ANSWERKEY_SHEET.value))
-        readys = self.get_sheet_single_column(fileid, 8, sheet=SheetKeys.ANSWERKEY_SHEET.value)
-
-        if not games or not readys:
-            return None
-
-        result = [[a, b.title()] for a, b in zip(games, readys)]
-
-        #return everything except the title
-        return result[1:] 
+        return self.get_answer_key().get_game_list()
 
     def get_all_drive_file_metadatas(self):
-        """Logs into google drive and lists all the file resource that are in the main wpg jets directory."""
+        """Logs into google drive and lists all the file resource that are in the main wpg jets directory.
+
+        Uses one paged files().list query on the folder that only asks for the fields we use. If that
+        fails we fall back to listing the folder's children and fetching their metadata in batches.
+        Trashed files are left out either way, like the changes feed does.
+        """
 
         folder = self.secrets.get_teams_parent_folder(self.team_folder)
 
         try:
-            param = {}
             log.debug("Getting all of the google drive files...")
+            results = []
+            page_token = None
+            while True:
+                response = self.service.files().list(q="'%s' in parents and trashed = false" % folder,
+                                                     fields="nextPageToken, items(%s)" % DRIVE_FILE_FIELDS,
+                                                     maxResults=DRIVE_PAGE_SIZE,
+                                                     pageToken=page_token).execute()
+                results += response.get('items', [])
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+
+            log.debug("received list of all %s google drive files" % len(results))
+            return results
+
+        except errors.HttpError as error:
+            log.error('An error occurred listing the folder, falling back to its children: %s' % error)
+            log.error(traceback.print_exc())
+
+        try:
+            param = {'q': "trashed = false"}
             children = self.service.children().list(folderId=folder, **param).execute()
             log.debug("received list of all google drive files")
 
@@ -258,20 +525,33 @@ class DriveManager():
         return self._collect_file_metadata(children['items'])
 
     def _collect_file_metadata(self, files):
-        """this will go through, investigate each item and print the details about it"""
+        """this will go through, investigate each item and return the details about it.
+        Files are fetched in batch requests of DRIVE_BATCH_SIZE instead of one request each.
+        """
 
-        results = []
+        results = {}
         log.debug("Collecting all file metadata...")
-        for file in files:
+
+        def collect(request_id, response, exception):
+            if exception:
+                log.error('An error occurred getting file %s: %s' % (request_id, exception))
+            else:
+                results[request_id] = response
+
+        for start in range(0, len(files), DRIVE_BATCH_SIZE):
+            batch = self.service.new_batch_http_request(callback=collect)
+            for file in files[start:start + DRIVE_BATCH_SIZE]:
+                batch.add(self.service.files().get(fileId=file['id'], fields=DRIVE_FILE_FIELDS),
+                          request_id=file['id'])
             try:
-                results.append(self.service.files().get(fileId=file['id']).execute())
+                batch.execute()
 
             except errors.HttpError as error:
                 log.error('An error occurred: %s' % error)
                 log.error(traceback.print_exc())
 
         log.debug("Collected all file meta data's.")
-        return results
+        return [results[file['id']] for file in files if file['id'] in results]
 
     def get_all_sheet_lines(self, file_id, headers=True, sheet=0):
         """This function will read a spreadsheet, read every line and return the results
@@ -282,8 +562,7 @@ class DriveManager():
 
         try:
             log.debug("Reading sheet with id: %s" % file_id)
-            spreadsheet = self.gc.open_by_key(file_id)
-            worksheet = spreadsheet.get_worksheet(sheet)
+            worksheet = self._open_worksheet(file_id, sheet)
 
             results = worksheet.get_all_values()
             if not headers:
@@ -296,7 +575,7 @@ class DriveManager():
             log.error('attempted to open with key: %s' % file_id)
             log.error('An error occurred: %s' % error)
             log.error(traceback.print_exc())
-            sys.exit(-1)
+            raise _sheets_error(error, "Unable to read sheet %s of %s" % (sheet, file_id))
 
     def get_sheet_single_column(self, file_id, column, sheet=0, remove_headers=0):
         """returns column a from the passed spreadsheet file_id
@@ -305,8 +584,7 @@ class DriveManager():
         """
         try:
             log.debug("Reading column %s from sheet %s with id: %s" % (column, sheet, file_id))
-            spreadsheet = self.gc.open_by_key(file_id)
-            worksheet = spreadsheet.get_worksheet(sheet)
+            worksheet = self._open_worksheet(file_id, sheet)
 
             # make everything lowercase
             data = worksheet.col_values(column)[remove_headers:]
@@ -320,60 +598,166 @@ class DriveManager():
             log.error(traceback.print_exc())
             return None
 
-    def get_file_entries(self, file_data):
+    def get_sheet_columns(self, file_id, columns, sheet=0):
+        """returns several columns from the passed spreadsheet file_id with a single ranged read.
+
+        The result is a dict of column number -> list of values. Every list covers the same rows
+        so the values line up by index.
+        """
+        try:
+            log.debug("Reading columns %s from sheet %s with id: %s" % (columns, sheet, file_id))
+            worksheet = self._open_worksheet(file_id, sheet)
+
+            first_col = min(columns)
+            last_col = max(columns)
+            num_rows = worksheet.row_count
+            cells = worksheet.range("%s:%s" % (self._a1_notation(1, first_col),
+                                               self._a1_notation(num_rows, last_col)))
+
+            results = {column: [""] * num_rows for column in columns}
+            for cell in cells:
+                if cell.col in results:
+                    results[cell.col][cell.row - 1] = cell.value or ""
+
+            log.debug("Done reading columns")
+            return results
+
+        except Exception as error:
+            log.error('attempted to open with key: %s on sheet %s' % (file_id, sheet))
+            log.error('An error occurred: %s' % error)
+            log.error(traceback.print_exc())
+            return None
+
+    def get_file_entries(self, file_data, verify=False):
         """This function accepts a list of files that we will go through
         (not blacklisted) pull the people entries for the GWG and return a list of lists
         that contains all the entries for each response sheet we have. In a perfect world
         this parameter passed will only have 1 file in it, but this may not be the case.
+
+        Only the rows added since we last read the sheet are fetched (see response_cache.py).
+        'new_from' in the result is the index in 'data' of the first row that wasn't there last time.
+        With verify (the official scoring read) the whole sheet is read once and every row we had
+        is checked against its hash, so a response edited since the last read isn't scored stale.
         """
 
         log.debug("Getting file entries for file %s" % file_data['id'])
         try:
-            spreadsheet = self.gc.open_by_key(file_data['id'])
-            worksheet = spreadsheet.get_worksheet(0)
+            worksheet = self._open_worksheet(file_data['id'], 0)
             name = self._extract_GWG_title(file_data['title'])
-            return {'name': name, 'data':worksheet.get_all_values(), 'id':file_data['id']}
+            response_cache = self._get_response_cache()
+
+            cached = response_cache.get(file_data['id'])
+            if cached and verify:
+                rows = worksheet.get_all_values()
+                new_from = len(cached['rows']) if self._rows_unchanged(rows, cached) else 0
+                if not new_from:
+                    log.debug("Rows we had of %s changed, parsing it all again" % file_data['id'])
+            else:
+                rows = self._read_appended_rows(worksheet, cached['rows']) if cached else None
+                if rows is None:
+                    new_from = 0
+                    rows = worksheet.get_all_values()
+                else:
+                    new_from = len(cached['rows'])
+                    log.debug("Read %s new rows from %s" % (len(rows) - new_from, file_data['id']))
+
+            response_cache.put(file_data['id'], rows)
+            return {'name': name, 'data': rows, 'id': file_data['id'], 'new_from': new_from}
 
         except Exception as error:
             log.error('attempted to open with key: %s' % file_data['id'])
             log.error('An error occurred: %s' % error)
             log.error(traceback.print_exc())
-            sys.exit(-1)
+            raise _sheets_error(error, "Unable to read entries from %s" % file_data['id'])
+
+    def _rows_unchanged(self, rows, cached):
+        """True if rows still start with every row we had cached"""
+        old_rows = cached['rows']
+        return (bool(old_rows) and len(rows) >= len(old_rows) and
+                hash_rows(rows[:len(old_rows)]) == cached.get('rows_hash'))
+
+    def _get_response_cache(self):
+        if self.response_cache is None:
+            self.response_cache = ResponseCache(RESPONSE_CACHE_FILE % self.team_folder)
+        return self.response_cache
+
+    def _read_rows(self, worksheet, first_row, last_row):
+        """returns rows first_row to last_row of worksheet with one ranged read"""
+        width = worksheet.col_count
+        cells = worksheet.range("%s:%s" % (self._a1_notation(first_row, 1), self._a1_notation(last_row, width)))
+
+        rows = [[""] * width for x in range(last_row - first_row + 1)]
+        for cell in cells:
+            rows[cell.row - first_row][cell.col - 1] = cell.value or ""
+        return rows
+
+    def _read_appended_rows(self, worksheet, old_rows):
+        """returns old_rows with the rows added to the bottom of worksheet since, the same as
+        worksheet.get_all_values() would. Returns None if the header or the last row we have
+        changed (or rows were removed) and the sheet has to be read again in full.
+        Rows further up are only checked by the verify read in get_file_entries.
+        """
+        if not old_rows or worksheet.row_count < len(old_rows):
+            return None
+
+        if hash_row(worksheet.row_values(1)) != hash_row(old_rows[0]):
+            log.debug("Header of %s changed, reading it all again" % worksheet.title)
+            return None
+
+        # the first chunk starts on the last row we have to check it's still the same
+        new_rows = []
+        first_row = len(old_rows)
+        while first_row <= worksheet.row_count:
+            last_row = min(first_row + RESPONSE_CHUNK_ROWS - 1, worksheet.row_count)
+            chunk = self._read_rows(worksheet, first_row, last_row)
+
+            if first_row == len(old_rows):
+                if trim_row(chunk[0]) != trim_row(old_rows[-1]):
+                    log.debug("Row %s of %s changed, reading it all again" % (first_row, worksheet.title))
+                    return None
+                chunk = chunk[1:]
+
+            new_rows += [trim_row(row) for row in chunk]
+            if not chunk or not new_rows[-1]:
+                # we've read past the last response
+                break
+            first_row = last_row + 1
+
+        while new_rows and not new_rows[-1]:
+            new_rows.pop()
+
+        width = max([len(old_rows[0])] + [len(row) for row in new_rows])
+        return [row + [""] * (width - len(row)) for row in old_rows + new_rows]
 
     def get_games_result(self, game_id):
         """Check the answer_key spread sheet for a certain game, and returns the tuple for the 
         successful results or None is there isn't a matching game.
         """
 
-        results = {'title': [], 'result': []}
         log.debug("Extracting game %s question results..." % game_id)
-        try:
-            spreadsheet = self.gc.open_by_key(self.drive_files['leaderboard']['id'])
-            worksheet = spreadsheet.get_worksheet(1)
-            lines = worksheet.get_all_values()
-
-            # add title bar minus that last 2 elements (since those are the trigger for file running) but add points column.
-            new_row = lines[0][:-3] + ["Points", "Ramblings"]
-            results['title'] = new_row
-
-            # find matching game line
-            for line in lines:
-                if line[0] == game_id:
-                    #add line minus last column since that is the trigger for file being run.
-                    results['result'] = line[:-3]
-                    log.debug("Done getting game results.")
-                    break
+        results = self.get_answer_key().get_game_result(game_id)
 
-            if not results['result']:
-                log.debug("Failure finding game results.")
-
-        except Exception as error:
-            log.error('attempted to open with key: %s' % game_id)
-            log.error('An error occurred: %s' % error)
-            log.error(traceback.print_exc())
+        if not results['result']:
+            log.debug("Failure finding game results.")
+        else:
+            log.debug("Done getting game results.")
 
         return results
 
+    def _get_new_sheet_rows(self, sheet_info):
+        """Lays out the data, late and stats sections of a new game sheet. Each section is
+        followed by a blank row and the late section gets a "Late entries:" title row.
+        """
+        rows = []
+        for key in ["data", "late", "stats"]:
+            if key == "late":
+                rows.append(["Late entries:"])
+
+            for line in sheet_info[key]:
+                rows.append(list(line) if line else [])
+            rows.append([])
+        return rows
+
     def create_new_sheet(self, sheet_info):
         """Creates a new sheet with the following constraints
 
@@ -382,44 +766,53 @@ class DriveManager():
         num rows   = sheet_info['rows']
         num cols   = sheet_info['cols']
 
+        The sheet is created at its final size and every section is written with one ranged update.
+        The first row is left blank, readers of the game sheets expect the headers on row 2.
+
         returns file create/appendage success
         """
 
         workbook = None
         new_worksheet = None
 
-        log.debug("adding new sheet %s to fileid %s" % (sheet_info['name'], sheet_info['id']))
+        rows = self._get_new_sheet_rows(sheet_info)
+        num_rows = max(sheet_info['rows'], len(rows) + 1)
+        num_cols = max([sheet_info['cols']] + [len(row) for row in rows])
+
+        log.debug("adding new %sx%s sheet %s to fileid %s" % (num_rows, num_cols, sheet_info['name'], sheet_info['id']))
         try:
-            workbook = self.gc.open_by_key(sheet_info['id'])
+            workbook = self._open_spreadsheet(sheet_info['id'])
 
             new_worksheet = workbook.add_worksheet(title=sheet_info['name'], 
-                                                    rows=1,
-                                                    cols=1)
-            for key in ["data", "late", "stats"]:
-                if key == "late":
-                    new_worksheet.append_row(["Late entries:"])
+                                                    rows=num_rows,
+                                                    cols=num_cols)
+            self._invalidate_handles(sheet_info['id'])
+            writes = self._write_block(new_worksheet, rows, start_row=2)
 
-                for line in sheet_info[key]:
-                    new_worksheet.append_row(line)
-                new_worksheet.append_row(None)
-
-            log.debug("Done creating and appending rows to file.")
+            log.debug("Done creating and writing %s rows to file with %s write requests." % (len(rows), writes))
             return True
 
         except Exception as error:
             log.error('attempted to write new sheet in book: %s' %  sheet_info['id'])
             log.error('An error occurred: %s' % error)
             log.error(traceback.print_exc())
-            workbook.del_worksheet(new_worksheet)
+            if workbook and new_worksheet:
+                workbook.del_worksheet(new_worksheet)
+                self._invalidate_handles(sheet_info['id'])
             return False
 
+    def _count_games(self, bookid):
+        """returns how many game sheets the leaderboard book has, everything after the leaderboard
+        and the answer key except the provisional standings
+        """
+        return len([sheet for sheet in self._get_worksheets(bookid)[2:] if sheet.title != PROVISIONAL_SHEET])
+
     def get_all_books_sheets(self, bookid):
         """This will return all of the sheet names in the leaderboard book."""
 
         log.debug("Trying to get all sheets in file %s" % bookid)
         try:
-            sh = self.gc.open_by_key(bookid)
-            worksheets = sh.worksheets()
+            worksheets = self._get_worksheets(bookid)
 
             results = []
             for sheet in worksheets:
@@ -434,15 +827,19 @@ class DriveManager():
             log.error(traceback.print_exc())
             return None
 
-    def update_drive_files(self):
-        """This will take a list of files, and update the global variable that manages all these files."""
-
-        self.refresh_gdrive_credentials()
+    def get_sheet_index_map(self, bookid):
+        """returns a dict of worksheet title -> worksheet index for every sheet in the book.
+        The first sheet wins if two share a title.
+        """
+        index_map = {}
+        for x, sheet in enumerate(self._get_worksheets(bookid)):
+            index_map.setdefault(sheet.title, x)
+        return index_map
 
-        log.debug("Updating google drive files...")
+    def _sort_drive_files(self, files):
+        """sorts the folder's files into the responses/leaderboard/forms catalog"""
 
         new_drive_files = self._empty_drive_files()
-        files = self.get_all_drive_file_metadatas()
 
         # sort the files
         for file in files:
@@ -465,7 +862,143 @@ class DriveManager():
                 log.debug("Found a regular form!")
                 new_drive_files['forms'].append(file)
 
-        self.drive_files = new_drive_files
+        return new_drive_files
+
+    def _get_drive_changes_file(self):
+        return DRIVE_CHANGES_FILE % self.team_folder
+
+    def _load_drive_changes(self):
+        """loads the change token and file catalog we saved last run, if there is one"""
+        try:
+            with open(self._get_drive_changes_file()) as json_data:
+                saved = json.load(json_data)
+
+            if saved.get('folder') == self.secrets.get_teams_parent_folder(self.team_folder):
+                self.changes_token = saved['token']
+                self.drive_catalog = {file['id']: file for file in saved['files']}
+                log.debug("Loaded drive change token and %s files from disk" % len(self.drive_catalog))
+
+        except (IOError, ValueError, KeyError) as error:
+            log.debug("No saved drive changes to load: %s" % error)
+
+    def _save_drive_changes(self):
+        """saves the change token and file catalog so the next run can pick up where we left off"""
+        saved = {'folder': self.secrets.get_teams_parent_folder(self.team_folder),
+                 'token': self.changes_token,
+                 'files': list(self.drive_catalog.values())}
+        try:
+            temp_file = self._get_drive_changes_file() + ".tmp"
+            with open(temp_file, "w") as json_data:
+                json.dump(saved, json_data)
+            os.replace(temp_file, self._get_drive_changes_file())
+
+        except IOError as error:
+            log.error('Unable to save drive changes: %s' % error)
+
+    def _get_start_page_token(self):
+        """returns the drive changes token for 'now' or None if drive won't give us one"""
+        try:
+            return self.service.changes().getStartPageToken().execute()['startPageToken']
+
+        except errors.HttpError as error:
+            log.error('An error occurred getting a drive change token: %s' % error)
+            return None
+
+    def _apply_drive_change(self, change, folder):
+        """applies a single drive change to the file catalog.
+
+        returns True if the catalog changed
+        """
+        file = change.get('file') or {}
+        in_folder = (not change.get('deleted') and
+                     not file.get('labels', {}).get('trashed') and
+                     any(parent['id'] == folder for parent in file.get('parents', [])))
+
+        if not in_folder:
+            removed = self.drive_catalog.pop(change['fileId'], None)
+            if removed:
+                log.debug("File %s was removed from the folder" % removed['title'])
+            return bool(removed)
+
+        metadata = {key: file[key] for key in DRIVE_FILE_FIELDS.split(", ") if key in file}
+        if self.drive_catalog.get(change['fileId']) == metadata:
+            return False
+
+        log.debug("File %s was added or changed" % metadata['title'])
+        self.drive_catalog[change['fileId']] = metadata
+        return True
+
+    def _get_changed_drive_files(self):
+        """Brings the file catalog up to date from the drive changes feed.
+
+        returns every file in the folder, or None if we have no valid change token and need a full relist
+        """
+        if self.drive_catalog is None:
+            self._load_drive_changes()
+
+        if not self.changes_token or self.drive_catalog is None:
+            return None
+
+        folder = self.secrets.get_teams_parent_folder(self.team_folder)
+        num_changed = 0
+        page_token = self.changes_token
+        try:
+            log.debug("Getting google drive changes since last check...")
+            while page_token:
+                response = self.service.changes().list(pageToken=page_token,
+                                                       fields=DRIVE_CHANGE_FIELDS,
+                                                       maxResults=DRIVE_PAGE_SIZE).execute()
+                for change in response.get('items', []):
+                    if self._apply_drive_change(change, folder):
+                        num_changed += 1
+
+                if response.get('newStartPageToken'):
+                    self.changes_token = response['newStartPageToken']
+                page_token = response.get('nextPageToken')
+
+        except errors.HttpError as error:
+            log.error('Drive change token %s is no longer valid, relisting the folder: %s' % (page_token, error))
+            self.changes_token = None
+            self.drive_catalog = None
+            return None
+
+        log.debug("Applied %s drive changes" % num_changed)
+        self._save_drive_changes()
+        return list(self.drive_catalog.values())
+
+    def _relist_drive_files(self):
+        """lists the whole folder and starts a new change token from now"""
+
+        # grab the token first so nothing that changes while we list is missed
+        token = self._get_start_page_token()
+        files = self.get_all_drive_file_metadatas()
+
+        if files is not None and token:
+            self.changes_token = token
+            self.drive_catalog = {file['id']: file for file in files}
+            self._save_drive_changes()
+        return files
+
+    def update_drive_files(self, incremental=True):
+        """This will take a list of files, and update the global variable that manages all these files.
+
+        When incremental is set we only ask the drive changes feed what changed since the last check
+        and apply that to the files we already know about. We relist the whole folder the first time
+        around or when the saved change token has expired.
+        """
+
+        self.refresh_gdrive_credentials()
+        self.clear_handle_cache()
+
+        log.debug("Updating google drive files...")
+
+        files = None
+        if incremental:
+            files = self._get_changed_drive_files()
+        if files is None:
+            files = self._relist_drive_files()
+
+        self.drive_files = self._sort_drive_files(files)
         log.debug("Completed google drive file collection.")
         return True
 
@@ -531,25 +1064,12 @@ class DriveManager():
         haven't been written to the global leaderboard.
         """
 
-        unwritten_games = []
-        data = self.get_all_sheet_lines(self.drive_files['leaderboard']['id'],
-                                        headers=False, 
-                                        sheet=SheetKeys.ANSWERKEY_SHEET.value)
+        return self.get_answer_key().get_unwritten_games()
 
-        if not data:
-            return []
+    def get_written_leaderboard_games(self):
+        """returns the games the answer key says are already on the leaderboard"""
 
-        # trim empty lines
-        data = self._remove_values_from_list(data, [""] * len(data[0]))
-
-        # ranging so we can save the cell ID to overwrite on completion.
-        for i in range(len(data)):
-            if (data[i][SheetKeys.READY_COLUMN.value].lower() != SheetKeys.LEADER_WRITTEN_SUCCESS.value and 
-                data[i][0] != "" and 
-                data[i][7].lower() == "yes"):
-                unwritten_games.append({'game': data[i], 'row': i + 2})
-
-        return unwritten_games
+        return self.get_answer_key().get_written_games()
 
     def get_history_game_points(self, game):
         """this will take a look in the leaderboard file for sheet 'game' and return
@@ -561,16 +1081,8 @@ class DriveManager():
         returns a dict that contains the results of the GWG challenge
         """
 
-        # get a list of all the sheets in the answer key workbook.
         leader_sheet_id = self.drive_files['leaderboard']['id']
-        sheets = self.get_all_books_sheets(leader_sheet_id)
-
-        sheet_index = None
-        #find the game we are looking for in the list.
-        for x in range(len(sheets)):
-            if game[0] == sheets[x]:
-                sheet_index = x
-                break
+        sheet_index = self.get_sheet_index_map(leader_sheet_id).get(game[0])
 
         if sheet_index:
             results = self._get_valid_player_entries(leader_sheet_id, sheet_index)
@@ -610,58 +1122,224 @@ class DriveManager():
             formatted_data[username] = stats
         return formatted_data
 
-    def overwrite_leaderboard(self, new_data):
+    def _get_leaderboard_rows(self, new_data, num_games, special_users, ordered=None):
+        """Builds the leaderboard block (rank, delta, username, curr, last, played, winner)
+        in the order it is shown on the sheet, best user first.
+
+        ordered is the usernames best first if the caller already has them in order.
+        """
+        if ordered is None:
+            ordered = list(reversed(sorted(new_data,
+                                           key=lambda x:(int(new_data[x]['curr']),
+                                                         -int(new_data[x]['played']),
+                                                         int(new_data[x]['last'])))))
+        rows = []
+        for username in ordered:
+            scores = new_data[username]
+
+            #if its a winner, restate their winningness, otherwise clear the column
+            prev_winner = special_users.get(username) or ""
+            rows.append([scores['rank'],
+                         scores['delta'],
+                         username,
+                         scores['curr'],
+                         scores['last'],
+                         str(scores['played']) + "/" + str(num_games),
+                         prev_winner])
+        return rows
+
+    def overwrite_leaderboard(self, new_data, mode="batch", ordered=None):
         """This will take a dict of usernames and points. It will overwrite the entire first worksheet 
         and replace the contents with our data.
 
-        Returns success or not.
+        mode is one of LEADERBOARD_WRITE_MODES. In "diff" mode the block is compared with the
+        last one we published (the sheet is read once if we haven't published since starting)
+        and only the changed cells are sent
+        ordered is the usernames best first, if not given new_data is sorted
+
+        Returns True, raises SheetsError if the leaderboard couldn't be written.
         """
         special_users = self.secrets.get_previous_winners(self.team_folder)
+        writes_before = self.write_requests
 
-        # TODO: currently if the sheet for leaderboards is filled, this will fail.
-        #      write software to check if we have reached the end of the document and if so,
-        #      start to append new rows instead of trying to overwrite them.
         try:
-            spreadsheet = self.gc.open_by_key(self.drive_files['leaderboard']['id'])
-            worksheet = spreadsheet.get_worksheet(0)
-
-            row = len(new_data) + 2
-            num_games = len(spreadsheet.worksheets()) - 2
-            log.debug("Overwriting leaderboard main page")
-
-            # update first row to tell users were updating.
-            for x in range(5):
-                worksheet.update_cell(3, 3 + x, "UPDATING")
-
-            for username in sorted(new_data, 
-                                   key=lambda x:(int(new_data[x]['curr']),
-                                                 -int(new_data[x]['played']),
-                                                 int(new_data[x]['last']))):
-                log.debug("Writing row %s/%s" % (row -2, len(new_data)))
-
-                worksheet.update_cell(row, 1, new_data[username]['rank'])
-                worksheet.update_cell(row, 2, new_data[username]['delta'])
-                worksheet.update_cell(row, 3, username)
-                worksheet.update_cell(row, 4, new_data[username]['curr'])
-                worksheet.update_cell(row, 5, new_data[username]['last'])
-                worksheet.update_cell(row, 6, str(new_data[username]['played']) + "/" + str(num_games))
-
-                prev_winner = special_users.get(username)
-
-                #if its a winner, restate their winningness, otherwise clear the column
-                if prev_winner:
-                    worksheet.update_cell(row, 7, prev_winner)
-                else:
-                    worksheet.update_cell(row, 7, "")
-                row -= 1
-            log.debug("Done overwriting data")
+            worksheet = self._open_worksheet(self.drive_files['leaderboard']['id'], 0)
+
+            num_games = self._count_games(self.drive_files['leaderboard']['id'])
+            rows = self._get_leaderboard_rows(new_data, num_games, special_users, ordered)
+            log.debug("Overwriting leaderboard main page in %s mode" % mode)
+
+            if mode == "diff":
+                changed = self._write_leaderboard_diff(worksheet, rows)
+                self.leaderboard_cells_changed += changed
+                log.info("Leaderboard: %s cells changed" % changed)
+            elif mode == "cell":
+                # update first row to tell users were updating.
+                for x in range(5):
+                    worksheet.update_cell(3, 3 + x, "UPDATING")
+                    self.write_requests += 1
+
+                # write from the bottom up so the "UPDATING" banner is replaced last
+                for x in reversed(range(len(rows))):
+                    log.debug("Writing row %s/%s" % (x + 1, len(rows)))
+                    for col, value in enumerate(rows[x], start=1):
+                        worksheet.update_cell(x + 3, col, value)
+                        self.write_requests += 1
+            else:
+                # rows 1 and 2 are the sheet headers
+                self._write_block(worksheet, rows, start_row=3)
+            self.leaderboard_snapshot = rows
+
+            log.debug("Done overwriting data for %s users with %s write requests" % (len(rows), self.write_requests - writes_before))
             return True
 
         except Exception as error:
             log.error('attempted to open file with key: %s' % (self.drive_files['leaderboard']['id']))
             log.error('An error occurred: %s' % error)
             log.error(traceback.print_exc())
-            sys.exit(-1)
+            # part of it may have been written
+            self.leaderboard_snapshot = None
+            raise _sheets_error(error, "Unable to write the leaderboard of %s" % self.drive_files['leaderboard']['id'])
+
+    def _write_leaderboard_diff(self, worksheet, rows):
+        """writes the cells of the leaderboard block that changed since it was last published.
+        Like "batch" mode only the block under the headers is touched.
+
+        returns the number of cells that changed
+        """
+        old_rows = self.leaderboard_snapshot
+        if old_rows is None:
+            log.debug("No leaderboard snapshot, reading the sheet to diff against")
+            old_rows = worksheet.get_all_values()[2:]
+
+        width = max([len(row) for row in rows] + [0])
+        old_rows = [row[:width] for row in old_rows[:len(rows)]]
+        return self._write_cell_diff(worksheet, old_rows, rows, start_row=3)
+
+    def _diff_cells(self, old_rows, rows, start_row=1):
+        """returns a (row, col, value) for every cell that is different in rows than in old_rows.
+        Both are compared as the strings the sheet shows, None and missing cells are blank.
+        """
+        changes = []
+        for x in range(max(len(old_rows), len(rows))):
+            old = old_rows[x] if x < len(old_rows) else []
+            new = rows[x] if x < len(rows) else []
+            for y in range(max(len(old), len(new))):
+                old_value = "" if y >= len(old) or old[y] is None else str(old[y])
+                new_value = "" if y >= len(new) or new[y] is None else str(new[y])
+                if old_value != new_value:
+                    changes.append((start_row + x, y + 1, new_value))
+        return changes
+
+    def _write_cell_diff(self, worksheet, old_rows, rows, start_row=1):
+        """Writes only the cells of rows (with its top left corner at start_row, column 1) that
+        differ from old_rows, what we know is on the sheet. If we don't know, the sheet is read once.
+
+        The handles of the changed cells are read with one ranged read per group of nearby rows
+        and every change is sent back in one batched update.
+
+        returns the number of cells that changed
+        """
+        if old_rows is None:
+            old_rows = worksheet.get_all_values()[start_row - 1:]
+
+        changes = self._diff_cells(old_rows, rows, start_row)
+        if not changes:
+            return 0
+
+        values = {(row, col): value for row, col, value in changes}
+        last_row = max(row for row, col, value in changes)
+        last_col = max(col for row, col, value in changes)
+        if worksheet.row_count < last_row or worksheet.col_count < last_col:
+            worksheet.resize(rows=max(worksheet.row_count, last_row),
+                             cols=max(worksheet.col_count, last_col))
+            self.write_requests += 1
+
+        # group the changed rows so far apart changes don't read everything in between
+        groups = []
+        for row in sorted(set(row for row, col in values)):
+            if groups and row - groups[-1][1] <= DIFF_ROW_GAP:
+                groups[-1][1] = row
+            else:
+                groups.append([row, row])
+
+        cells = []
+        for first_row, group_last_row in groups:
+            cols = [col for row, col in values if first_row <= row <= group_last_row]
+            for cell in worksheet.range("%s:%s" % (self._a1_notation(first_row, min(cols)),
+                                                   self._a1_notation(group_last_row, max(cols)))):
+                if (cell.row, cell.col) in values:
+                    cell.value = values[(cell.row, cell.col)]
+                    cells.append(cell)
+
+        worksheet.update_cells(cells)
+        self.write_requests += 1
+        return len(changes)
+
+    def get_provisional_game(self):
+        """returns the game that is being answered in the answer key but isn't final yet, or None"""
+
+        return self.get_answer_key().get_provisional_game()
+
+    def _get_provisional_worksheet(self, bookid, rows, cols):
+        """returns the provisional standings worksheet, adding it to the end of the book if it isn't there"""
+        for worksheet in self._get_worksheets(bookid):
+            if worksheet.title == PROVISIONAL_SHEET:
+                return worksheet
+
+        log.debug("Adding the %s sheet to %s" % (PROVISIONAL_SHEET, bookid))
+        worksheet = self._open_spreadsheet(bookid).add_worksheet(title=PROVISIONAL_SHEET, rows=rows, cols=cols)
+        self._invalidate_handles(bookid)
+        self.provisional_snapshot = []
+        return worksheet
+
+    def write_provisional_standings(self, new_data, game_id, ordered=None):
+        """Publishes standings that include game_id before it is final to the provisional sheet.
+        Only the cells that changed since the last time are written.
+
+        returns the number of cells that changed, None if it failed
+        """
+        leader_sheet_id = self.drive_files['leaderboard']['id']
+        special_users = self.secrets.get_previous_winners(self.team_folder)
+
+        try:
+            rows = [["Provisional standings including %s. They aren't final until the game is marked ready." % game_id],
+                    PROVISIONAL_HEADERS]
+            rows += self._get_leaderboard_rows(new_data, self._count_games(leader_sheet_id) + 1, special_users, ordered)
+
+            worksheet = self._get_provisional_worksheet(leader_sheet_id, len(rows), len(PROVISIONAL_HEADERS))
+            changed = self._write_cell_diff(worksheet, self.provisional_snapshot, rows)
+            self.provisional_snapshot = rows
+
+            log.info("Provisional standings for %s: %s cells changed" % (game_id, changed))
+            return changed
+
+        except Exception as error:
+            log.error('Unable to write provisional standings to %s: %s' % (leader_sheet_id, error))
+            log.error(traceback.print_exc())
+            # we don't know what made it to the sheet anymore
+            self.provisional_snapshot = None
+            return None
+
+    def remove_provisional_standings(self):
+        """removes the provisional standings sheet once the official standings are written.
+        returns True if there was one
+        """
+        leader_sheet_id = self.drive_files['leaderboard']['id']
+
+        try:
+            for worksheet in self._get_worksheets(leader_sheet_id):
+                if worksheet.title == PROVISIONAL_SHEET:
+                    self._open_spreadsheet(leader_sheet_id).del_worksheet(worksheet)
+                    self._invalidate_handles(leader_sheet_id)
+                    self.provisional_snapshot = None
+                    return True
+            return False
+
+        except Exception as error:
+            log.error('Unable to remove the provisional standings from %s: %s' % (leader_sheet_id, error))
+            log.error(traceback.print_exc())
+            return False
 
     def update_answerkey_results(self, rows):
         """takes the game we just added to the leaderboard and updates the answer key so
@@ -671,12 +1349,10 @@ class DriveManager():
         leader_sheet_id = self.drive_files['leaderboard']['id']
 
         try:
-            spreadsheet = self.gc.open_by_key(leader_sheet_id)
-            worksheet = spreadsheet.get_worksheet(SheetKeys.ANSWERKEY_SHEET.value)
-
             for row in rows:
                 log.debug("Overwriting answer key results column for game %s" % (int(row) - 1))
-                worksheet.update_cell(row, SheetKeys.LEADERBOARD_ADDED_COLUMN.value, SheetKeys.LEADER_WRITTEN_SUCCESS.value)
+            self.get_answer_key().mark_written(rows)
+            self.write_requests += len(rows)
             log.debug("Done overwriting data")
             return True
 
@@ -684,7 +1360,7 @@ class DriveManager():
             log.error('attempted to open with key: %s on sheet %s' % (leader_sheet_id, SheetKeys.ANSWERKEY_SHEET.value))
             log.error('An error occurred: %s' % error)
             log.error(traceback.print_exc())
-            sys.exit(-1)
+            raise _sheets_error(error, "Unable to mark games %s written in %s" % (rows, leader_sheet_id))
 
     def get_gameday_form(self, form_num):
         """attempts to get a form named GWG form num. Returns None if there isn't one."""
@@ -701,26 +1377,21 @@ class DriveManager():
         sheet_key = self.drive_files['leaderboard']['id']
 
         try:
-            spreadsheet = self.gc.open_by_key(sheet_key)
-            worksheet = spreadsheet.get_worksheet(1)
-            lines = worksheet.get_all_values()
-
-            # find matching game line
-            for x in range(len(lines)):
-                line = lines[x]
-                if line[0] == game_id:
-
-                    # 2018/01/01
-                    if len(line[1]) != 10:
-                        return True
-
-                    #add line minus last column since that is the trigger for file being run.
-                    raw_date = line[1]
-                    actual_starttime = self._get_start_time(raw_date, self.team_folder)
-                    worksheet.update_cell(x + 1, 2, actual_starttime)
-                    return True
-            log.debug("Failure finding game time to update.")
-            return False
+            answer_key = self.get_answer_key()
+            raw_date = answer_key.get_start_time(game_id)
+
+            if raw_date is None:
+                log.debug("Failure finding game time to update.")
+                return False
+
+            # 2018/01/01
+            if len(raw_date) != 10:
+                return True
+
+            actual_starttime = self._get_start_time(raw_date, self.team_folder)
+            answer_key.set_start_time(game_id, actual_starttime)
+            self.write_requests += 1
+            return True
 
         except Exception as error:
             log.error('attempted to overwrite new game time on sheet %s game %s' % (sheet_key, game_id))
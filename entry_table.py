@@ -0,0 +1,178 @@
+"""A response sheet (or a scored game sheet) held as columns, with its timestamps parsed once.
+
+Timestamps are parsed with a fixed format parser into integer seconds since 1970 of the sheet's
+own wall clock time, so every later comparison is an int compare. Google forms appends responses
+in the order they come in, so the timestamp column is almost always sorted and the late entry
+cutoff is a binary search. If it isn't sorted every row is compared instead.
+"""
+import re
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from dateutil import tz
+
+# google forms writes timestamps like 05/10/2018 19:02:03
+ENTRY_TIME_FORMAT = "%d/%m/%Y %H:%M:%S"
+# the answer key and game sheets use 2018/10/05 19:00
+RESULT_TIME_FORMAT = "%Y/%m/%d %H:%M"
+# what create_game_history writes into a game sheet
+SHEET_TIME_FORMAT = "%Y/%m/%d %H:%M:%S"
+
+# format: (date regex, its (year, month, day) groups, time regex). Dates and times are parsed
+# separately and cached, a sheet only has a few distinct days in it
+_FORMATS = {
+    ENTRY_TIME_FORMAT: (re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})"), (3, 2, 1),
+                        re.compile(r"(\d{1,2}):(\d{1,2}):(\d{1,2})")),
+    RESULT_TIME_FORMAT: (re.compile(r"(\d{4})/(\d{1,2})/(\d{1,2})"), (1, 2, 3),
+                         re.compile(r"(\d{1,2}):(\d{1,2})")),
+}
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_ORDINAL = _EPOCH.toordinal()
+
+
+@lru_cache(maxsize=None)
+def get_timezone(name):
+    """tz.gettz, looked up once per name"""
+    return tz.gettz(name)
+
+
+@lru_cache(maxsize=4096)
+def _parse_date(text, time_format):
+    """returns the epoch of midnight on the date in text, None if it doesn't look right"""
+    date_pattern, groups = _FORMATS[time_format][:2]
+    match = date_pattern.fullmatch(text)
+    if not match:
+        return None
+    try:
+        # datetime does the calendar checks, raising ValueError for the 31st of February
+        day = datetime(*[int(match.group(group)) for group in groups])
+    except ValueError:
+        return None
+    return (day.toordinal() - _EPOCH_ORDINAL) * 86400
+
+
+@lru_cache(maxsize=100000)
+def _parse_clock(text, time_format):
+    """returns the seconds since midnight of the time in text, None if it doesn't look right"""
+    match = _FORMATS[time_format][2].fullmatch(text)
+    if not match:
+        return None
+    fields = [int(field) for field in match.groups()] + [0]
+    hour, minute, second = fields[:3]
+    if hour < 24 and minute < 60 and second < 60:
+        return hour * 3600 + minute * 60 + second
+    return None
+
+
+def to_epoch(when):
+    """takes a naive datetime and returns its seconds since 1970, ignoring microseconds"""
+    return (when.toordinal() - _EPOCH_ORDINAL) * 86400 + when.hour * 3600 + when.minute * 60 + when.second
+
+
+def from_epoch(epoch):
+    """takes seconds since 1970 and returns the naive datetime"""
+    return _EPOCH + timedelta(seconds=epoch)
+
+
+def parse_epoch(timestamp, time_format=ENTRY_TIME_FORMAT):
+    """parses timestamp into seconds since 1970. Same result as dt.strptime(timestamp, time_format)
+    without going through strptime for the formats we know.
+    """
+    if time_format in _FORMATS:
+        parts = timestamp.split(" ")
+        if len(parts) == 2:
+            day = _parse_date(parts[0], time_format)
+            seconds = _parse_clock(parts[1], time_format)
+            if day is not None and seconds is not None:
+                return day + seconds
+
+    # anything unusual goes through strptime so it fails (or not) exactly like it used to
+    return to_epoch(datetime.strptime(timestamp, time_format))
+
+
+@lru_cache(maxsize=4096)
+def _day_text(day):
+    return from_epoch(day * 86400).strftime("%Y/%m/%d")
+
+
+def format_epoch(epoch):
+    """takes seconds since 1970 and returns it in SHEET_TIME_FORMAT"""
+    day, seconds = divmod(epoch, 86400)
+    hour, seconds = divmod(seconds, 3600)
+    minute, second = divmod(seconds, 60)
+    return "%s %02d:%02d:%02d" % (_day_text(day), hour, minute, second)
+
+
+class EntryTable():
+    """Rows of a sheet as columns with a parsed timestamp column.
+
+    epochs holds every row's timestamp in seconds since 1970, or None for a blank one when
+    skip_blank is on. Blank rows are never on time.
+    """
+
+    time_format = None
+    is_sorted = True
+
+    def __init__(self, timestamps=(), columns=None, time_format=ENTRY_TIME_FORMAT, skip_blank=False):
+        self.time_format = time_format
+        self.skip_blank = skip_blank
+        self.timestamps = []
+        self.epochs = []
+        self.columns = {}
+        # rows that have a timestamp and their epochs, for the cutoff search
+        self.timed_rows = []
+        self.timed_epochs = []
+        self.extend(timestamps, columns)
+
+    def __len__(self):
+        return len(self.epochs)
+
+    def extend(self, timestamps, columns=None):
+        """appends rows. columns is a dict of column name to its values for the new rows"""
+        timestamps = list(timestamps)
+        parsed = {}
+        start = len(self.epochs)
+        for row, timestamp in enumerate(timestamps, start):
+            if not timestamp and self.skip_blank:
+                self.epochs.append(None)
+                continue
+
+            epoch = parsed.get(timestamp)
+            if epoch is None:
+                epoch = parsed[timestamp] = parse_epoch(timestamp, self.time_format)
+            if self.timed_epochs and epoch < self.timed_epochs[-1]:
+                self.is_sorted = False
+            self.epochs.append(epoch)
+            self.timed_rows.append(row)
+            self.timed_epochs.append(epoch)
+
+        self.timestamps += timestamps
+        for name, values in (columns or {}).items():
+            self.columns.setdefault(name, [None] * start).extend(values)
+
+    def column(self, name):
+        return self.columns[name]
+
+    def on_time_rows(self, cutoff):
+        """returns the rows entered at or before cutoff (epoch seconds), in row order"""
+        if self.is_sorted:
+            return self.timed_rows[:bisect_right(self.timed_epochs, cutoff)]
+        return [row for row, epoch in zip(self.timed_rows, self.timed_epochs) if epoch <= cutoff]
+
+    def late_rows(self, cutoff):
+        """returns the rows entered after cutoff (epoch seconds), in row order"""
+        if self.is_sorted:
+            return self.timed_rows[bisect_right(self.timed_epochs, cutoff):]
+        return [row for row, epoch in zip(self.timed_rows, self.timed_epochs) if epoch > cutoff]
+
+    def on_time(self, cutoff):
+        """returns True or False for every row, True if it was entered at or before cutoff"""
+        on_time = [False] * len(self.epochs)
+        for row in self.on_time_rows(cutoff):
+            on_time[row] = True
+        return on_time
+
+    def format_time(self, row):
+        """returns row's timestamp in SHEET_TIME_FORMAT"""
+        return format_epoch(self.epochs[row])
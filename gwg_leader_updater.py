@@ -3,13 +3,28 @@ import logging
 import prawcore
 import sys
 import traceback
-from datetime import datetime as dt
+from datetime import date, datetime as dt
 from time import sleep
 
+from api_metrics import metrics, METRICS_FILE
 from drive_manager import DriveManager
+from entry_table import EntryTable, to_epoch
+from http_transport import transport
+from message_queue import MessageQueue, OUTBOX_FILE
 from praw_login import r
+from rate_limit import TokenBucket
+from schedule_cache import ScheduleCache
+from scoring import score_entries
 from secret_manager import SecretManager
+from standings_index import StandingsIndex
+from standings_store import StandingsStore, STANDINGS_FILE
+from team_pool import MAX_TEAM_WORKERS, new_team_pool, run_for_teams
+from update_scheduler import UpdateScheduler
 LOGGER_NAME = "gwg_poster"
+# provisional standings are published at most this often per team
+PROVISIONAL_INTERVAL = 2 * 60
+# how long a run that is about to exit waits for queued reddit messages to go out
+OUTBOX_FLUSH_TIMEOUT = 5 * 60
 
 class GWGLeaderUpdater:
 
@@ -17,12 +32,21 @@ class GWGLeaderUpdater:
     gdrive = None
     gwg_args = None
     secrets = None
+    outbox = None
+    standings = None
+    standings_index = None
+    entry_tables = None
+    provisional_bucket = None
 
-    def __init__(self, gdrive, secrets, gwg_args):
+    def __init__(self, gdrive, secrets, gwg_args, outbox=None, standings=None):
         self.gdrive = gdrive
         self.secrets = secrets
         self.gwg_args = gwg_args
+        self.outbox = outbox
+        self.standings = standings
         self.log = logging.getLogger(LOGGER_NAME)
+        self.entry_tables = {}
+        self.provisional_bucket = TokenBucket(1.0 / PROVISIONAL_INTERVAL)
 
     def get_list_of_entries(self, files):
         """This function accepts a list of files that we will go through
@@ -37,12 +61,45 @@ class GWGLeaderUpdater:
         self.log.debug("Getting new GWG entries...")
 
         #sort files by creation date so we read oldest files first(earlier games)
+        #this is the official read, so every row prefetched before is checked again
         for file in sorted_files:
-            new_data.append(self.gdrive.get_file_entries(file))
+            new_data.append(self.gdrive.get_file_entries(file, verify=True))
 
         self.log.debug("Done getting new GWG entires.")
         return new_data
 
+    def get_entry_table(self, game):
+        """returns the EntryTable of a game from get_file_entries. If we already have one for
+        the rows before game['new_from'] only the new rows are parsed and added to it.
+        """
+        data_line = game['data'][1:]
+        new_from = max(game.get('new_from', 0) - 1, 0)
+        entries = self.entry_tables.get(game.get('id'))
+
+        if entries is None or not new_from or len(entries) != new_from:
+            entries = EntryTable([data[0] for data in data_line])
+        else:
+            entries.extend([data[0] for data in data_line[new_from:]])
+
+        if game.get('id'):
+            # only the latest game's table is kept, older games are scored
+            self.entry_tables = {game['id']: entries}
+        return entries
+
+    def prefetch_responses(self):
+        """reads what has come in on the newest response sheet so far. Run before and during a
+        game so scoring it afterwards only has the last few entries left to read and parse.
+        Returns how many entries it has
+        """
+        files = self.gdrive.get_drive_filetype('responses')
+        if not files:
+            return 0
+
+        newest = max(files, key=lambda x: x['createdDate'])
+        entries = self.get_entry_table(self.gdrive.get_file_entries(newest))
+        self.log.debug("Prefetched %s entries from %s" % (len(entries), newest['title']))
+        return len(entries)
+
     def format_results_data(self, data):
         """returns a formatted string that we like for presentation of results per game."""
         return data[:2] + ["username"] + data[2:] + ["N/A"]
@@ -134,10 +191,14 @@ class GWGLeaderUpdater:
             num_late_entries = 0
             late_user_data = {'users': [], 'game_start': game_time_readable}
 
-            for data in data_line:
-                entry_time = dt.strptime(data[0], "%d/%m/%Y %H:%M:%S")
-                date_readable = entry_time.strftime('%Y/%m/%d %H:%M:%S')
-                player_points = self.get_players_points(data, gwg_answers) 
+            # parse the timestamps once (or just the new ones) and score the whole response sheet at once
+            entries = self.get_entry_table(game)
+            scores = score_entries(entries, [[data[2 + x] for data in data_line] for x in range(3)],
+                                   gwg_answers, game_time)
+
+            for row, data in enumerate(data_line):
+                date_readable = entries.format_time(row)
+                player_points = scores['points'][row]
 
                 # legacy support for comment questions concerns (remove in 2018/19 season and just directly accept data[5])
                 cqc = "" if len(data) !=6 else data[5]
@@ -145,8 +206,7 @@ class GWGLeaderUpdater:
                 new_data_line = ["", date_readable, data[1], data[2], "", data[3], "", data[4], player_points, cqc]
 
                 # check if user got their entry in on time. if not, avoid it.
-                entry_time = dt.strptime(data[0], "%d/%m/%Y %H:%M:%S")
-                if (entry_time <= game_time):
+                if scores['on_time'][row]:
                     new_sheet['data'].append(new_data_line)
                 else:
                     num_late_entries += 1 
@@ -277,6 +337,9 @@ class GWGLeaderUpdater:
         if yes, doesn't update the sheet to the leaderboard.
         """
 
+        if self.standings:
+            return self._update_master_list_from_store()
+
         written_games = []
         current_leaders = self.gdrive.get_current_leaders()
         unwritten_games = self.gdrive.get_unwritten_leaderboard_games()
@@ -289,13 +352,135 @@ class GWGLeaderUpdater:
             # add the row in answer key that needs to be updated as "written"
             written_games.append(game['row'])
 
-        if self.gdrive.overwrite_leaderboard(current_leaders):
+        if self.gdrive.overwrite_leaderboard(current_leaders, mode="diff"):
+            self.gdrive.update_answerkey_results(written_games)
+
+        return True
+
+    def _seed_standings(self):
+        """fills an empty standings store from the leaderboard sheet and the games the answer key
+        says are already on it
+        """
+        self.log.info("Standings store is empty. Loading the standings from the leaderboard sheet")
+        self.standings.replace_standings(self.gdrive.get_current_leaders(),
+                                         self.gdrive.get_written_leaderboard_games())
+        self.standings_index = None
+
+    def _get_standings_index(self):
+        """returns the ranking index, built from the standings store the first time it's needed"""
+        if self.standings_index is None:
+            self.standings_index = StandingsIndex(self.standings.get_leaders())
+        return self.standings_index
+
+    def _update_master_list_from_store(self):
+        """update_master_list for when the standings store is the source of truth. Only games
+        the store hasn't seen are applied, then the sheet is rewritten from the store.
+        """
+        if self.standings.is_empty():
+            self._seed_standings()
+
+        written_games = []
+        index = self._get_standings_index()
+
+        for game in self.gdrive.get_unwritten_leaderboard_games():
+            game_id = game['game'][0]
+
+            if self.standings.has_game(game_id):
+                self.log.debug("Game %s is already in the standings store" % game_id)
+            else:
+                newest_results = self.gdrive.get_history_game_points(game['game']) or {}
+                newest_results = {self._trim_username(username): points for username, points in newest_results.items()}
+
+                index.apply_game(newest_results)
+                if not self.standings.apply_game(game_id, newest_results, index.to_dict()):
+                    # someone else applied it first so the index is out of date
+                    self.standings_index = None
+                    index = self._get_standings_index()
+
+            # add the row in answer key that needs to be updated as "written"
+            written_games.append(game['row'])
+
+        if self.gdrive.overwrite_leaderboard(index.to_dict(), mode="diff", ordered=index.ordered()):
             self.gdrive.update_answerkey_results(written_games)
 
         return True
 
+    def update_provisional_standings(self):
+        """Scores the on time entries of the game being answered in the answer key with the
+        answers filled in so far and publishes the standings it would give to the provisional
+        sheet. Nothing is saved, the official standings are still worked out once the game is
+        marked ready. Runs at most once every PROVISIONAL_INTERVAL.
+
+        returns True if provisional standings were published
+        """
+        if not self.provisional_bucket.try_acquire():
+            return False
+
+        game = self.gdrive.get_provisional_game()
+        if not game:
+            return False
+
+        game_id = game['game'][0]
+        files = self.get_pending_game_data([game_id])
+        if not files:
+            self.log.debug("No response sheet for provisional game %s" % game_id)
+            return False
+
+        # the puck drop time is what splits the late entries off
+        self.gdrive.update_game_start_time(game_id)
+        result = self.gdrive.get_games_result(game_id)['result']
+        if len(result[1]) == 10:
+            self.log.debug("No start time for provisional game %s yet" % game_id)
+            return False
+
+        # answers nobody has filled in yet don't match the blank answers of players
+        answers = [[answer for answer in accepted if answer] for accepted in self.get_gwg_answers(result)]
+        game_time = dt.strptime(result[1], "%Y/%m/%d %H:%M")
+
+        responses = self.gdrive.get_file_entries(files[0])
+        entries = self.get_entry_table(responses)
+        data_line = responses['data'][1:]
+
+        points = {}
+        for row in entries.on_time_rows(to_epoch(game_time)):
+            points[data_line[row][1]] = self.get_players_points(data_line[row], answers)
+
+        if self.standings and not self.standings.is_empty():
+            leaders = self.standings.get_leaders()
+        else:
+            leaders = self.gdrive.get_current_leaders()
+
+        provisional = self.add_new_user_points(points, leaders)
+        return self.gdrive.write_provisional_standings(provisional, game_id) is not None
+
+    def reconcile_standings(self, take_sheet=False):
+        """compares the leaderboard sheet with the standings store and logs every difference, like
+        a manual fix an admin made on the sheet. With take_sheet the sheet's standings replace ours.
+
+        returns the list of differences
+        """
+        if self.standings.is_empty():
+            self._seed_standings()
+            return []
+
+        sheet_leaders = self.gdrive.get_current_leaders()
+        differences = self.standings.reconcile(sheet_leaders)
+
+        for username, field, ours, theirs in differences:
+            self.log.info("Standings differ for %s %s: store %s, sheet %s" % (username, field, ours, theirs))
+        self.log.info("Found %s differences between the standings store and the sheet" % len(differences))
+
+        if differences and take_sheet:
+            self.log.info("Replacing the standings store with the sheet")
+            self.standings.replace_standings(sheet_leaders)
+            self.standings_index = None
+
+        return differences
+
     def alert_late_users(self, game, late_users):
         """Takes a list of games and users that entered their GWG entry late.
+
+        The messages are queued on the outbox if we have one, otherwise they are sent right away.
         """
 
         self.log.debug(f"Sending mail to late users: {late_users} for game {game}.")
@@ -311,6 +496,10 @@ Make sure to get this in on time in the future!
 If you think this message was sent in error, please reply to this message with the description of issue you think there may be.
 
 Go Jets Go!"""
+            if self.outbox:
+                self.outbox.put_message(user['name'], subject, body)
+                continue
+
             success = False
             attempts = 0
             while not success and attempts < 5:
@@ -393,8 +582,11 @@ This is an automated message, please PM me if there are any issues.""" % leader_
                 self.log.debug("     Found a thread")
                 if self._valid_date_in_title(submission.created_utc):
                     self.log.debug("        Appropriate thread creation date. Posting...")
-                    comment = submission.reply(self._get_leaderboard_update_body())
-                    comment.disable_inbox_replies()
+                    if self.outbox:
+                        self.outbox.put_reply(submission.id, self._get_leaderboard_update_body())
+                    else:
+                        comment = submission.reply(self._get_leaderboard_update_body())
+                        comment.disable_inbox_replies()
                     self.log.debug("         done notifying reddit of updates")
                     break
 
@@ -418,6 +610,16 @@ def parse_args():
     group.add_argument('--prod', '-p', action='store_true', help='Run in production mode with full subscribed team list')
     parser.add_argument('--debug', '-d', action='store_true', help='debug messages turned on', default=False)
     parser.add_argument('--single', '-s', action='store_true', help='runs only once', default=False)
+    parser.add_argument('--reconcile', '-r', nargs='?', const='report', choices=['report', 'sheet'], default=None,
+                        help='compare the leaderboard sheet with the local standings and quit. "sheet" makes the sheet win')
+    parser.add_argument('--all-teams', '-a', action='store_true', default=False,
+                        help='with --prod, update every team in application_secret.json instead of just 52')
+    parser.add_argument('--fixed-interval', '-f', type=int, nargs='?', const=60*60, default=None, metavar='SECONDS',
+                        help='sleep a fixed number of seconds between updates (default 3600) instead of following the game schedule')
+    parser.add_argument('--provisional', action='store_true', default=False,
+                        help='publish provisional standings to the Provisional sheet while the answer key is filled in')
+    parser.add_argument('--metrics', '-m', nargs='?', const=METRICS_FILE % "leader_updater", default=None, metavar='PROM_FILE',
+                        help='count every API call and write per cycle totals to a Prometheus text file (default %s)' % (METRICS_FILE % "leader_updater"))
 
     gwg_args = parser.parse_args()
 
@@ -429,51 +631,125 @@ def init_logger(level):
     log = logging.getLogger(LOGGER_NAME)
     log.info("Started gwg_poster")
 
+def run_cycle(gdrive, gwg_updater, team, gwg_args, prefetch=False):
+    """runs one update of team's leaderboard. Returns True if there was anything to do.
+    When there is no game to score, provisional standings are published (with --provisional)
+    and prefetch reads the newest response sheet ahead of time
+    """
+    gdrive.update_drive_files()
+
+    pending_games = gdrive.new_response_data_available()
+
+    if pending_games != []:
+        gwg_updater.manage_gwg_leaderboard(pending_games)
+    else:
+        published = False
+        try:
+            if gwg_args.provisional:
+                published = gwg_updater.update_provisional_standings()
+            if prefetch and not published:
+                gwg_updater.prefetch_responses()
+        except Exception as e:
+            logging.getLogger(LOGGER_NAME).error("Team %s unable to read ahead for the current game: %s" % (team, e))
+
+    new_leaderboard_data = gdrive.new_leaderboard_data()
+    if new_leaderboard_data:
+        gwg_updater.update_master_list()
+        if gwg_args.provisional:
+            gdrive.remove_provisional_standings()
+        if not gwg_args.debug:
+            gwg_updater.notify_reddit(team)
+
+    logging.getLogger(LOGGER_NAME).info("Team %s sheet handle cache this cycle: %s, leaderboard cells changed: %s" %
+                                        (team, gdrive.get_handle_cache_stats(), gdrive.leaderboard_cells_changed))
+    return bool(pending_games) or new_leaderboard_data
+
 def main():
     gwg_args = parse_args()
 
     level = logging.DEBUG if gwg_args.debug else logging.INFO
     init_logger(level)
 
+    transport.route_praw(r)
+    if gwg_args.metrics:
+        metrics.enable(gwg_args.metrics)
+        metrics.instrument_praw(r)
+
     secrets = SecretManager()
     
-    team = None
+    teams = None
 
     if gwg_args.test:
-        team = "-1"
+        teams = ["-1"]
     elif gwg_args.prod:
-        team = "52"
+        teams = secrets.get_teams() if gwg_args.all_teams else ["52"]
     else:
         logging.getLogger(LOGGER_NAME).critical("Something horrible happened because you should always have a single one of the above options on. Quitting.")
         sys.exit()
 
-    gdrive = DriveManager(secrets, team=team, update=False)
-    gwg_updater = GWGLeaderUpdater(gdrive, secrets, gwg_args)
+    # every team shares the outbox (and with it the reddit rate limit) and the google credentials
+    outbox = MessageQueue(OUTBOX_FILE % "leader_updater", r)
+    outbox.start()
+
+    team_updaters = {}
+    for team in teams:
+        gdrive = DriveManager(secrets, team=team, update=False)
+        standings = StandingsStore(STANDINGS_FILE % team)
+        team_updaters[team] = {'gdrive': gdrive,
+                               'updater': GWGLeaderUpdater(gdrive, secrets, gwg_args, outbox=outbox, standings=standings),
+                               'scheduler': UpdateScheduler(ScheduleCache(team))}
+
+    def cycle(team):
+        try:
+            game_day = team_updaters[team]['scheduler'].schedule.is_game_day(date.today())
+        except Exception as e:
+            logging.getLogger(LOGGER_NAME).error("Team %s unable to check for a game today: %s" % (team, e))
+            game_day = False
+        return run_cycle(team_updaters[team]['gdrive'], team_updaters[team]['updater'], team, gwg_args, prefetch=game_day)
+
+    if gwg_args.reconcile:
+        def reconcile(team):
+            team_updaters[team]['gdrive'].update_drive_files()
+            return team_updaters[team]['updater'].reconcile_standings(take_sheet=gwg_args.reconcile == "sheet")
+
+        for team, result in run_for_teams(teams, reconcile).items():
+            print("Team %s: %s differences" % (team, len(result['result'] or [])))
+            for difference in result['result'] or []:
+                print("    %s %s: store %s, sheet %s" % difference)
+        return
+
+    # the same threads (and with them their google clients) are kept for every cycle
+    team_pool = new_team_pool(min(MAX_TEAM_WORKERS, len(teams)))
 
     while True:
-        gdrive.update_drive_files()
-
-        pending_games = gdrive.new_response_data_available()
-
-        if pending_games != []:
-            gwg_updater.manage_gwg_leaderboard(pending_games)
-
-        if gdrive.new_leaderboard_data():
-            gwg_updater.update_master_list()
-            if not gwg_args.debug:
-                gwg_updater.notify_reddit(team)
+        metrics.start_cycle()
+        results = run_for_teams(teams, cycle, pool=team_pool)
+        metrics.end_cycle()
 
         # quit if we are testing instead of running forever
         if gwg_args.test:
             logging.getLogger(LOGGER_NAME).info("Exiting a test run")
+            outbox.flush(OUTBOX_FLUSH_TIMEOUT)
             return
 
         if gwg_args.single:
             logging.getLogger(LOGGER_NAME).info("Exiting early due to --single command on cli")
+            outbox.flush(OUTBOX_FLUSH_TIMEOUT)
             sys.exit()
 
-        sleep_time = 60*60
-        logging.getLogger(LOGGER_NAME).info("No new data available for updating with. Sleeping for %s" % sleep_time)
+        if gwg_args.fixed_interval:
+            sleep_time, reason = gwg_args.fixed_interval, "fixed interval"
+        else:
+            # wake up for whichever team needs us first
+            wakeups = []
+            for team in teams:
+                scheduler = team_updaters[team]['scheduler']
+                scheduler.record_cycle(bool(results[team]['result']), failed=results[team]['error'] is not None)
+                sleep_time, reason = scheduler.next_wakeup()
+                wakeups.append((sleep_time, "team %s %s" % (team, reason)))
+            sleep_time, reason = min(wakeups)
+
+        logging.getLogger(LOGGER_NAME).info("Sleeping for %s seconds: %s" % (sleep_time, reason))
         sleep(sleep_time)
 
 if __name__ == '__main__':
@@ -1,56 +1,139 @@
+from time import perf_counter, sleep
+STARTED = perf_counter()
+
+import os
 import sys
 import json
+import signal
 import logging
 import argparse
+import threading
 import traceback
-from time import sleep
 from datetime import date, datetime, timedelta
 #from datetime import datetime
-from dateutil import tz
-from urllib.request import urlopen
 
-from drive_manager import DriveManager
+from api_metrics import metrics, METRICS_FILE
+from schedule_cache import ScheduleCache
 from secret_manager import SecretManager
-from praw_login import r, USER_NAME
+from team_pool import new_team_pool, run_for_teams
+# drive_manager (gspread and the google api client), message_queue and praw_login (which logs in
+# to reddit) are imported the first time they're needed. Most runs are on off days and never are
+IMPORTED = perf_counter()
+
+# OUTBOX_FILE % "poster", spelled out so checking for undelivered mail doesn't import message_queue
+POSTER_OUTBOX_FILE = 'outbox_poster.json'
+# an off day is answered from a schedule on disk up to this old without asking the statsapi
+OFF_DAY_SCHEDULE_AGE = 3 * 24 * 60 * 60
+# with --daemon, how often a game day is checked until its thread is posted, and what hour
+# (local time) the next day's check is at once every team is done for the day
+DAEMON_GAME_DAY_INTERVAL = 15 * 60
+DAEMON_DAY_START_HOUR = 8
+# how long the list of PMs we've sent is trusted before asking reddit again
+INBOX_REFRESH_INTERVAL = timedelta(hours=1, minutes=30)
 
 gwg_args = None
-gdrive = None
-game_history = None
+r = None
+USER_NAME = None
+reddit_lock = threading.Lock()
+# each team is worked on in its own thread, so its drive manager and game live here
+team_state = threading.local()
+schedules = {}
 participating_teams = [52]
 cached_inbox = None
+inbox_lock = threading.Lock()
+# reminders we queued ourselves, (owner, day). The sent folder only has them once they're delivered
+sent_reminders = set()
+# the day each team's thread was posted (or found posted), so a daemon doesn't ask reddit again
+posted_days = {}
+# each team's DriveManager, kept between checks by a daemon
+gdrives = {}
+outbox = None
+outbox_lock = threading.Lock()
 log = None
+# how long we wait for queued reddit messages to go out before exiting. The rest go next run
+OUTBOX_FLUSH_TIMEOUT = 5 * 60
 
-def _update_todays_game(team):
-    """Updates todays date with and game day info."""
-    global game_history
+def _get_schedule(team):
+    """returns the season schedule cache for team, shared by every lookup in this run"""
+    team = str(team)
+    if team not in schedules:
+        schedules[team] = ScheduleCache(team)
+    return schedules[team]
+
+def get_reddit():
+    """logs in to reddit the first time it's needed and returns the praw instance"""
+    global r
+    global USER_NAME
+
+    with reddit_lock:
+        if r is None:
+            start = perf_counter()
+            import praw_login
+            from http_transport import transport
+
+            transport.route_praw(praw_login.r)
+            if metrics.enabled:
+                metrics.instrument_praw(praw_login.r)
+            USER_NAME = praw_login.USER_NAME
+            r = praw_login.r
+            log.info("Logged in to reddit in %.3fs" % (perf_counter() - start))
+    return r
+
+def get_outbox():
+    """starts the outbox the first time we have mail to send"""
+    global outbox
+
+    with outbox_lock:
+        if outbox is None:
+            from message_queue import MessageQueue
+
+            outbox = MessageQueue(POSTER_OUTBOX_FILE, get_reddit())
+            outbox.start()
+    return outbox
+
+def _has_undelivered_mail():
+    """checks the outbox file for mail an earlier run didn't get out"""
+    try:
+        with open(POSTER_OUTBOX_FILE) as json_data:
+            return bool(json.load(json_data))
+    except (IOError, ValueError):
+        return False
+
+def flush_outbox():
+    """waits for queued reddit messages to go out, starting the outbox if an earlier run left mail"""
+    if outbox is None and not _has_undelivered_mail():
+        return
+
+    if not get_outbox().flush(OUTBOX_FLUSH_TIMEOUT):
+        log.error("%s messages weren't delivered yet. They will be sent next run" % outbox.pending())
+
+def _get_today():
+    """returns the day we are posting for, today or the day passed with --test"""
+    if gwg_args.test:
+        return gwg_args.test
 
     today = date.today()
-    today = str(today.year) + "-" + str(today.month) + "-" + str(today.day)
+    return str(today.year) + "-" + str(today.month) + "-" + str(today.day)
 
+def _update_todays_game(team):
+    """Updates todays date with and game day info."""
     if gwg_args.test:
         team = 52
-        today = gwg_args.test
-
-    attempts = 0
-    while attempts < 2:
-        try:
-            attempts +=1
-            data = urlopen("https://statsapi.web.nhl.com/api/v1/schedule?schedule.linescore&startDate=" + today + "&endDate=" + today + "&teamId=" + str(team))
-            game_history = json.load(data)['dates']
-            return
-        except Exception as e:
-            log.error("exception occurred in is_game_day. Trying again shortly")
-            log.error(str(e))
-            sleep(15)
-
-    game_history = None
+
+    team_state.game_history = _get_schedule(team).get_dates(_get_today())
 
 def is_game_day(team):
-    """Checks if the Winnipeg jets are playing today. If so, returns true."""
+    """Checks if the Winnipeg jets are playing today. If so, returns true.
+
+    An off day is answered from the schedule on disk when it's recent enough, without the network.
+    """
+    if _get_schedule(team).get_cached_dates(_get_today(), OFF_DAY_SCHEDULE_AGE) == []:
+        team_state.game_history = []
+        return False
 
     _update_todays_game(team)
 
-    return game_history != [] and game_history != None
+    return team_state.game_history != [] and team_state.game_history != None
 
 def _get_team_name(home=True):
     """gets the team name of the requested home/away pairing"""
@@ -58,32 +141,17 @@ def _get_team_name(home=True):
     if not home:
         team_type = "away"
 
-    return game_history[0]['games'][0]['teams'][team_type]['team']['name']
+    return team_state.game_history[0]['games'][0]['teams'][team_type]['team']['name']
 
 def _get_game_number(team):
     """Returns what the next game number it is for team team."""
-    win = loss = otl = 0
     result = None
-    team = str(team)
-    if team == "-1":
-        team = "52" 
-
-    game = game_history[0]['games'][0]['teams']
-
-    if str(game['home']['team']['id']) == str(team):
-        game = game['home']['leagueRecord']
-    else:
-        game = game['away']['leagueRecord']
-
-    win = game['wins']
-    loss = game['losses']
-    otl = game['ot']
 
     if gwg_args.game83:
         result = "83"
     else:
-        # +1 because 'next' game
-        result = str(win + loss + otl + 1)
+        # counted from the schedule instead of the league record so a stale record can't skip a game
+        result = str(_get_schedule(team).get_game_number(_get_today()))
 
     log.debug("We're using game %s" % result)
     return result
@@ -99,12 +167,7 @@ def _check_title_override(game):
 
     Returns None if there isn't a thread title provided.
     """
-    file_id = gdrive.get_drive_filetype('leaderboard')['id']
-    titles = gdrive.get_sheet_single_column(file_id, 10, sheet=1)
-
-    if titles[int(game)] != "":
-        return titles[int(game)]
-    return None
+    return team_state.gdrive.get_answer_key().get_title_override(game)
 
 def generate_post_title(team=52):
     """Creates the title of the post
@@ -135,7 +198,7 @@ def generate_post_title(team=52):
 
 def generate_post_contents(gwg_link):
     """create the threads body. include the form link for participation."""
-    leader_link = gdrive.get_drive_filetype('leaderboard')['alternateLink']
+    leader_link = team_state.gdrive.get_drive_filetype('leaderboard')['alternateLink']
     analytics_link = gwg_link[:-35] + "viewanalytics"
 
     return  ("""[Link to current GWG challenge](%s)  \n\n
@@ -153,15 +216,21 @@ NOTE: LATE ENTIRES WILL NOT BE ACCEPTED! DEADLINE WILL BE OFFICIAL NHL PUCK DROP
 def refresh_inbox_pms():
     global cached_inbox
 
-    if not cached_inbox or datetime.now() - cached_inbox['time'] < timedelta(hours=1, minutes=30):
-        log.info("Refreshing mailbox")
-        cached_inbox = {'mail': r.inbox.sent(limit=64), 'time': datetime.now()}
+    with inbox_lock:
+        if not cached_inbox or datetime.now() - cached_inbox['time'] >= INBOX_REFRESH_INTERVAL:
+            log.info("Refreshing mailbox")
+            # praw hands back a generator, which could only be gone through once
+            cached_inbox = {'mail': list(get_reddit().inbox.sent(limit=64)), 'time': datetime.now()}
 
 def already_sent_reminder(owner):
     """Checks if we've already reminded someone about them needing to create a GWG form. 
     If so, returns True, if not, returns false. No need to spam the users.
     """
 
+    if (owner.lower(), str(date.today())) in sent_reminders and not gwg_args.test:
+        log.info("We've already alerted %s. Ignoring the warning" % owner)
+        return True
+
     refresh_inbox_pms()
 
     for message in cached_inbox['mail']:
@@ -182,6 +251,8 @@ def already_sent_reminder(owner):
 def alert_gwg_owners(team, subject=None, body=None):
     """Direct messages the owners of the GWG challenge that there isn't a form available
     for todays game and that their players are angry!!!
+
+    The messages are queued on the outbox and delivered in the background.
     """
 
     owners = secrets.get_team_contacts(team)
@@ -192,26 +263,14 @@ def alert_gwg_owners(team, subject=None, body=None):
         today = date.today()
         body = "Hey you! Log in and make a form for todays GWG challenge, ya bum! It's {} and your team plays today. Get on it!!!".format(today)
 
-    mail_success = True
     for owner in owners:
         if already_sent_reminder(owner):
             continue
 
-        success = False
-        attempts = 0
-        while not success and attempts < 5:
-            try:
-                r.redditor(owner).message(subject, body)
-                success = True
-            except Exception as e:
-                log.error("Exception trying to mail redditor %s. Waiting 60 and trying again." % owner)
-                log.error("error: %s" % e)
-                log.error(traceback.print_stack())
-                attempts += 1
-                sleep(60)
-        if not success:
-            mail_success = False
-    return mail_success
+        get_outbox().put_message(owner, subject, body)
+        if "Hey you!" in body:
+            sent_reminders.add((owner.lower(), str(date.today())))
+    return True
 
 def attempt_new_gwg_post(url, team=-1):
     """Submits, creates and posts the GWG challenge post."""
@@ -221,7 +280,7 @@ def attempt_new_gwg_post(url, team=-1):
     reddit_name = secrets.get_reddit_name(team)
 
     try:
-        result = r.subreddit(reddit_name).submit(title, selftext=contents)
+        result = get_reddit().subreddit(reddit_name).submit(title, selftext=contents)
         result.disable_inbox_replies()
         log.info("Successfully posted new thread to %s!" % reddit_name)
         return result
@@ -242,7 +301,8 @@ def check_same_day(requested_date):
 def already_posted_gwg(team):
     """Checks if we've already posted the GWG thread in the team team sub"""
 
-    for submission in r.redditor(USER_NAME).submissions.new():
+    reddit = get_reddit()
+    for submission in reddit.redditor(USER_NAME).submissions.new():
         posted_today = check_same_day(submission.created_utc)
         
         if (submission.subreddit_name_prefixed.lower() == "r/" + team.lower() and 
@@ -253,7 +313,7 @@ def already_posted_gwg(team):
     return False
 
 def get_gameday_form_url(team):
-    gwg_form = gdrive.get_gameday_form(_get_game_number(team))
+    gwg_form = team_state.gdrive.get_gameday_form(_get_game_number(team))
 
     # message my owner and cry that we don't have a form to post
     if not gwg_form:
@@ -264,15 +324,26 @@ def get_gameday_form_url(team):
     return gwg_form['embedLink']
 
 def init_gdrive(team):
-    global gdrive
-    gdrive = DriveManager(secrets, team=str(team))
+    """sets up team's DriveManager. One kept from an earlier check only asks drive what changed"""
+    from drive_manager import DriveManager
+
+    team = str(team)
+    if team in gdrives:
+        gdrives[team].update_drive_files()
+    else:
+        gdrives[team] = DriveManager(secrets, team=team)
+    team_state.gdrive = gdrives[team]
 
 def gwg_poster_runner(team=-1):
-    """Checks if we need to post a new thread and if so, does it."""
+    """Checks if we need to post a new thread and if so, does it.
+
+    returns True if there's nothing left to do for team today
+    """
 
     team_reddit = secrets.get_reddit_name(team)
     game_day = is_game_day(team)
-    already_posted = already_posted_gwg(team_reddit)
+    # reddit is only asked once we know there's a game to post for
+    already_posted = game_day and (posted_days.get(team) == _get_today() or already_posted_gwg(team_reddit))
 
     if game_day and not already_posted:
         init_gdrive(team)
@@ -287,6 +358,7 @@ def gwg_poster_runner(team=-1):
                                 subject=subject,
                                 body="Unable to create new gwg post. Sorry, we will try later.")
             else:
+                posted_days[team] = _get_today()
                 subject = ("Success posting todays GWG to %s!" % team_reddit)
                 alert_gwg_owners(team, 
                                 subject=subject,
@@ -296,15 +368,57 @@ def gwg_poster_runner(team=-1):
     elif not game_day:
         log.info("Doing nothing since it isn't game day for team %s." % team)
     elif already_posted:
+        posted_days[team] = _get_today()
         log.info("Already posted GWG challenge today %s." % team)
 
+    return posted_days.get(team) == _get_today() or not game_day
+
+def _get_teams():
+    if gwg_args.test:
+        return [-1]
+    return secrets.get_teams() if gwg_args.all_teams else participating_teams
+
 def main():
 
     if gwg_args.test:
         gwg_poster_runner(-1)
     else:
-        for team in participating_teams:
-            gwg_poster_runner(team)
+        run_for_teams(_get_teams(), gwg_poster_runner)
+
+def get_next_check(results, now=None):
+    """returns (seconds, reason) until the daemon checks again. A team with a game it hasn't
+    posted for (no form yet, or it failed) is checked again in DAEMON_GAME_DAY_INTERVAL,
+    otherwise we wait for DAEMON_DAY_START_HOUR tomorrow.
+    """
+    now = now or datetime.now()
+    waiting = [str(team) for team, result in results.items() if result['error'] or not result['result']]
+    if waiting:
+        return DAEMON_GAME_DAY_INTERVAL, "teams %s still have a GWG to post" % ", ".join(waiting)
+
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    next_check = tomorrow + timedelta(hours=DAEMON_DAY_START_HOUR)
+    return (next_check - now).total_seconds(), "every team is done for today"
+
+def run_daemon():
+    """checks every team like main() does, then sleeps until the next check. The reddit
+    session, drive managers, schedules and the PMs we've sent stay in memory between checks.
+    """
+    # stopping the service still delivers what's in the outbox
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    # the same threads (and with them their google clients) are kept for every check
+    team_pool = new_team_pool()
+
+    while True:
+        start = perf_counter()
+        if gwg_args.metrics:
+            metrics.start_cycle()
+
+        results = run_for_teams(_get_teams(), gwg_poster_runner, pool=team_pool)
+        metrics.end_cycle()
+
+        sleep_time, reason = get_next_check(results)
+        log.info("Check took %.3fs. Sleeping %s minutes, %s" % (perf_counter() - start, int(sleep_time // 60), reason))
+        sleep(sleep_time)
 
 def setup():
     global gwg_args
@@ -317,6 +431,12 @@ def setup():
     group.add_argument('--prod', '-p', action='store_true', help='Run in production mode with full subscribed team list')
     parser.add_argument('--game83', action='store_true', help='forces a GWG challenge to not be present', default=False)
     parser.add_argument('--debug', '-d', action='store_true', help='debug messages turned on', default=False)
+    parser.add_argument('--all-teams', '-a', action='store_true', default=False,
+                        help='with --prod, post for every team in application_secret.json instead of participating_teams')
+    parser.add_argument('--metrics', '-m', nargs='?', const=METRICS_FILE % "poster", default=None, metavar='PROM_FILE',
+                        help='count every API call and write the totals for this run to a Prometheus text file (default %s)' % (METRICS_FILE % "poster"))
+    parser.add_argument('--daemon', action='store_true', default=False,
+                        help='keep running and check again on a schedule instead of exiting after one check')
 
     gwg_args = parser.parse_args()
 
@@ -332,9 +452,25 @@ def setup():
     log = logging.getLogger("gwg_poster")
     log.info("Stared gwg_poster")
 
+    if gwg_args.metrics:
+        # praw is instrumented when we log in
+        metrics.enable(gwg_args.metrics)
+        metrics.start_cycle()
+
     secrets = SecretManager()
+    log.info("Started in %.3fs (imports took %.3fs)" % (perf_counter() - STARTED, IMPORTED - STARTED))
 
 if __name__ == '__main__':
     setup()
-    main()
-    log.info("Done running poster")
+    try:
+        if gwg_args.daemon:
+            run_daemon()
+        else:
+            main()
+    except KeyboardInterrupt:
+        log.info("Stopping the poster")
+    finally:
+        flush_outbox()
+    if not gwg_args.daemon:
+        metrics.end_cycle()
+    log.info("Done running poster in %.3fs" % (perf_counter() - STARTED))
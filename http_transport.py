@@ -0,0 +1,148 @@
+"""One pool of keep-alive connections for every HTTP client we use.
+
+gspread, the drive service, praw and the NHL statsapi fetch all used to open their own
+connections (a new httplib2.Http per refresh, a bare urlopen per schedule request), so busy
+cycles paid for a TLS handshake on almost every call. They now all send through one requests
+HTTPAdapter, which keeps a pool of connections per host. Sessions that need their own headers
+(praw's user agent, gspread's token) just mount the shared adapter. requests asks for gzip by
+default and every request gets DEFAULT_TIMEOUT unless the caller set its own.
+
+get_pool_stats() reports, per host, the requests sent, connections opened and idle sockets
+kept open since the last time it was asked, so reuse can be watched per polling cycle.
+"""
+import logging
+import threading
+
+import httplib2
+import requests
+from requests.adapters import HTTPAdapter
+
+# one pool per host. We talk to a handful of google hosts, reddit and the statsapi
+POOL_HOSTS = 20
+# connections kept open per host, enough for every thread of the team pool
+POOL_SIZE = 10
+# (connect, read) seconds for requests that don't set their own
+DEFAULT_TIMEOUT = (10, 60)
+# httplib2 decodes these itself, requests already has
+_DECODED_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding')
+
+log = logging.getLogger("http_transport")
+
+
+class TimeoutSession(requests.Session):
+    """a requests session that uses timeout for every request that doesn't set one"""
+
+    timeout = None
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().request(method, url, **kwargs)
+
+
+class HttplibAdapter():
+    """Looks enough like an httplib2.Http for oauth2client and the google api client, but sends
+    every request through a pooled requests session.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=httplib2.DEFAULT_MAX_REDIRECTS,
+                connection_type=None):
+        response = self.session.request(method, uri, data=body, headers=headers, allow_redirects=redirections > 0)
+        content = response.content
+
+        info = {key.lower(): value for key, value in response.headers.items() if key.lower() not in _DECODED_HEADERS}
+        info['status'] = str(response.status_code)
+        info['content-length'] = str(len(content))
+        return httplib2.Response(info), content
+
+
+class Transport():
+    """The shared connection pools and the sessions that use them"""
+
+    adapter = None
+    session = None
+
+    def __init__(self, pool_hosts=POOL_HOSTS, pool_size=POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        self.timeout = timeout
+        self.adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size)
+        self.lock = threading.Lock()
+        self.last_counts = {}
+        # for plain requests that don't need headers of their own
+        self.session = self.new_session()
+
+    def mount(self, session):
+        """makes session send through the shared pools"""
+        session.mount("https://", self.adapter)
+        session.mount("http://", self.adapter)
+        return session
+
+    def new_session(self):
+        """returns a session of its own (headers, cookies) that shares the pools"""
+        session = TimeoutSession()
+        session.timeout = self.timeout
+        return self.mount(session)
+
+    def get(self, url, **kwargs):
+        """GETs url with the shared session and returns the body. Raises for error statuses"""
+        response = self.session.get(url, **kwargs)
+        response.raise_for_status()
+        return response.content
+
+    def http(self):
+        """returns an httplib2.Http look alike for oauth2client and the drive service"""
+        return HttplibAdapter(self.new_session())
+
+    def route_gspread(self, gc):
+        """sends a gspread client's requests through the shared pools"""
+        gc.session.requests_session = self.new_session()
+        return gc
+
+    def route_praw(self, reddit):
+        """sends praw's requests through the shared pools, keeping its session (and user agent)"""
+        try:
+            self.mount(reddit._core._authorizer._authenticator._requestor._http)
+        except AttributeError:
+            log.error("Unable to find praw's session, reddit calls won't share connections")
+        return reddit
+
+    def _get_pools(self):
+        pools = self.adapter.poolmanager.pools
+        with pools.lock:
+            return list(pools._container.values())
+
+    def _count_open_sockets(self, pool):
+        if pool.pool is None:
+            return 0
+        return len([conn for conn in list(pool.pool.queue) if conn is not None and conn.sock is not None])
+
+    def get_pool_stats(self):
+        """returns {host: {'requests', 'connections', 'reused', 'open_sockets'}} for every host
+        that was used since the last call. connections is how many new connections (handshakes)
+        were made, open_sockets the idle keep-alive sockets the pool is holding now.
+        """
+        stats = {}
+        with self.lock:
+            for pool in self._get_pools():
+                host = "%s:%s" % (pool.host, pool.port)
+                counts = (pool.num_requests, pool.num_connections)
+                last = self.last_counts.get(host, (0, 0))
+                # a pool that was dropped and made again starts counting from 0
+                if counts[0] < last[0]:
+                    last = (0, 0)
+                self.last_counts[host] = counts
+
+                num_requests = counts[0] - last[0]
+                new_connections = counts[1] - last[1]
+                if not num_requests and not new_connections:
+                    continue
+                stats[host] = {'requests': num_requests,
+                               'connections': new_connections,
+                               'reused': max(num_requests - new_connections, 0),
+                               'open_sockets': self._count_open_sockets(pool)}
+        return stats
+
+
+transport = Transport()
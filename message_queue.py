@@ -0,0 +1,217 @@
+import json
+import logging
+import os
+import threading
+import traceback
+import uuid
+from time import time
+
+import prawcore.exceptions
+
+from rate_limit import TokenBucket
+
+OUTBOX_FILE = 'outbox_%s.json'
+# reddit allows 60 api requests a minute for an oauth client. We leave half for everything else
+REDDIT_MESSAGES_PER_MINUTE = 30
+REDDIT_MESSAGE_BURST = 5
+MAX_ATTEMPTS = 5
+RETRY_DELAY = 30
+# errors that won't go away by trying again
+UNDELIVERABLE = (prawcore.exceptions.NotFound, prawcore.exceptions.Forbidden)
+
+log = logging.getLogger("message_queue")
+
+
+class MessageQueue():
+    """Outbound reddit private messages and comment replies.
+
+    Messages are saved to disk as soon as they are queued and delivered by a background
+    thread, rate limited by a token bucket. A message that fails is tried again later with an
+    exponential backoff while the rest of the queue keeps going, so nobody waits on mail
+    delivery. Anything not delivered when the program stops is sent on the next start.
+    """
+
+    reddit = None
+    queue_file = None
+    items = None
+
+    def __init__(self, queue_file, reddit, bucket=None, max_attempts=MAX_ATTEMPTS, retry_delay=RETRY_DELAY):
+        self.queue_file = queue_file
+        self.reddit = reddit
+        self.bucket = bucket or TokenBucket.per_minute(REDDIT_MESSAGES_PER_MINUTE, REDDIT_MESSAGE_BURST)
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+        self.condition = threading.Condition()
+        self.sending = None
+        self.stopped = False
+        self.worker = None
+        self.items = self._load()
+
+        if self.items:
+            log.info("Loaded %s undelivered messages from %s" % (len(self.items), queue_file))
+
+    def _load(self):
+        try:
+            with open(self.queue_file) as json_data:
+                return json.load(json_data)
+        except (IOError, ValueError):
+            return []
+
+    def _save(self):
+        """writes the queue to disk. Must be called holding self.condition"""
+        try:
+            temp_file = self.queue_file + ".tmp"
+            with open(temp_file, "w") as json_data:
+                json.dump(self.items, json_data)
+            os.replace(temp_file, self.queue_file)
+
+        except IOError as error:
+            log.error("Unable to save the outbox: %s" % error)
+
+    def _put(self, item):
+        with self.condition:
+            for queued in self.items:
+                if all(queued.get(key) == item.get(key) for key in ['kind', 'to', 'subject', 'body']):
+                    log.debug("%s to %s is already waiting to be sent" % (item['kind'], item['to']))
+                    return queued['id']
+
+            item.update({'id': uuid.uuid4().hex, 'attempts': 0, 'next_attempt': time()})
+            self.items.append(item)
+            self._save()
+            self.condition.notify_all()
+            return item['id']
+
+    def put_message(self, user, subject, body):
+        """queues a private message to reddit user user. Returns the id of the queued message"""
+        return self._put({'kind': 'message', 'to': user, 'subject': subject, 'body': body})
+
+    def put_reply(self, submission_id, body, disable_inbox_replies=True):
+        """queues a comment on submission submission_id. Returns the id of the queued reply"""
+        return self._put({'kind': 'reply', 'to': submission_id, 'subject': None, 'body': body,
+                          'disable_inbox_replies': disable_inbox_replies})
+
+    def pending(self):
+        """returns how many messages haven't been delivered yet"""
+        with self.condition:
+            return len(self.items)
+
+    def _deliver(self, item):
+        """sends a single message to reddit. Raises whatever praw raises"""
+        if item['kind'] == 'message':
+            self.reddit.redditor(item['to']).message(item['subject'], item['body'])
+            return
+
+        comment = self.reddit.submission(id=item['to']).reply(item['body'])
+        if item.get('disable_inbox_replies'):
+            # the reply is already posted so this failing must not send it again
+            try:
+                comment.disable_inbox_replies()
+            except Exception as e:
+                log.error("Unable to disable inbox replies for %s: %s" % (comment, e))
+
+    def _finish(self, item, error):
+        """removes a delivered or undeliverable item, otherwise schedules its next attempt.
+        Must be called holding self.condition
+        """
+        item['attempts'] += 1
+
+        if error is None:
+            log.debug("Delivered %s to %s" % (item['kind'], item['to']))
+            self.items.remove(item)
+
+        elif isinstance(error, UNDELIVERABLE):
+            log.error("Unable to deliver %s to %s (%s). Not trying again..." % (item['kind'], item['to'], error))
+            self.items.remove(item)
+
+        elif item['attempts'] >= self.max_attempts:
+            log.error("Giving up on %s to %s after %s attempts" % (item['kind'], item['to'], item['attempts']))
+            self.items.remove(item)
+
+        else:
+            delay = self.retry_delay * 2 ** (item['attempts'] - 1)
+            item['next_attempt'] = time() + delay
+            log.error("Exception sending %s to %s. Trying again in %s seconds" % (item['kind'], item['to'], delay))
+            log.error("error: %s" % error)
+
+        self._save()
+
+    def _next_due(self):
+        """returns the next item that is ready to send, or None and how long to wait for one.
+        Must be called holding self.condition
+        """
+        waiting = [item for item in self.items if item is not self.sending]
+        if not waiting:
+            return None, None
+
+        item = min(waiting, key=lambda x: x['next_attempt'])
+        wait = item['next_attempt'] - time()
+        if wait > 0:
+            return None, wait
+        return item, None
+
+    def send_next(self):
+        """delivers the next item that is due, if there is one. Returns True if one was tried"""
+        with self.condition:
+            item, wait = self._next_due()
+            if item is None:
+                return False
+            self.sending = item
+
+        self.bucket.acquire()
+
+        error = None
+        try:
+            self._deliver(item)
+        except Exception as e:
+            error = e
+            if not isinstance(e, UNDELIVERABLE):
+                log.error(traceback.format_exc())
+
+        with self.condition:
+            self._finish(item, error)
+            self.sending = None
+            self.condition.notify_all()
+        return True
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if self.stopped:
+                    return
+                item, wait = self._next_due()
+                if item is None:
+                    self.condition.wait(wait)
+                    continue
+
+            try:
+                self.send_next()
+            except Exception as e:
+                log.error("Outbox worker error: %s" % e)
+                log.error(traceback.format_exc())
+
+    def start(self):
+        """starts delivering messages on a background thread"""
+        if self.worker and self.worker.is_alive():
+            return
+
+        self.stopped = False
+        self.worker = threading.Thread(target=self._run, name="outbox")
+        self.worker.daemon = True
+        self.worker.start()
+
+    def flush(self, timeout=None):
+        """waits until every queued message is delivered or dropped, or timeout seconds pass.
+        Returns True if the queue is empty
+        """
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.items, timeout)
+
+    def stop(self, timeout=None):
+        """lets a message being sent finish and stops the worker. Undelivered messages stay on disk"""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+        if self.worker:
+            self.worker.join(timeout)
@@ -27,6 +27,9 @@ class MockDriveManager():
     def get_unwritten_leaderboard_games():
         none = None
 
+    def get_written_leaderboard_games():
+        none = None
+
     def get_history_game_points():
         none = None
 
@@ -0,0 +1,130 @@
+"""Module containing a fake google drive v2 service. This is for test use only
+
+Every execute() sleeps for a fixed latency to stand in for an HTTP round-trip and is
+counted in MockDriveService.requests so tests can compare request counts and timings.
+"""
+from time import sleep
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+
+class MockRequest():
+    """Mocked out version of googleapiclient.http.HttpRequest"""
+
+    def __init__(self, service, name, result):
+        self.service = service
+        self.name = name
+        self.result = result
+
+    def execute(self):
+        self.service.count(self.name)
+        return self.result()
+
+
+class MockBatchRequest():
+    """Mocked out version of googleapiclient.http.BatchHttpRequest. The whole batch is one round-trip"""
+
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.service.count('batch')
+        for request_id, request in self.requests:
+            self.callback(request_id, request.result(), None)
+
+
+def _is_listed(file, q):
+    """drive leaves trashed files out of a listing when the query asks it to"""
+    return not (q and "trashed = false" in q and file.get('labels', {}).get('trashed'))
+
+
+class MockFiles():
+    def __init__(self, service):
+        self.service = service
+
+    def get(self, fileId, fields=None):
+        return MockRequest(self.service, 'files.get', lambda: dict(self.service.files_by_id[fileId]))
+
+    def list(self, q=None, fields=None, maxResults=100, pageToken=None):
+        def page():
+            start = int(pageToken or 0)
+            files = [file for file in self.service.files_list if _is_listed(file, q)]
+            result = {'items': [dict(file) for file in files[start:start + maxResults]]}
+            if start + maxResults < len(files):
+                result['nextPageToken'] = str(start + maxResults)
+            return result
+        return MockRequest(self.service, 'files.list', page)
+
+
+class MockChildren():
+    def __init__(self, service):
+        self.service = service
+
+    def list(self, folderId, q=None):
+        return MockRequest(self.service, 'children.list',
+                           lambda: {'items': [{'id': file['id']} for file in self.service.files_list
+                                              if _is_listed(file, q)]})
+
+
+class MockChanges():
+    def __init__(self, service):
+        self.service = service
+
+    def getStartPageToken(self):
+        return MockRequest(self.service, 'changes.getStartPageToken',
+                           lambda: {'startPageToken': str(len(self.service.change_log))})
+
+    def list(self, pageToken, fields=None, maxResults=100):
+        def page():
+            if pageToken in self.service.expired_tokens:
+                raise HttpError(httplib2.Response({'status': 404}), b"Invalid page token")
+            start = int(pageToken)
+            result = {'items': self.service.change_log[start:start + maxResults]}
+            if start + maxResults < len(self.service.change_log):
+                result['nextPageToken'] = str(start + maxResults)
+            else:
+                result['newStartPageToken'] = str(len(self.service.change_log))
+            return result
+        return MockRequest(self.service, 'changes.list', page)
+
+
+class MockDriveService():
+    """Mocked out version of the drive v2 service holding every file of one folder in memory"""
+
+    def __init__(self, files, latency=0):
+        self.files_list = files
+        self.files_by_id = {file['id']: file for file in files}
+        self.latency = latency
+        self.requests = {}
+        self.change_log = []
+        self.expired_tokens = set()
+
+    def add_change(self, file_id, file=None, deleted=False):
+        """test helper that records a change to the drive changes feed"""
+        self.change_log.append({'fileId': file_id, 'deleted': deleted, 'file': file})
+
+    def count(self, name):
+        self.requests[name] = self.requests.get(name, 0) + 1
+        if self.latency:
+            sleep(self.latency)
+
+    def total_requests(self):
+        return sum(self.requests.values())
+
+    def files(self):
+        return MockFiles(self)
+
+    def children(self):
+        return MockChildren(self)
+
+    def changes(self):
+        return MockChanges(self)
+
+    def new_batch_http_request(self, callback=None):
+        return MockBatchRequest(self, callback)
@@ -0,0 +1,183 @@
+"""Module containing an in-memory stand-in for the gspread client. This is for test use only
+
+Every method that would be an HTTP round-trip against google sheets is counted in
+MockGspreadClient.requests so tests can assert how many calls a code path makes, and the
+cells returned by ranged reads in MockGspreadClient.cells_read.
+"""
+
+
+class MockCell():
+    """Mocked out version of gspread.Cell"""
+
+    def __init__(self, row, col, value=""):
+        self.row = row
+        self.col = col
+        self.value = value
+
+
+class MockWorksheet():
+    """Mocked out version of gspread.Worksheet backed by a list of rows"""
+
+    def __init__(self, spreadsheet, title, rows=None, row_count=None, col_count=None):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.data = [list(row) for row in (rows or [])]
+        width = max([len(row) for row in self.data] or [0])
+        self.row_count = row_count or max(len(self.data), 1)
+        self.col_count = col_count or max(width, 1)
+
+    def set_values(self, rows):
+        """test helper that replaces the sheet contents without counting a request"""
+        self.data = [list(row) for row in rows]
+        self.row_count = max(self.row_count, len(self.data))
+        self.col_count = max([self.col_count] + [len(row) for row in self.data])
+
+    def _count(self, name):
+        self.spreadsheet.client.count(name)
+
+    def _get(self, row, col):
+        if row <= len(self.data) and col <= len(self.data[row - 1]):
+            return self.data[row - 1][col - 1]
+        return ""
+
+    def _set(self, row, col, value):
+        while len(self.data) < row:
+            self.data.append([])
+        line = self.data[row - 1]
+        while len(line) < col:
+            line.append("")
+        line[col - 1] = "" if value is None else str(value)
+
+    def get_all_values(self):
+        self._count('get_all_values')
+        rows = [row for row in self.data]
+        while rows and not any(rows[-1]):
+            rows.pop()
+        width = max([len(row) for row in rows] or [0])
+        return [row + [""] * (width - len(row)) for row in rows]
+
+    def col_values(self, col):
+        self._count('col_values')
+        return [self._get(row, col) for row in range(1, self.row_count + 1)]
+
+    def row_values(self, row):
+        self._count('row_values')
+        return [self._get(row, col) for col in range(1, self.col_count + 1)]
+
+    def range(self, name):
+        self._count('range')
+        start, end = name.split(":")
+        first_row, first_col = _a1_to_rowcol(start)
+        last_row, last_col = _a1_to_rowcol(end)
+        cells = [MockCell(row, col, self._get(row, col))
+                 for row in range(first_row, last_row + 1)
+                 for col in range(first_col, last_col + 1)]
+        self.spreadsheet.client.cells_read += len(cells)
+        return cells
+
+    def update_cell(self, row, col, val):
+        self._count('update_cell')
+        self._set(row, col, val)
+
+    def update_cells(self, cell_list):
+        self._count('update_cells')
+        for cell in cell_list:
+            self._set(cell.row, cell.col, cell.value)
+
+    def add_rows(self, rows):
+        self._count('add_rows')
+        self.row_count += rows
+
+    def resize(self, rows=None, cols=None):
+        self._count('resize')
+        if rows:
+            self.row_count = rows
+        if cols:
+            self.col_count = cols
+
+    def append_row(self, values):
+        self._count('append_row')
+        self.row_count += 1
+        for col, value in enumerate(values or [], start=1):
+            self._set(self.row_count, col, value)
+
+
+class MockSpreadsheet():
+    """Mocked out version of gspread.Spreadsheet"""
+
+    def __init__(self, client, key):
+        self.client = client
+        self.id = key
+        self.sheets = []
+        self.fetched = False
+
+    def add_sheet(self, title, rows=None, row_count=None, col_count=None):
+        """test helper that creates a worksheet without counting a request"""
+        worksheet = MockWorksheet(self, title, rows, row_count, col_count)
+        self.sheets.append(worksheet)
+        return worksheet
+
+    def _fetch_sheets(self):
+        # like gspread the worksheet feed is only fetched the first time it's needed
+        if not self.fetched:
+            self.client.count('worksheets')
+            self.fetched = True
+
+    def worksheets(self):
+        self._fetch_sheets()
+        return self.sheets[:]
+
+    def get_worksheet(self, index):
+        self._fetch_sheets()
+        try:
+            return self.sheets[index]
+        except IndexError:
+            return None
+
+    def add_worksheet(self, title, rows, cols):
+        self.client.count('add_worksheet')
+        return self.add_sheet(title, row_count=rows, col_count=cols)
+
+    def del_worksheet(self, worksheet):
+        self.client.count('del_worksheet')
+        self.sheets.remove(worksheet)
+
+
+class MockGspreadClient():
+    """Mocked out version of gspread.Client that keeps every spreadsheet in memory"""
+
+    def __init__(self):
+        self.books = {}
+        self.requests = {}
+        self.cells_read = 0
+
+    def count(self, name):
+        self.requests[name] = self.requests.get(name, 0) + 1
+
+    def total_requests(self, names=None):
+        return sum(count for name, count in self.requests.items() if not names or name in names)
+
+    def reset_requests(self):
+        self.requests = {}
+        self.cells_read = 0
+
+    def add_book(self, key):
+        """test helper that creates a spreadsheet without counting a request"""
+        self.books[key] = MockSpreadsheet(self, key)
+        return self.books[key]
+
+    def open_by_key(self, key):
+        self.count('open_by_key')
+        self.books[key].fetched = False
+        return self.books[key]
+
+
+def _a1_to_rowcol(label):
+    """converts an A1 style label into a (row, col) tuple"""
+    letters = ''.join(c for c in label if c.isalpha()).upper()
+    digits = ''.join(c for c in label if c.isdigit())
+
+    col = 0
+    for letter in letters:
+        col = col * 26 + (ord(letter) - ord('A') + 1)
+    return int(digits), col
@@ -16,4 +16,7 @@ class MockSecretManager():
        self.none = None
 
     def get_previous_winners(self, team):
-        self.none = None
\ No newline at end of file
+        self.none = None
+
+    def get_teams(self, include_test=False):
+        return ["52"]
@@ -0,0 +1,52 @@
+import threading
+from time import monotonic, sleep
+
+
+class TokenBucket():
+    """A thread safe token bucket. Tokens refill at rate per second up to capacity and every
+    call takes one, waiting for it if the bucket is empty.
+    """
+
+    rate = None
+    capacity = None
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = monotonic()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, requests, capacity=1):
+        """builds a bucket that allows requests calls a minute"""
+        return cls(requests / 60.0, capacity)
+
+    def _refill(self):
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        """returns how many seconds until a token is available, 0 if one is available now"""
+        with self.lock:
+            self._refill()
+            return max(0.0, (1 - self.tokens) / self.rate)
+
+    def try_acquire(self):
+        """takes a token if one is available. Returns False instead of waiting if not"""
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def acquire(self):
+        """takes a token, sleeping until one is available. Returns how long we waited"""
+        waited = 0.0
+        while not self.try_acquire():
+            wait = self.wait_time()
+            sleep(wait)
+            waited += wait
+        return waited
@@ -0,0 +1,145 @@
+"""Paces and retries every request we send to google sheets and google drive.
+
+All teams share one google account, and google's quotas are per user per minute, so every
+request goes through one token bucket per API sized to that quota. A request google answers
+with 429 or a 5xx, or one that fails to connect, is retried after an exponential backoff with
+full jitter. A sheets request that still fails after MAX_ATTEMPTS raises a SheetsError
+subclass, and DriveManager raises SheetsError where it used to sys.exit. One throttled call
+costs one delay, not a process restart that logs in and reads everything again.
+"""
+import logging
+import random
+import threading
+from time import sleep
+
+from gspread.exceptions import RequestError
+
+from rate_limit import TokenBucket
+
+# per user quotas, shared by every team
+SHEETS_REQUESTS_PER_MINUTE = 60
+SHEETS_REQUEST_BURST = 10
+DRIVE_REQUESTS_PER_MINUTE = 600
+DRIVE_REQUEST_BURST = 20
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_ATTEMPTS = 5
+BASE_DELAY = 1
+MAX_DELAY = 64
+
+log = logging.getLogger("request_scheduler")
+
+
+class SheetsError(Exception):
+    """A google sheets request or read failed. status is the HTTP status if there was one"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class SheetsQuotaError(SheetsError):
+    """google kept answering 429 after every retry"""
+
+
+class SheetsUnavailableError(SheetsError):
+    """google kept answering 5xx, or we couldn't reach it, after every retry"""
+
+
+class RequestScheduler():
+    """Rate limits and retries requests to one API"""
+
+    name = None
+    bucket = None
+
+    def __init__(self, name, bucket, max_attempts=MAX_ATTEMPTS, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+        self.name = name
+        self.bucket = bucket
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.retries = 0
+        self.throttled_seconds = 0.0
+
+    def get_delay(self, attempt):
+        """full jitter: a random wait up to base_delay * 2**attempt, capped at max_delay"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _backoff(self, attempt, reason):
+        delay = self.get_delay(attempt)
+        log.warning("%s request failed (%s), retrying in %.1fs (attempt %s of %s)" %
+                    (self.name, reason, delay, attempt + 1, self.max_attempts))
+        with self.lock:
+            self.retries += 1
+        sleep(delay)
+
+    def _acquire(self):
+        waited = self.bucket.acquire()
+        if waited:
+            with self.lock:
+                self.throttled_seconds += waited
+
+    def get_stats(self):
+        """returns how many retries we made and how long we waited on the bucket so far"""
+        with self.lock:
+            return {'retries': self.retries, 'throttled_seconds': round(self.throttled_seconds, 2)}
+
+    def wrap_gspread(self, gc):
+        """sends every request of a gspread client through this scheduler"""
+        session = gc.session
+        request = session.request
+
+        def scheduled_request(method, url, *args, **kwargs):
+            for attempt in range(self.max_attempts):
+                self._acquire()
+                try:
+                    return request(method, url, *args, **kwargs)
+
+                except RequestError as error:
+                    status = error.args[0] if error.args and isinstance(error.args[0], int) else None
+                    if status not in RETRY_STATUSES:
+                        raise
+                    if attempt + 1 == self.max_attempts:
+                        error_type = SheetsQuotaError if status == 429 else SheetsUnavailableError
+                        raise error_type("%s %s gave %s %s times" % (method, url, status, self.max_attempts),
+                                         status) from error
+                    self._backoff(attempt, status)
+
+                except OSError as error:
+                    if attempt + 1 == self.max_attempts:
+                        raise SheetsUnavailableError("%s %s failed %s times: %s" %
+                                                     (method, url, self.max_attempts, error)) from error
+                    self._backoff(attempt, error.__class__.__name__)
+
+        session.request = scheduled_request
+        return gc
+
+    def wrap_http(self, http):
+        """sends every request of an httplib2.Http (the drive service's) through this scheduler.
+        The last response is returned once we run out of attempts so the api client raises its
+        usual HttpError
+        """
+        request = http.request
+
+        def scheduled_request(uri, method="GET", *args, **kwargs):
+            for attempt in range(self.max_attempts):
+                self._acquire()
+                try:
+                    response, content = request(uri, method, *args, **kwargs)
+
+                except OSError as error:
+                    if attempt + 1 == self.max_attempts:
+                        raise
+                    self._backoff(attempt, error.__class__.__name__)
+                    continue
+
+                if int(response.status) not in RETRY_STATUSES or attempt + 1 == self.max_attempts:
+                    return response, content
+                self._backoff(attempt, response.status)
+
+        http.request = scheduled_request
+        return http
+
+
+sheets_requests = RequestScheduler("sheets", TokenBucket.per_minute(SHEETS_REQUESTS_PER_MINUTE, SHEETS_REQUEST_BURST))
+drive_requests = RequestScheduler("drive", TokenBucket.per_minute(DRIVE_REQUESTS_PER_MINUTE, DRIVE_REQUEST_BURST))
@@ -0,0 +1,90 @@
+"""Rows we have already read from the GWG response sheets, kept on disk per team.
+
+Response sheets usually only grow at the bottom, so once a sheet has been read only the rows
+after the ones we have need fetching. Each sheet keeps the rows read so far (its watermark is
+how many there are) and a hash of all of them. Prefetches in DriveManager.get_file_entries only
+check the header and the last row we have before reading on from there. The official scoring
+read checks every row against the hash once, and parses the whole sheet again if one changed
+(an edited or replaced response anywhere in the sheet).
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from time import time
+
+RESPONSE_CACHE_FILE = 'response_cache_%s.json'
+# only the most recently read sheets are kept, older games are long scored
+MAX_CACHED_SHEETS = 5
+
+log = logging.getLogger("response_cache")
+
+
+def trim_row(row):
+    """drops the empty cells off the end of a row so a row reads the same at any sheet width"""
+    row = list(row)
+    while row and not row[-1]:
+        row.pop()
+    return row
+
+
+def hash_row(row):
+    return hashlib.sha1(json.dumps(trim_row(row)).encode("utf-8")).hexdigest()
+
+
+def hash_rows(rows):
+    """one hash of every row, each read the same at any sheet width"""
+    return hashlib.sha1(json.dumps([trim_row(row) for row in rows]).encode("utf-8")).hexdigest()
+
+
+class ResponseCache():
+    """The rows read so far from each response sheet, by file id"""
+
+    cache_file = None
+    sheets = None
+
+    def __init__(self, cache_file):
+        self.cache_file = cache_file
+        self.lock = threading.Lock()
+
+    def _load(self):
+        if self.sheets is None:
+            try:
+                with open(self.cache_file) as json_data:
+                    self.sheets = json.load(json_data)
+            except (IOError, ValueError):
+                self.sheets = {}
+        return self.sheets
+
+    def _save(self):
+        try:
+            temp_file = self.cache_file + ".tmp"
+            with open(temp_file, "w") as json_data:
+                json.dump(self.sheets, json_data)
+            os.replace(temp_file, self.cache_file)
+
+        except IOError as error:
+            log.error("Unable to save the response cache: %s" % error)
+
+    def get(self, file_id):
+        """returns {'rows', 'rows_hash', 'updated'} for file_id or None if we haven't read it"""
+        with self.lock:
+            return self._load().get(file_id)
+
+    def put(self, file_id, rows):
+        """saves every row read from file_id so far, header included"""
+        with self.lock:
+            sheets = self._load()
+            sheets[file_id] = {'rows': rows,
+                               'rows_hash': hash_rows(rows),
+                               'updated': time()}
+
+            for old_id in sorted(sheets, key=lambda x: sheets[x]['updated'])[:-MAX_CACHED_SHEETS]:
+                del sheets[old_id]
+            self._save()
+
+    def drop(self, file_id):
+        with self.lock:
+            if self._load().pop(file_id, None):
+                self._save()
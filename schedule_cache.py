@@ -0,0 +1,253 @@
+import json
+import logging
+import os
+import traceback
+from datetime import date, datetime, timezone
+from time import sleep, time
+from urllib.parse import urlencode
+
+from api_metrics import metrics
+
+NHL_API = "https://statsapi.web.nhl.com/api/v1"
+# the season schedule is kept on disk per team for this many seconds before we ask for it again
+SCHEDULE_CACHE_FILE = 'schedule_cache_%s.json'
+SCHEDULE_TTL = 12 * 60 * 60
+REQUEST_TIMEOUT = 30
+REQUEST_ATTEMPTS = 3
+
+log = logging.getLogger("schedule_cache")
+
+
+class ScheduleCache():
+    """Keeps a team's whole season schedule from the NHL statsapi on disk.
+
+    The season is loaded with one range request and game day, game number, game time and
+    league record questions are all answered from it. Only the linescore for a game we are
+    about to score (its official start time) goes back to the network.
+    """
+
+    team = None
+    seasons = None
+
+    def __init__(self, team, base_url=NHL_API, cache_file=None, ttl=SCHEDULE_TTL):
+        # the test team uses the jets schedule
+        team = str(team)
+        if team == "-1":
+            team = "52"
+
+        self.team = team
+        self.base_url = base_url
+        self.cache_file = cache_file or SCHEDULE_CACHE_FILE % team
+        self.ttl = ttl
+        self.seasons = {}
+
+    def _parse_day(self, day):
+        """takes a date, datetime or a string like 2018-1-5, 2018-01-05 or 2018/01/05 and returns a date"""
+        if isinstance(day, datetime):
+            return day.date()
+        if isinstance(day, date):
+            return day
+
+        parts = day.replace("/", "-").split()[0].split("-")
+        return date(int(parts[0]), int(parts[1]), int(parts[2]))
+
+    def _get_season(self, day):
+        """returns the statsapi season id that day falls in. Eg. 2018-10-05 returns 20182019"""
+        start_year = day.year if day.month >= 7 else day.year - 1
+        return "%s%s" % (start_year, start_year + 1)
+
+    def _fetch(self, params):
+        """calls the statsapi schedule endpoint and returns the decoded json"""
+        url = "%s/schedule?%s" % (self.base_url, urlencode(params))
+        log.debug("Requesting %s" % url)
+        # imported here so answering from the cache doesn't load requests
+        from http_transport import transport
+        with metrics.track("statsapi", "GET schedule") as call:
+            body = transport.get(url, timeout=REQUEST_TIMEOUT)
+            call.bytes = len(body)
+        return json.loads(body.decode("utf-8"))
+
+    def _read_cache_file(self):
+        try:
+            with open(self.cache_file) as json_data:
+                return json.load(json_data)
+        except (IOError, ValueError):
+            return {}
+
+    def _write_cache_file(self, cached):
+        try:
+            temp_file = self.cache_file + ".tmp"
+            with open(temp_file, "w") as json_data:
+                json.dump(cached, json_data)
+            os.replace(temp_file, self.cache_file)
+
+        except IOError as error:
+            log.error("Unable to save schedule cache: %s" % error)
+
+    def _is_fresh(self, season_data):
+        return season_data and time() - season_data['fetched'] < self.ttl
+
+    def _load_season(self, season):
+        """returns the statsapi 'dates' list for the whole season, from memory, disk or the network
+        in that order. A stale copy is still used if the network is down.
+
+        returns None if we have never been able to load the season
+        """
+        season_data = self.seasons.get(season)
+        if self._is_fresh(season_data):
+            return season_data['dates']
+
+        cached = self._read_cache_file()
+        if self._is_fresh(cached.get(season)):
+            self.seasons[season] = cached[season]
+            return cached[season]['dates']
+
+        try:
+            log.info("Loading season %s schedule for team %s" % (season, self.team))
+            data = self._fetch({'teamId': self.team, 'season': season})
+            season_data = {'fetched': time(), 'dates': data['dates']}
+
+            self.seasons[season] = season_data
+            cached[season] = season_data
+            self._write_cache_file(cached)
+            return season_data['dates']
+
+        except Exception as e:
+            log.error("exception occurred loading the season schedule: %s" % e)
+            season_data = season_data or cached.get(season)
+            if season_data:
+                log.error("Using the schedule we loaded before")
+                return season_data['dates']
+            return None
+
+    def _get_regular_season_games(self, season):
+        """returns a (local date, game) pair for every regular season game in season in the order
+        they are played. gameDate is in UTC so evening games show up on the next day there.
+        """
+        dates = self._load_season(season) or []
+        games = [(day['date'], game) for day in dates for game in day['games']
+                 if game.get('gameType', 'R') == 'R']
+        return sorted(games, key=lambda x: x[1]['gameDate'])
+
+    def _parse_game_date(self, game_date):
+        """turns a statsapi gameDate like 2017-11-17T01:00:00Z into a timezone aware datetime"""
+        return datetime.strptime(game_date, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+
+    def get_game_times(self, day):
+        """returns the scheduled start (UTC datetime) of every regular season and playoff game in
+        the season day falls in. If there are none left after day the next season is added so the
+        off season still knows when the first game is.
+        """
+        day = self._parse_day(day)
+        season = self._get_season(day)
+        times = []
+
+        for next_season in [season, "%s%s" % (int(season[:4]) + 1, int(season[:4]) + 2)]:
+            dates = self._load_season(next_season) or []
+            times += sorted(self._parse_game_date(game['gameDate']) for entry in dates
+                            for game in entry['games'] if game.get('gameType', 'R') != 'PR')
+            if [start for start in times if start.date() >= day]:
+                break
+
+        return times
+
+    def get_dates(self, day):
+        """returns the statsapi 'dates' entries for day. This is a list with one entry if the
+        team plays that day and an empty list if it doesn't.
+
+        returns None if the schedule couldn't be loaded
+        """
+        day = self._parse_day(day)
+        dates = self._load_season(self._get_season(day))
+        if dates is None:
+            return None
+        return [entry for entry in dates if entry['date'] == day.isoformat()]
+
+    def get_cached_dates(self, day, max_age=None):
+        """get_dates answered only from the season we have in memory or on disk, never the network.
+        A copy older than max_age seconds (the ttl if not given) isn't trusted.
+
+        returns None if we don't have a recent enough copy of the season
+        """
+        day = self._parse_day(day)
+        season = self._get_season(day)
+        max_age = self.ttl if max_age is None else max_age
+
+        season_data = self.seasons.get(season) or self._read_cache_file().get(season)
+        if not season_data or time() - season_data['fetched'] >= max_age:
+            return None
+        return [entry for entry in season_data['dates'] if entry['date'] == day.isoformat()]
+
+    def is_game_day(self, day):
+        """checks if the team plays on day"""
+        return bool(self.get_dates(day))
+
+    def get_game(self, day):
+        """returns the statsapi game the team plays on day or None if there isn't one"""
+        dates = self.get_dates(day)
+        if not dates:
+            return None
+        return dates[0]['games'][0]
+
+    def get_game_number(self, day):
+        """returns which regular season game the team plays on day, starting at 1. On an off
+        day this is the number of the team's next game.
+        """
+        day = self._parse_day(day)
+        games = self._get_regular_season_games(self._get_season(day))
+        return len([game for game in games if game[0] < day.isoformat()]) + 1
+
+    def get_game_date(self, game_number, day):
+        """returns the statsapi gameDate (UTC, eg. 2017-11-17T01:00:00Z) of regular season game
+        game_number in the season day falls in, or None if there isn't one
+        """
+        day = self._parse_day(day)
+        games = self._get_regular_season_games(self._get_season(day))
+        if not 0 < int(game_number) <= len(games):
+            return None
+        return games[int(game_number) - 1][1]['gameDate']
+
+    def get_league_record(self, day):
+        """returns the team's league record (wins, losses, ot) as the statsapi reported it the
+        last time we loaded the schedule, or None if the team doesn't play on day
+        """
+        game = self.get_game(day)
+        if not game:
+            return None
+
+        for side in ['home', 'away']:
+            if str(game['teams'][side]['team']['id']) == self.team:
+                return game['teams'][side]['leagueRecord']
+        return None
+
+    def get_start_time(self, day):
+        """returns the official puck drop time (UTC) of the team's game on day.
+
+        This is the only lookup that goes to the network since the linescore only exists once the
+        game has started. If the NHL hasn't filled in the linescore, or we can't reach it, we return
+        the scheduled game time.
+        """
+        day = self._parse_day(day)
+        params = {'expand': 'schedule.linescore',
+                  'startDate': day.isoformat(),
+                  'endDate': day.isoformat(),
+                  'teamId': self.team}
+
+        for attempt in range(REQUEST_ATTEMPTS):
+            try:
+                game = self._fetch(params)['dates'][0]['games'][0]
+                try:
+                    return game['linescore']['periods'][0]['startTime']
+                except (KeyError, IndexError):
+                    # NHL website wasn't updated so use regular game time
+                    return game['gameDate']
+
+            except Exception as e:
+                log.error("exception occurred getting the start time for %s. Trying again shortly" % day)
+                log.error('An error occurred: %s' % e)
+                log.error(traceback.format_exc())
+                if attempt + 1 < REQUEST_ATTEMPTS:
+                    sleep(2 ** attempt)
+
+        game = self.get_game(day)
+        return game['gameDate'] if game else None
@@ -0,0 +1,73 @@
+"""Scores every entry of a GWG response sheet in one pass.
+
+The response sheet is taken as columns (timestamps and the three answer columns). The answer
+key is normalized into sets once and the points of all rows are worked out together, with numpy
+when it is installed and plain python when it isn't. Timestamps are parsed once into an
+EntryTable, which finds the late entries. The results are the same as scoring row by row with
+GWGLeaderUpdater.get_players_points.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from entry_table import EntryTable, ENTRY_TIME_FORMAT, from_epoch, parse_epoch, to_epoch
+
+
+def normalize_answers(answers):
+    """turns the lists of accepted answers from GWGLeaderUpdater.get_gwg_answers into sets"""
+    return [set(answer) for answer in answers]
+
+
+def parse_entry_time(timestamp):
+    """parses a response sheet timestamp. Same result as dt.strptime(timestamp, ENTRY_TIME_FORMAT)
+    without going through strptime for the usual format.
+    """
+    return from_epoch(parse_epoch(timestamp, ENTRY_TIME_FORMAT))
+
+
+def _score_python(answer_columns, answers):
+    points = [0] * len(answer_columns[0]) if answer_columns else []
+    for column, accepted in zip(answer_columns, answers):
+        for row, answer in enumerate(column):
+            if answer.lower() in accepted:
+                points[row] += 1
+    return points
+
+
+def _score_numpy(answer_columns, answers):
+    points = np.zeros(len(answer_columns[0]), dtype=np.int64)
+    for column, accepted in zip(answer_columns, answers):
+        if not accepted:
+            continue
+        lowered = np.char.lower(np.array(column, dtype=str))
+        points += np.isin(lowered, np.array(sorted(accepted), dtype=str))
+    return points.tolist()
+
+
+def score_entries(timestamps, answer_columns, answers, game_time, use_numpy=None):
+    """scores every row of a response sheet.
+
+    timestamps: the entry time column, or an EntryTable already built from it
+    answer_columns: the three answer columns, in question order
+    answers: the accepted answers for each question, from GWGLeaderUpdater.get_gwg_answers
+    game_time: puck drop, anything after it is late
+
+    returns a dict with the 'entry_times' in seconds since 1970 (see entry_table.py), the
+    'points' of every row and 'on_time', True for rows entered at or before game_time
+    """
+    if use_numpy is None:
+        use_numpy = np is not None
+
+    answers = normalize_answers(answers)
+    table = timestamps if isinstance(timestamps, EntryTable) else EntryTable(timestamps)
+
+    if not len(table):
+        return {'entry_times': [], 'points': [], 'on_time': []}
+
+    if use_numpy:
+        points = _score_numpy(answer_columns, answers)
+    else:
+        points = _score_python(answer_columns, answers)
+
+    return {'entry_times': table.epochs, 'points': points, 'on_time': table.on_time(to_epoch(game_time))}
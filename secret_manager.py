@@ -30,3 +30,7 @@ class SecretManager():
     def get_previous_winners(self, team):
         """get the previous winners details"""
         return self._get_value(team, "details", detail='winners')
+
+    def get_teams(self, include_test=False):
+        """returns the id of every team in the secrets file. The test team -1 is left out unless include_test is set"""
+        return sorted(team for team in self.secrets if include_test or team != "-1")
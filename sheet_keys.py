@@ -0,0 +1,14 @@
+from enum import Enum
+
+# Special google drive keys for certain columns or expected phrases
+class SheetKeys(Enum):
+    ANSWERKEY_SHEET = 1
+    DATE_COLUMN = 1
+    START_TIME_COLUMN = 2
+    READY_COLUMN = 8
+    LEADERBOARD_ADDED_COLUMN = 9
+    TITLE_COLUMN = 10
+    LEADER_WRITTEN_SUCCESS = "yes"
+    RESULT_USERNAME = 3
+    RESULT_POINTS = 9
+    RESULT_DATETIME = 2
@@ -0,0 +1,180 @@
+from bisect import bisect_left, bisect_right, insort
+
+
+def _convert_rank(rank):
+    """same as DriveManager.convert_rank, T3 returns 3"""
+    return int(str(rank).replace("T", ""))
+
+
+class StandingsIndex():
+    """Keeps the leaderboard ordered by the ranking tie-break so a game can be applied without
+    sorting everyone again.
+
+    Users are kept in a sorted list keyed by (-points, games played, username). Users with the
+    same points and games played share a rank, and a user's rank only depends on how many users
+    are ahead of their group and how big it is, which bisect finds in O(log n). Applying a game
+    only moves the users who played. The ranks everyone had before the game are worked out from
+    the users that moved instead of being saved for everyone.
+
+    Ranks, ties and deltas come out the same as GWGLeaderUpdater.add_user_rankings.
+    """
+
+    def __init__(self, leaders=None):
+        self.load(leaders or {})
+
+    def load(self, leaders):
+        """fills the index from standings in the format of DriveManager.get_current_leaders"""
+        self.users = {}
+        self.keys = []
+        self.group_counts = {}
+        self.seq = 0
+        # before the first game the previous ranks are the ones we were given
+        self.loaded_ranks = {username: scores['rank'] for username, scores in leaders.items()}
+        # and the deltas are the ones saved with them (the last game is already in them)
+        self.loaded_deltas = {username: str(scores['delta']) for username, scores in leaders.items()
+                              if scores.get('delta') is not None}
+        self.previous_ranks = None
+        self.movers_old = []
+        self.movers_new = []
+        self.new_users = set()
+
+        for username, scores in leaders.items():
+            self.users[username] = {'curr': int(scores['curr']), 'played': int(scores['played']),
+                                    'last': int(scores.get('last', 0)), 'seq': 0}
+            group = self._group(username)
+            self.group_counts[group] = self.group_counts.get(group, 0) + 1
+            self.keys.append(group + (username,))
+        self.keys.sort()
+
+    def __len__(self):
+        return len(self.users)
+
+    def __contains__(self, username):
+        return username in self.users
+
+    def _group(self, username):
+        user = self.users[username]
+        return (-user['curr'], user['played'])
+
+    def _remove(self, username):
+        group = self._group(username)
+        del self.keys[bisect_left(self.keys, group + (username,))]
+        self.group_counts[group] -= 1
+        if not self.group_counts[group]:
+            del self.group_counts[group]
+        return group
+
+    def _add(self, username):
+        group = self._group(username)
+        insort(self.keys, group + (username,))
+        self.group_counts[group] = self.group_counts.get(group, 0) + 1
+        return group
+
+    def _format_rank(self, ahead, count):
+        """a lone user gets their position. A group gets "T" and the position of its last user,
+        except a group at the top which is "T1".
+        """
+        if count == 1:
+            return ahead + 1
+        if ahead == 0:
+            return "T1"
+        return "T" + str(ahead + count)
+
+    def apply_game(self, points):
+        """adds a game's points (username to points, usernames already trimmed) to the standings"""
+        # the ranks before this game, needed for the deltas until the next game
+        if self.seq == 0:
+            self.previous_ranks = self.loaded_ranks
+        else:
+            self.previous_ranks = None
+
+        self.seq += 1
+        self.movers_old = []
+        self.movers_new = []
+        self.new_users = set()
+
+        for username, user_points in points.items():
+            user_points = int(user_points)
+            user = self.users.get(username)
+
+            if user:
+                self.movers_old.append(self._remove(username))
+                user.update({'curr': user['curr'] + user_points, 'played': user['played'] + 1,
+                             'last': user_points, 'seq': self.seq})
+            else:
+                # new users show 0 for their last game, like add_new_user_points
+                self.users[username] = {'curr': user_points, 'played': 1, 'last': 0, 'seq': self.seq}
+                self.new_users.add(username)
+
+            self.movers_new.append(self._add(username))
+
+        self.movers_old.sort()
+        self.movers_new.sort()
+
+    def _ahead(self, group):
+        return bisect_left(self.keys, group)
+
+    def get_rank(self, username):
+        """returns username's rank, eg. 3 or "T3" """
+        group = self._group(username)
+        return self._format_rank(self._ahead(group), self.group_counts[group])
+
+    def get_previous_rank(self, username):
+        """returns the rank username had before the last game, 0 if they weren't on the board"""
+        if username in self.new_users:
+            return 0
+        if self.seq == 0:
+            return self.loaded_ranks.get(username, 0)
+        if self.previous_ranks is not None:
+            return self.previous_ranks.get(username, 0)
+
+        user = self.users[username]
+        group = self._group(username)
+        if user['seq'] == self.seq:
+            # they played, so their old group is one game and this game's points back
+            group = (-(user['curr'] - user['last']), user['played'] - 1)
+
+        # users that moved into the group weren't there before and the ones that moved out were
+        ahead = (self._ahead(group) - bisect_left(self.movers_new, group) + bisect_left(self.movers_old, group))
+        count = (self.group_counts.get(group, 0)
+                 - (bisect_right(self.movers_new, group) - bisect_left(self.movers_new, group))
+                 + (bisect_right(self.movers_old, group) - bisect_left(self.movers_old, group)))
+        return self._format_rank(ahead, count)
+
+    def get_delta(self, username):
+        """returns how many spots username moved in the last game as a string"""
+        if self.seq == 0 and username in self.loaded_deltas:
+            return self.loaded_deltas[username]
+        return str(_convert_rank(self.get_previous_rank(username)) - _convert_rank(self.get_rank(username)))
+
+    def get_last(self, username):
+        """returns the points username got in the last game, 0 if they didn't play it"""
+        user = self.users[username]
+        return user['last'] if user['seq'] == self.seq else 0
+
+    def get_user(self, username):
+        """returns username's standings in the format of GWGLeaderUpdater.add_user_rankings"""
+        user = self.users[username]
+        return {'curr': user['curr'],
+                'last': self.get_last(username),
+                'played': user['played'],
+                'rank': self.get_rank(username),
+                'delta': self.get_delta(username)}
+
+    def to_dict(self):
+        """returns everyone's standings in the format of GWGLeaderUpdater.add_user_rankings"""
+        return {username: self.get_user(username) for username in self.users}
+
+    def ordered(self):
+        """returns the usernames in leaderboard order, best first. Users with the same points and
+        games played are ordered by their last game's points, then name.
+        """
+        result = []
+        group_start = 0
+        while group_start < len(self.keys):
+            group = self.keys[group_start][:2]
+            group_end = group_start + self.group_counts[group]
+            members = [key[2] for key in self.keys[group_start:group_end]]
+            result += sorted(members, key=lambda x: -self.get_last(x))
+            group_start = group_end
+        return result
@@ -0,0 +1,139 @@
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+
+STANDINGS_FILE = 'standings_%s.db'
+
+log = logging.getLogger("standings_store")
+
+
+class StandingsStore():
+    """The leaderboard standings of one team kept in a local SQLite database.
+
+    For every user we keep their points, games played, last game's points, rank and rank
+    change, plus the points they got in every game applied. A game is applied in a single
+    transaction together with the standings it produced, so applying the same game twice does
+    nothing. The google sheet is only a published copy of what is in here.
+    """
+
+    db_file = None
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self.lock = threading.Lock()
+        # the team's cycle can run on a different pool thread every time
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+
+        with self.lock, self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS standings (
+                    username TEXT PRIMARY KEY,
+                    points INTEGER NOT NULL,
+                    played INTEGER NOT NULL,
+                    last INTEGER NOT NULL,
+                    rank TEXT NOT NULL,
+                    delta TEXT NOT NULL);
+                CREATE TABLE IF NOT EXISTS games (
+                    game TEXT PRIMARY KEY,
+                    applied TEXT NOT NULL);
+                CREATE TABLE IF NOT EXISTS game_points (
+                    game TEXT NOT NULL,
+                    username TEXT NOT NULL,
+                    points INTEGER NOT NULL,
+                    PRIMARY KEY (game, username));
+                """)
+
+    def close(self):
+        self.conn.close()
+
+    def is_empty(self):
+        """checks if the store has never been filled"""
+        with self.lock:
+            standings = self.conn.execute("SELECT COUNT(*) FROM standings").fetchone()[0]
+            games = self.conn.execute("SELECT COUNT(*) FROM games").fetchone()[0]
+        return standings == 0 and games == 0
+
+    def has_game(self, game):
+        """checks if game (eg. GM5) has already been applied"""
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM games WHERE game = ?", (game,)).fetchone() is not None
+
+    def get_games(self):
+        """returns every game that has been applied, in the order they were applied"""
+        with self.lock:
+            return [row[0] for row in self.conn.execute("SELECT game FROM games ORDER BY rowid")]
+
+    def get_user_games(self, username):
+        """returns a dict of game to points for every game username has played"""
+        with self.lock:
+            return dict(self.conn.execute("SELECT game, points FROM game_points WHERE username = ?", (username,)))
+
+    def get_leaders(self):
+        """returns the standings in the format of DriveManager.get_current_leaders, plus the rank change"""
+        with self.lock:
+            rows = self.conn.execute("SELECT username, points, played, last, rank, delta FROM standings").fetchall()
+
+        leaders = {}
+        for username, points, played, last, rank, delta in rows:
+            leaders[username] = {'curr': points, 'played': played, 'last': last,
+                                 'rank': int(rank) if rank.isdigit() else rank, 'delta': delta}
+        return leaders
+
+    def _write_standings(self, leaders):
+        """replaces the standings table. Must be called inside a transaction holding self.lock"""
+        self.conn.execute("DELETE FROM standings")
+        self.conn.executemany("INSERT INTO standings VALUES (?, ?, ?, ?, ?, ?)",
+                              [(username, int(scores['curr']), int(scores['played']), int(scores['last']),
+                                str(scores['rank']), str(scores.get('delta', "0")))
+                               for username, scores in leaders.items()])
+
+    def replace_standings(self, leaders, games=None):
+        """overwrites the standings with leaders, eg. the ones read from the sheet. games are
+        marked as applied so they aren't counted again.
+        """
+        now = datetime.utcnow().isoformat()
+        with self.lock, self.conn:
+            self._write_standings(leaders)
+            self.conn.executemany("INSERT OR IGNORE INTO games VALUES (?, ?)", [(game, now) for game in games or []])
+
+    def apply_game(self, game, points, leaders):
+        """records the points every user got in game and the standings after it in one transaction.
+
+        Returns False without changing anything if game was already applied.
+        """
+        try:
+            with self.lock, self.conn:
+                self.conn.execute("INSERT INTO games VALUES (?, ?)", (game, datetime.utcnow().isoformat()))
+                self.conn.executemany("INSERT OR REPLACE INTO game_points VALUES (?, ?, ?)",
+                                      [(game, username, int(user_points))
+                                       for username, user_points in (points or {}).items()])
+                self._write_standings(leaders)
+            return True
+
+        except sqlite3.IntegrityError:
+            log.info("Game %s was already applied to the standings" % game)
+            return False
+
+    def reconcile(self, sheet_leaders):
+        """compares the standings read from the sheet with ours. Returns a list of
+        (username, field, our value, sheet value) for everything that differs, where a user
+        missing from one side has field "user".
+        """
+        leaders = self.get_leaders()
+        differences = []
+
+        for username in sorted(set(leaders) | set(sheet_leaders)):
+            if username not in sheet_leaders:
+                differences.append((username, "user", "present", None))
+                continue
+            if username not in leaders:
+                differences.append((username, "user", None, "present"))
+                continue
+
+            for field in ['curr', 'last', 'played']:
+                ours, theirs = leaders[username][field], sheet_leaders[username][field]
+                if str(ours) != str(theirs):
+                    differences.append((username, field, ours, theirs))
+
+        return differences
@@ -0,0 +1,61 @@
+import logging
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+# how many teams are worked on at the same time
+MAX_TEAM_WORKERS = 4
+
+log = logging.getLogger("gwg_poster")
+
+
+def _timed_cycle(cycle, team):
+    """runs cycle(team) and returns its result, how long it took and the exception it raised if any"""
+    start = perf_counter()
+    result = error = None
+
+    try:
+        result = cycle(team)
+    except (Exception, SystemExit) as e:
+        # a team that fails (eg. a SheetsError once google's retries run out) or exits shouldn't
+        # take the other teams down with it
+        log.error("Team %s failed its cycle: %s" % (team, e))
+        log.error(traceback.format_exc())
+        error = e
+
+    return {'result': result, 'error': error, 'seconds': perf_counter() - start}
+
+
+def new_team_pool(max_workers=MAX_TEAM_WORKERS):
+    """returns a pool of threads to pass to run_for_teams every cycle. Its threads are only
+    started once and keep their google clients (see drive_manager.GoogleAuth) between cycles.
+    """
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="team")
+
+
+def run_for_teams(teams, cycle, max_workers=MAX_TEAM_WORKERS, pool=None):
+    """runs cycle(team) for every team in teams on a bounded pool of threads. Without a pool
+    (from new_team_pool) one is made for this call and shut down after it.
+
+    A team that raises doesn't stop the others. Returns a dict of team to a dict with the
+    cycle's 'result', the 'error' it raised (or None) and how many 'seconds' it took.
+    """
+    teams = list(teams)
+    if not teams:
+        return {}
+
+    own_pool = pool is None
+    if own_pool:
+        pool = new_team_pool(min(max_workers, len(teams)))
+
+    try:
+        futures = {team: pool.submit(_timed_cycle, cycle, team) for team in teams}
+        results = {team: future.result() for team, future in futures.items()}
+    finally:
+        if own_pool:
+            pool.shutdown()
+
+    for team in teams:
+        log.info("Team %s cycle took %.2f seconds%s" % (team, results[team]['seconds'],
+                                                        " and failed" if results[team]['error'] else ""))
+    return results
@@ -0,0 +1,144 @@
+import os
+import sys
+
+sys.path.insert(0, './mocks')
+
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from api_metrics import ApiMetrics
+
+
+class FakeSession():
+    """stands in for gspread's HTTPSession"""
+
+    def __init__(self, content=b"", error=None):
+        self.content = content
+        self.error = error
+
+    def request(self, method, url, data=None, params=None):
+        if self.error:
+            raise self.error
+        return MagicMock(content=self.content)
+
+
+class FakeManager():
+    """calls out through a private helper, like DriveManager does"""
+
+    def __init__(self, gc):
+        self.gc = gc
+
+    def get_sheet(self):
+        return self._open()
+
+    def _open(self):
+        return self.gc.session.request("GET", "https://spreadsheets.google.com/feeds/cells/1aBcD3fGh1jK2lMn0pQ/od6/private/full")
+
+
+class TestApiMetrics(unittest.TestCase):
+
+    # setup and teardown methods
+    # these get ran before EVERY test method below
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.metrics_file = os.path.join(self.temp_dir.name, "api_metrics.prom")
+        self.metrics = ApiMetrics()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_disabled_wraps_nothing(self):
+        # GIVEN metrics that were never enabled
+        gc = MagicMock()
+        gc.session = FakeSession()
+        request = gc.session.request
+
+        # WHEN a client is instrumented and a call is tracked
+        self.metrics.instrument_gspread(gc)
+        with self.metrics.track("statsapi", "GET schedule"):
+            pass
+
+        # THEN the client is untouched and nothing is counted
+        self.assertEqual(gc.session.request, request)
+        self.assertEqual(self.metrics.end_cycle(), {})
+        self.assertFalse(os.path.exists(self.metrics_file))
+
+    def test_gspread_calls_counted_against_public_caller(self):
+        # GIVEN an instrumented gspread client
+        self.metrics.enable(self.metrics_file)
+        gc = MagicMock()
+        gc.session = FakeSession(content=b"12345")
+        manager = FakeManager(self.metrics.instrument_gspread(gc))
+
+        # WHEN it is called twice through a private helper
+        manager.get_sheet()
+        manager.get_sheet()
+
+        # THEN the calls land on the public method with their bytes and no id in the method name
+        calls = self.metrics.end_cycle()
+        stats = calls[("gspread", "FakeManager.get_sheet", "GET feeds/cells")]
+        self.assertEqual(stats['calls'], 2)
+        self.assertEqual(stats['bytes'], 10)
+        self.assertEqual(stats['errors'], {})
+
+    def test_errors_counted_by_class(self):
+        # GIVEN an instrumented client that fails
+        self.metrics.enable(self.metrics_file)
+        gc = MagicMock()
+        gc.session = FakeSession(error=ConnectionError("reset"))
+        manager = FakeManager(self.metrics.instrument_gspread(gc))
+
+        # WHEN it is called
+        with self.assertRaises(ConnectionError):
+            manager.get_sheet()
+
+        # THEN the error is counted and still raised
+        stats = list(self.metrics.end_cycle().values())[0]
+        self.assertEqual(stats['errors'], {'ConnectionError': 1})
+
+    def test_http_error_status_counted(self):
+        # GIVEN an instrumented httplib2 connection that answers 404
+        self.metrics.enable(self.metrics_file)
+        http = MagicMock()
+        http.request.return_value = (MagicMock(status=404), b"not found")
+        self.metrics.instrument_http(http)
+
+        # WHEN the drive service calls it
+        http.request("https://www.googleapis.com/drive/v2/files?alt=json", "GET")
+
+        # THEN the status is recorded as the error
+        stats = self.metrics.end_cycle()
+        self.assertEqual(len(stats), 1)
+        (api, caller, method), stats = list(stats.items())[0]
+        self.assertEqual((api, method), ("drive", "GET drive/files"))
+        self.assertEqual(stats['errors'], {'HTTP 404': 1})
+        self.assertEqual(stats['bytes'], 9)
+
+    def test_end_cycle_writes_prometheus_file_and_resets(self):
+        # GIVEN calls recorded in a cycle
+        self.metrics.enable(self.metrics_file)
+        self.metrics.start_cycle()
+        self.metrics.record("statsapi", "GET schedule", "ScheduleCache.get_dates", 0.25, 1000)
+        self.metrics.record("statsapi", "GET schedule", "ScheduleCache.get_dates", 0.5, 1000, "URLError")
+
+        # WHEN the cycle ends
+        self.metrics.end_cycle()
+
+        # THEN the totals are in the text file
+        with open(self.metrics_file) as metrics_data:
+            lines = metrics_data.read().splitlines()
+        labels = 'api="statsapi",caller="ScheduleCache.get_dates",method="GET schedule"'
+        self.assertIn('gwg_api_cycle_calls{%s} 2' % labels, lines)
+        self.assertIn('gwg_api_cycle_seconds{%s} 0.750000' % labels, lines)
+        self.assertIn('gwg_api_cycle_max_seconds{%s} 0.500000' % labels, lines)
+        self.assertIn('gwg_api_cycle_bytes{%s} 2000' % labels, lines)
+        self.assertIn('gwg_api_cycle_errors{%s,error="URLError"} 1' % labels, lines)
+        self.assertIn('# TYPE gwg_api_cycle_calls gauge', lines)
+
+        # AND the next cycle starts empty
+        self.assertEqual(self.metrics.calls, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
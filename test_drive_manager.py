@@ -0,0 +1,613 @@
+import os
+import sys
+
+sys.path.insert(0, './mocks')
+
+import tempfile
+import threading
+import unittest
+from time import perf_counter
+from unittest.mock import patch, MagicMock
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+import drive_manager
+from drive_manager import DriveManager
+from request_scheduler import SheetsError, SheetsQuotaError
+from team_pool import new_team_pool, run_for_teams
+
+# import test mocks
+from mock_drive_service import MockDriveService
+from mock_gspread import MockGspreadClient
+from mock_secret_manager import MockSecretManager
+
+
+class TestDriveManager(unittest.TestCase):
+
+    # setup and teardown methods
+    # these get ran before EVERY test method below
+    def setUp(self):
+        secrets = MockSecretManager()
+        secrets.get_previous_winners = lambda team: {'user0': "Winner 16-17"}
+        secrets.get_teams_parent_folder = lambda team: "folder"
+        self.secrets = secrets
+
+        self.gc = MockGspreadClient()
+        self.book = self.gc.add_book('leaderboard')
+        self.leaderboard = self.book.add_sheet("Leaderboard", [["GWG Leaderboard"], ["Rank"]])
+        self.book.add_sheet("Answer Key", [["Game"]])
+        self.book.add_sheet("GM1", [["GM1"]])
+
+        self.drive_manager = self._make_drive_manager()
+        self.drive_manager.drive_files = {'leaderboard': {'id': 'leaderboard'}}
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        changes_file = patch('drive_manager.DRIVE_CHANGES_FILE', os.path.join(self.temp_dir.name, "changes_%s.json"))
+        changes_file.start()
+        self.addCleanup(changes_file.stop)
+        response_file = patch('drive_manager.RESPONSE_CACHE_FILE', os.path.join(self.temp_dir.name, "responses_%s.json"))
+        response_file.start()
+        self.addCleanup(response_file.stop)
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def _make_drive_manager(self):
+        manager = DriveManager(self.secrets, team="-1", update=False)
+        manager.gc = self.gc
+        manager.refresh_gdrive_credentials = lambda: None
+        return manager
+
+    def _make_leaders(self, num_users):
+        leaders = {}
+        for x in range(num_users):
+            leaders["user%s" % x] = {'curr': num_users - x, 'last': 1, 'played': 1,
+                                     'rank': x + 1, 'delta': "0"}
+        return leaders
+
+    # test cases
+    def test_overwrite_leaderboard_batch_writes_sorted_block(self):
+        # GIVEN: Three users on the leaderboard
+        leaders = self._make_leaders(3)
+
+        # WHEN: Overwriting the leaderboard
+        self.drive_manager.overwrite_leaderboard(leaders)
+
+        # THEN: The block is written under the headers, best user first
+        values = self.leaderboard.get_all_values()
+        self.assertEqual(["1", "0", "user0", "3", "1", "1/1", "Winner 16-17"], values[2])
+        self.assertEqual(["3", "0", "user2", "1", "1", "1/1", ""], values[4])
+
+    def test_overwrite_leaderboard_write_count_is_constant(self):
+        # GIVEN: A small and a large leaderboard
+        write_counts = []
+        for num_users in [5, 500]:
+            start = self.drive_manager.write_requests
+
+            # WHEN: Overwriting the leaderboard
+            self.drive_manager.overwrite_leaderboard(self._make_leaders(num_users))
+            write_counts.append(self.drive_manager.write_requests - start)
+
+        # THEN: Both cost the same handful of write requests
+        self.assertEqual(write_counts[0], write_counts[1])
+        self.assertLessEqual(write_counts[1], 2)
+
+    def test_overwrite_leaderboard_cell_mode_matches_batch(self):
+        # GIVEN: The same users written in both modes
+        leaders = self._make_leaders(4)
+        self.drive_manager.overwrite_leaderboard(leaders, mode="batch")
+        batch_values = self.leaderboard.get_all_values()
+
+        # WHEN: Writing them one cell at a time
+        self.drive_manager.overwrite_leaderboard(leaders, mode="cell")
+
+        # THEN: The sheet ends up identical
+        self.assertEqual(batch_values, self.leaderboard.get_all_values())
+
+    def test_overwrite_leaderboard_diff_mode_writes_changed_cells(self):
+        # GIVEN: A leaderboard already on the sheet from before we started
+        leaders = self._make_leaders(200)
+        self.drive_manager.overwrite_leaderboard(leaders)
+        batch_values = self.leaderboard.get_all_values()
+        self.drive_manager.leaderboard_snapshot = None
+
+        # WHEN: Publishing the same standings as a diff
+        self.gc.reset_requests()
+        self.drive_manager.overwrite_leaderboard(leaders, mode="diff")
+
+        # THEN: The sheet is read once to diff against and nothing is written
+        self.assertEqual(self.gc.requests['get_all_values'], 1)
+        self.assertEqual(self.gc.requests.get('update_cells', 0), 0)
+        self.assertEqual(self.drive_manager.leaderboard_cells_changed, 0)
+
+        # WHEN: Two users played the next game
+        leaders['user150'] = dict(leaders['user150'], last=3)
+        leaders['user199'] = dict(leaders['user199'], last=2)
+        self.gc.reset_requests()
+        self.drive_manager.overwrite_leaderboard(leaders, mode="diff")
+
+        # THEN: Only their cells go out, diffed against the snapshot, and the sheet matches batch mode
+        self.assertEqual(self.gc.requests.get('get_all_values', 0), 0)
+        self.assertEqual(self.gc.requests['update_cells'], 1)
+        self.assertEqual(self.drive_manager.leaderboard_cells_changed, 2)
+        self.drive_manager.overwrite_leaderboard(leaders, mode="batch")
+        self.assertEqual(self.leaderboard.get_all_values()[152][4], "3")
+        self.assertEqual(sum(1 for old, new in zip(batch_values, self.leaderboard.get_all_values()) if old != new), 2)
+
+    def test_cell_diff_only_writes_changed_cells(self):
+        # GIVEN: A sheet we know the contents of
+        old_rows = [["1", "0", "user%s" % x, str(100 - x)] for x in range(100)]
+        sheet = self.book.add_sheet("Diff", old_rows)
+        rows = [list(row) for row in old_rows]
+        rows[3][3] = "99"
+        rows[90][1] = "+2"
+        rows.append(["101", "0", "new user", "1"])
+
+        # WHEN: Writing the new rows as a diff
+        self.gc.reset_requests()
+        changed = self.drive_manager._write_cell_diff(sheet, old_rows, rows)
+
+        # THEN: Only the changed cells go out, in one batched update
+        self.assertEqual(changed, 6)
+        self.assertEqual(self.gc.requests['update_cells'], 1)
+        self.assertEqual(self.gc.requests['range'], 2)
+        self.assertEqual(sheet.get_all_values(), rows)
+
+    def test_provisional_standings_diffed_and_not_counted_as_a_game(self):
+        # GIVEN: Provisional standings published once
+        leaders = self._make_leaders(20)
+        changed = self.drive_manager.write_provisional_standings(leaders, "GM2")
+        provisional = self.book.sheets[-1]
+        self.assertEqual(changed, len([cell for row in provisional.get_all_values() for cell in row if cell]))
+        self.assertEqual(provisional.title, "Provisional")
+        self.assertEqual(provisional.get_all_values()[2][5], "1/2")
+
+        # WHEN: One more answer moves one user
+        leaders['user19'] = dict(leaders['user19'], curr=5, last=2)
+        self.gc.reset_requests()
+        changed = self.drive_manager.write_provisional_standings(leaders, "GM2", ordered=sorted(leaders, key=lambda x: int(x[4:])))
+
+        # THEN: Only that user's cells are written and the official leaderboard doesn't count the sheet as a game
+        self.assertEqual(changed, 2)
+        self.assertEqual(self.gc.requests.get('get_all_values', 0), 0)
+        self.drive_manager.overwrite_leaderboard(self._make_leaders(1))
+        self.assertEqual(self.leaderboard.get_all_values()[2][5], "1/1")
+
+        # AND: It is removed once the game is official
+        self.assertTrue(self.drive_manager.remove_provisional_standings())
+        self.assertEqual(["Leaderboard", "Answer Key", "GM1"], [sheet.title for sheet in self.book.sheets])
+
+    def test_handle_cache_reuses_worksheets_until_structure_changes(self):
+        # GIVEN: The answer key and list of sheets read twice in one cycle
+        for x in range(2):
+            self.drive_manager.get_all_sheet_lines('leaderboard', sheet=1)
+            self.drive_manager.get_all_books_sheets('leaderboard')
+
+        # THEN: The spreadsheet was only opened once
+        self.assertEqual(1, self.gc.requests['open_by_key'])
+        self.assertEqual({'hits': 3, 'misses': 3}, self.drive_manager.get_handle_cache_stats())
+
+        # WHEN: We add a new game sheet
+        self.drive_manager.create_new_sheet(self._make_new_sheet(1))
+
+        # THEN: The list of sheets is read again and includes the new one
+        self.assertIn("GM2", self.drive_manager.get_all_books_sheets('leaderboard'))
+
+    def test_answer_key_is_read_once_per_cycle(self):
+        # GIVEN: An answer key with one scored game and one game ready to be written
+        self.book.sheets[1].set_values([
+            ["Game", "Date", "GWG", "", "Q2", "", "Q3", "Ready", "Written", "Title"],
+            ["GM1", "2018/01/01 19:00", "a", "", "b", "", "c", "Yes", "yes", ""],
+            ["GM2", "2018/01/03 19:00", "a", "", "b", "", "c", "yes", "", "Jets @ Leafs"]])
+
+        # WHEN: Every answer key lookup of a cycle runs
+        pending = self.drive_manager.new_response_data_available()
+        unwritten = self.drive_manager.get_unwritten_leaderboard_games()
+        result = self.drive_manager.get_games_result("GM2")
+        self.drive_manager.update_game_start_time("GM2")
+        self.drive_manager.update_answerkey_results([game['row'] for game in unwritten])
+
+        # THEN: The answers are right and the sheet was only read once
+        self.assertEqual(["GM2"], pending)
+        self.assertEqual([3], [game['row'] for game in unwritten])
+        self.assertEqual(["GM2", "2018/01/03 19:00", "a", "", "b", "", "c"], result['result'])
+        self.assertEqual("Jets @ Leafs", self.drive_manager.get_answer_key().get_title_override(2))
+        self.assertEqual([], self.drive_manager.get_unwritten_leaderboard_games())
+        self.assertEqual("yes", self.book.sheets[1].data[2][8])
+        self.assertEqual(1, self.gc.requests['get_all_values'])
+
+    def test_history_game_points_reads_game_sheet_once(self):
+        # GIVEN: A scored game with one on time, one blank and one late entry
+        self.book.sheets[2].set_values([
+            [],
+            ["Game", "Date", "username"],
+            ["GM1", "2018/01/01 19:00", ""],
+            [],
+            ["", "2018/01/01 18:59", " Jets_Fan ", "", "", "", "", "", "2"],
+            ["", "", "", "", "", "", "", "", ""],
+            ["", "2018/01/01 19:01", "late_fan", "", "", "", "", "", "3"]])
+        self.drive_manager.get_all_books_sheets('leaderboard')
+        self.gc.reset_requests()
+
+        # WHEN: Reading the players points for the game
+        results = self.drive_manager.get_history_game_points(["GM1"])
+
+        # THEN: Only the on time entry counts and the sheet was read with a single request
+        self.assertEqual({'jets_fan': "2"}, results)
+        self.assertEqual({'range': 1}, self.gc.requests)
+
+    def _make_drive_files(self, num_files):
+        files = []
+        for x in range(num_files):
+            files.append({'id': "file%s" % x,
+                          'title': "GWG %s (Responses)" % x,
+                          'mimeType': "application/vnd.google-apps.spreadsheet",
+                          'createdDate': "2018-01-01T00:00:00.000Z",
+                          'alternateLink': "https://docs.google.com/file%s" % x,
+                          'embedLink': "https://docs.google.com/file%s/embed" % x})
+        return files
+
+    def test_drive_file_listing_is_one_request(self):
+        # GIVEN: A late season folder with 80+ files behind a slow drive api
+        files = self._make_drive_files(85)
+        self.drive_manager.service = MockDriveService(files, latency=0.002)
+
+        # WHEN: Listing the folder the old way, a children list then one get per child
+        start = perf_counter()
+        children = self.drive_manager.service.children().list(folderId="folder").execute()
+        old_results = [self.drive_manager.service.files().get(fileId=child['id']).execute()
+                       for child in children['items']]
+        old_time = perf_counter() - start
+        old_requests = self.drive_manager.service.total_requests()
+        self.drive_manager.service.requests = {}
+
+        # AND: The new way
+        start = perf_counter()
+        new_results = self.drive_manager.get_all_drive_file_metadatas()
+        new_time = perf_counter() - start
+
+        # THEN: The same files come back with one request, a lot faster
+        self.assertEqual(old_results, new_results)
+        self.assertEqual(old_requests, 86)
+        self.assertEqual({'files.list': 1}, self.drive_manager.service.requests)
+        self.assertLess(new_time, old_time)
+
+    def test_drive_file_listing_leaves_out_trashed_files(self):
+        # GIVEN: A folder with a form the team trashed
+        files = self._make_drive_files(5)
+        files[2]['labels'] = {'trashed': True}
+        self.drive_manager.service = MockDriveService(files)
+
+        # WHEN: Listing the folder in full with the paged list
+        listed = self.drive_manager.get_all_drive_file_metadatas()
+
+        # AND: With the children fallback when the list fails
+        error = HttpError(httplib2.Response({'status': 500}), b"backend error")
+        with patch('mock_drive_service.MockFiles.list', side_effect=error):
+            fallback = self.drive_manager.get_all_drive_file_metadatas()
+
+        # THEN: The trashed file isn't in either, the same as the changes feed drops it
+        self.assertEqual([file['id'] for file in listed], ["file0", "file1", "file3", "file4"])
+        self.assertEqual(sorted(file['id'] for file in fallback), ["file0", "file1", "file3", "file4"])
+
+    def test_collect_file_metadata_batches_requests(self):
+        # GIVEN: More children than fit in one batch
+        files = self._make_drive_files(150)
+        self.drive_manager.service = MockDriveService(files)
+
+        # WHEN: Collecting their metadata one by one
+        results = self.drive_manager._collect_file_metadata([{'id': file['id']} for file in files])
+
+        # THEN: Everything is fetched in two batches, in order
+        self.assertEqual(files, results)
+        self.assertEqual({'batch': 2}, self.drive_manager.service.requests)
+
+    def _make_drive_folder(self):
+        files = self._make_drive_files(3)
+        files[0]['title'] = "GWG Leaderboard"
+        return MockDriveService(files)
+
+    def _changed_file(self, file_id, title, parent="folder", trashed=False):
+        return {'id': file_id,
+                'title': title,
+                'mimeType': "application/vnd.google-apps.spreadsheet",
+                'createdDate': "2018-01-02T00:00:00.000Z",
+                'alternateLink': "https://docs.google.com/%s" % file_id,
+                'embedLink': "https://docs.google.com/%s/embed" % file_id,
+                'parents': [{'id': parent}],
+                'labels': {'trashed': trashed}}
+
+    def test_update_drive_files_polls_changes_after_first_listing(self):
+        # GIVEN: A folder that was fully listed once
+        service = self._make_drive_folder()
+        self.drive_manager.service = service
+        self.drive_manager.update_drive_files()
+        self.assertEqual({'changes.getStartPageToken': 1, 'files.list': 1}, service.requests)
+
+        # WHEN: A response is added, another renamed, one moved out of the folder and an unrelated file changes
+        service.add_change("file9", self._changed_file("file9", "GWG 9 (Responses)"))
+        service.add_change("file1", self._changed_file("file1", "GWG 11 (Responses)"))
+        service.add_change("file2", self._changed_file("file2", "GWG 2 (Responses)", parent="elsewhere"))
+        service.add_change("other", self._changed_file("other", "Taxes", parent="elsewhere"))
+        service.requests = {}
+        self.drive_manager.update_drive_files()
+
+        # THEN: Only the changes feed was read and the catalog matches the folder
+        self.assertEqual({'changes.list': 1}, service.requests)
+        self.assertEqual("GWG Leaderboard", self.drive_manager.get_drive_filetype('leaderboard')['title'])
+        self.assertEqual(["GWG 11 (Responses)", "GWG 9 (Responses)"],
+                         sorted(file['title'] for file in self.drive_manager.get_drive_filetype('responses')))
+
+        # AND: A restarted manager keeps polling from the saved token
+        restarted = self._make_drive_manager()
+        restarted.service = service
+        service.requests = {}
+        restarted.update_drive_files()
+        self.assertEqual({'changes.list': 1}, service.requests)
+        self.assertEqual(self.drive_manager.drive_files, restarted.drive_files)
+
+    def test_update_drive_files_relists_when_token_expires(self):
+        # GIVEN: A folder that was fully listed once and a change token that has since expired
+        service = self._make_drive_folder()
+        self.drive_manager.service = service
+        self.drive_manager.update_drive_files()
+        service.expired_tokens.add(self.drive_manager.changes_token)
+        service.requests = {}
+
+        # WHEN: Updating the drive files
+        self.drive_manager.update_drive_files()
+
+        # THEN: The folder is listed again from scratch
+        self.assertEqual({'changes.list': 1, 'changes.getStartPageToken': 1, 'files.list': 1}, service.requests)
+        self.assertEqual(2, len(self.drive_manager.get_drive_filetype('responses')))
+
+    def _make_new_sheet(self, num_entries):
+        entry = ["", "2018/01/01 18:00:00", "user", "a", "", "b", "", "c", 1, ""]
+        return {'id': 'leaderboard',
+                'name': 'GM2',
+                'rows': num_entries + 1,
+                'cols': 6,
+                'data': [["Game", "Date"], ["GM2", "2018/01/01 19:00"], ""] + [entry] * num_entries,
+                'late': [entry],
+                'stats': [["Total entries: %s" % (num_entries + 1)]]}
+
+    def test_create_new_sheet_layout(self):
+        # GIVEN: A game with two on time entries and one late entry
+        sheet_info = self._make_new_sheet(2)
+
+        # WHEN: Creating the game sheet
+        self.assertTrue(self.drive_manager.create_new_sheet(sheet_info))
+
+        # THEN: Headers start on row 2 and the late entries follow a blank row
+        values = self.book.sheets[-1].get_all_values()
+        self.assertEqual("", values[0][0])
+        self.assertEqual("2018/01/01 19:00", values[2][1])
+        self.assertEqual("user", values[4][2])
+        self.assertEqual(["Late entries:"], values[7][:1])
+        self.assertEqual("Total entries: 3", values[10][0])
+
+    def test_create_new_sheet_request_count_is_constant(self):
+        # GIVEN: A small and a large game
+        request_counts = []
+        for num_entries in [5, 500]:
+            sheet_info = self._make_new_sheet(num_entries)
+            sheet_info['name'] = "GM%s" % num_entries
+            self.gc.reset_requests()
+
+            # WHEN: Creating the game sheet
+            self.drive_manager.create_new_sheet(sheet_info)
+            request_counts.append(self.gc.total_requests())
+
+        # THEN: Both cost the same handful of requests
+        self.assertEqual(request_counts[0], request_counts[1])
+        self.assertLessEqual(request_counts[1], 4)
+
+    def test_create_new_sheet_failure_deletes_partial_sheet(self):
+        # GIVEN: A game sheet that fails while being written
+        sheet_info = self._make_new_sheet(2)
+        self.drive_manager._write_block = lambda *args, **kwargs: 1 / 0
+
+        # WHEN: Creating the game sheet
+        result = self.drive_manager.create_new_sheet(sheet_info)
+
+        # THEN: The partial sheet is removed again
+        self.assertFalse(result)
+        self.assertEqual(["Leaderboard", "Answer Key", "GM1"], [sheet.title for sheet in self.book.sheets])
+
+    def test_sheet_errors_raise_instead_of_exiting(self):
+        # GIVEN: A response sheet that can't be opened and a leaderboard google keeps throttling
+        self.drive_manager.gc.open_by_key = MagicMock(side_effect=KeyError("missing"))
+
+        # WHEN: Reading it THEN: A SheetsError is raised for the cycle to handle
+        with self.assertRaises(SheetsError):
+            self.drive_manager.get_all_sheet_lines("missing")
+
+        self.drive_manager.gc.open_by_key = MagicMock(side_effect=SheetsQuotaError("throttled", 429))
+        with self.assertRaises(SheetsQuotaError):
+            self.drive_manager.get_file_entries({'id': "leaderboard", 'title': "GWG GM5 (Responses)"})
+
+    def _make_response_sheet(self, num_rows):
+        book = self.gc.add_book('responses')
+        rows = [["Timestamp", "Username", "GWG", "Q2", "Q3"]]
+        rows += [["05/10/2018 18:%02d:00" % (x % 60), "user%s" % x, "Laine", "", "Yes"] for x in range(num_rows)]
+        # form response sheets come with plenty of blank rows
+        return book.add_sheet("Form Responses 1", rows, row_count=1000), rows
+
+    def test_file_entries_only_reads_new_rows(self):
+        # GIVEN: A response sheet we have read before
+        sheet, rows = self._make_response_sheet(300)
+        file_data = {'id': "responses", 'title': "GWG GM5 (Responses)"}
+        first = self.drive_manager.get_file_entries(file_data)
+        self.assertEqual(first['new_from'], 0)
+
+        # WHEN: More responses come in (one with an extra column filled) and it is read again
+        rows += [["05/10/2018 18:59:%02d" % x, "late%s" % x, "Wheeler", "", "No", "comment"] for x in range(3)]
+        sheet.set_values(rows)
+        self.drive_manager.clear_handle_cache()
+        self.gc.reset_requests()
+        second = self.drive_manager.get_file_entries(file_data)
+
+        # THEN: Only the header is checked and the rows from the last one we had on are fetched
+        # in one ranged read, none of the rows before it
+        self.assertEqual(self.gc.requests.get('get_all_values', 0), 0)
+        self.assertEqual(self.gc.requests['row_values'], 1)
+        self.assertEqual(self.gc.requests['range'], 1)
+        self.assertEqual(self.gc.cells_read, drive_manager.RESPONSE_CHUNK_ROWS * sheet.col_count)
+        self.assertEqual(second['new_from'], 301)
+        self.assertEqual(second['data'], sheet.get_all_values())
+
+    def test_file_entries_reloads_when_sheet_changed(self):
+        # GIVEN: A response sheet we have read before
+        sheet, rows = self._make_response_sheet(10)
+        file_data = {'id': "responses", 'title': "GWG GM5 (Responses)"}
+        self.drive_manager.get_file_entries(file_data)
+
+        for change in [lambda: rows[-1].__setitem__(2, "Ehlers"), lambda: rows[0].__setitem__(4, "Question 3")]:
+            # WHEN: The last row we had or the header is edited
+            change()
+            rows.append(["05/10/2018 18:59:00", "new", "Laine", "", "Yes"])
+            sheet.set_values(rows)
+            self.drive_manager.clear_handle_cache()
+            self.gc.reset_requests()
+            entries = self.drive_manager.get_file_entries(file_data)
+
+            # THEN: The whole sheet is read again
+            self.assertEqual(self.gc.requests['get_all_values'], 1)
+            self.assertEqual(entries['new_from'], 0)
+            self.assertEqual(entries['data'], rows)
+
+    def test_file_entries_verify_finds_changed_middle_rows(self):
+        # GIVEN: A response sheet we have prefetched before
+        sheet, rows = self._make_response_sheet(300)
+        file_data = {'id': "responses", 'title': "GWG GM5 (Responses)"}
+        self.drive_manager.get_file_entries(file_data)
+
+        # WHEN: Nothing we had changed and it is read for scoring
+        rows.append(["05/10/2018 18:58:00", "new", "Laine", "", "Yes"])
+        sheet.set_values(rows)
+        self.drive_manager.clear_handle_cache()
+        self.gc.reset_requests()
+        entries = self.drive_manager.get_file_entries(file_data, verify=True)
+
+        # THEN: It is read once and only the new row needs parsing
+        self.assertEqual(self.gc.requests['get_all_values'], 1)
+        self.assertEqual(entries['new_from'], 301)
+        self.assertEqual(entries['data'], rows)
+
+        for change in [lambda: rows[150].__setitem__(2, "Scheifele"),
+                       lambda: rows.__setitem__(40, ["05/10/2018 18:39:30", "replaced", "Laine", "", "Yes"])]:
+            # WHEN: A response in the middle is edited, or deleted and replaced, and one is added
+            change()
+            rows.append(["05/10/2018 18:59:00", "new", "Laine", "", "Yes"])
+            sheet.set_values(rows)
+            self.drive_manager.clear_handle_cache()
+
+            # THEN: A prefetch doesn't look that far back
+            prefetched = self.drive_manager.get_file_entries(file_data)
+            self.assertEqual(prefetched['new_from'], len(rows) - 1)
+
+            # AND: The scoring read does, and everything is parsed again
+            self.gc.reset_requests()
+            entries = self.drive_manager.get_file_entries(file_data, verify=True)
+            self.assertEqual(self.gc.requests['get_all_values'], 1)
+            self.assertEqual(entries['new_from'], 0)
+            self.assertEqual(entries['data'], rows)
+
+    def _make_auth(self, expires_in=3600):
+        auth = drive_manager.GoogleAuth()
+        auth.discovery_cache_file = os.path.join(self.temp_dir.name, "discovery.json")
+        with open(auth.discovery_cache_file, "w") as document:
+            document.write('{"name": "drive"}')
+
+        credentials = MagicMock()
+        credentials.access_token = None
+
+        def refresh(http):
+            credentials.access_token = "token%s" % credentials.refresh.call_count
+            credentials.token_expiry = drive_manager.datetime.utcnow() + drive_manager.timedelta(seconds=expires_in)
+        credentials.refresh.side_effect = refresh
+        auth._get_credentials = lambda: credentials
+        return auth, credentials
+
+    @patch('drive_manager.discovery')
+    @patch('drive_manager.gspread')
+    def test_google_auth_shared_between_teams(self, mock_gspread, mock_discovery):
+        # GIVEN shared credentials used by two teams on two threads
+        auth, credentials = self._make_auth()
+        clients = []
+
+        def refresh():
+            clients.append(auth.get_clients())
+            clients.append(auth.get_clients())
+
+        # WHEN both teams refresh a few times
+        for x in range(2):
+            thread = threading.Thread(target=refresh)
+            thread.start()
+            thread.join()
+
+        # THEN the credentials are refreshed once and each thread reuses its own clients
+        self.assertEqual(1, credentials.refresh.call_count)
+        self.assertEqual(2, mock_discovery.build_from_document.call_count)
+        self.assertEqual(0, mock_discovery.build.call_count)
+        self.assertEqual(clients[0], clients[1])
+
+    @patch('drive_manager.discovery')
+    @patch('drive_manager.gspread')
+    def test_google_auth_clients_built_once_per_pool_thread(self, mock_gspread, mock_discovery):
+        # GIVEN shared credentials and the team pool the updater keeps between cycles
+        auth, credentials = self._make_auth()
+        pool = new_team_pool(max_workers=2)
+
+        # WHEN four teams run several cycles on it
+        try:
+            for x in range(3):
+                run_for_teams(range(4), lambda team: auth.get_clients(), pool=pool)
+        finally:
+            pool.shutdown()
+
+        # THEN the clients are only built for each of the pool's threads, not every cycle
+        self.assertLessEqual(mock_discovery.build_from_document.call_count, 2)
+        self.assertLessEqual(mock_gspread.authorize.call_count, 2)
+
+    @patch('drive_manager.discovery')
+    @patch('drive_manager.gspread')
+    def test_google_auth_refreshes_near_expiry(self, mock_gspread, mock_discovery):
+        # GIVEN a token that expires in less than the refresh margin
+        auth, credentials = self._make_auth(expires_in=drive_manager.TOKEN_REFRESH_MARGIN - 1)
+        gc = mock_gspread.authorize.return_value
+        gc.session.headers = {}
+        gc.login.side_effect = lambda: gc.session.headers.update(Authorization="Bearer " + credentials.access_token)
+        auth.get_clients()
+        gc.login()
+
+        # WHEN the clients are asked for again
+        auth.get_clients()
+
+        # THEN the token is refreshed and gspread logs in with the new one
+        self.assertEqual(2, credentials.refresh.call_count)
+        self.assertEqual(gc.session.headers['Authorization'], "Bearer token2")
+
+        # AND a token with time left is left alone
+        credentials.token_expiry = drive_manager.datetime.utcnow() + drive_manager.timedelta(hours=1)
+        auth.get_clients()
+        self.assertEqual(2, credentials.refresh.call_count)
+        self.assertEqual(2, gc.login.call_count)
+
+    def test_discovery_document_fetched_once_and_cached(self):
+        # GIVEN no cached discovery document
+        auth, credentials = self._make_auth()
+        os.remove(auth.discovery_cache_file)
+        http = MagicMock()
+        http.request.return_value = (MagicMock(status=200), b'{"name": "drive"}')
+
+        # WHEN two processes ask for it
+        document = auth.get_discovery_document(http)
+        second = drive_manager.GoogleAuth()
+        second.discovery_cache_file = auth.discovery_cache_file
+
+        # THEN google is only asked once, the second reads it from disk
+        self.assertEqual(document, second.get_discovery_document(http))
+        self.assertEqual(1, http.request.call_count)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import sys
+
+sys.path.insert(0, './mocks')
+
+import random
+import unittest
+from datetime import datetime as dt
+
+from entry_table import EntryTable, ENTRY_TIME_FORMAT, RESULT_TIME_FORMAT, parse_epoch, to_epoch, format_epoch
+
+
+class TestEntryTable(unittest.TestCase):
+
+    def _make_timestamps(self, num_rows, seed=3):
+        rand = random.Random(seed)
+        timestamps = []
+        for x in range(num_rows):
+            minute = rand.randint(0, 119)
+            timestamps.append("%s/10/2018 %s:%02d:%02d" % (rand.choice(["5", "05"]), 18 + minute // 60, minute % 60,
+                                                           rand.randint(0, 59)))
+        return timestamps
+
+    def _on_time_per_row(self, timestamps, game_time):
+        """the way late entries were found before the entry table"""
+        return [row for row, timestamp in enumerate(timestamps)
+                if timestamp and dt.strptime(timestamp, ENTRY_TIME_FORMAT) <= game_time]
+
+    def test_parse_epoch_matches_strptime(self):
+        for timestamp in ["05/10/2018 19:02:03", "5/1/2018 9:2:3", "31/12/2018 23:59:59", "29/02/2016 00:00:00"]:
+            self.assertEqual(parse_epoch(timestamp), to_epoch(dt.strptime(timestamp, ENTRY_TIME_FORMAT)))
+        for timestamp in ["2018/10/05 19:00", "2018/1/5 7:05"]:
+            self.assertEqual(parse_epoch(timestamp, RESULT_TIME_FORMAT), to_epoch(dt.strptime(timestamp, RESULT_TIME_FORMAT)))
+
+        # bad timestamps still fail like strptime does
+        for timestamp in ["31/02/2018 19:02:03", "05/10/2018 24:02:03", "05/10/2018 19:02:03 ", "2018-10-05 19:02:03"]:
+            with self.assertRaises(ValueError):
+                parse_epoch(timestamp)
+        with self.assertRaises(ValueError):
+            parse_epoch("2018/10/05 19:02:03", RESULT_TIME_FORMAT)
+
+    def test_cutoff_matches_per_row_compare(self):
+        game_time = dt(2018, 10, 5, 19, 0)
+
+        for timestamps in [sorted(self._make_timestamps(2000), key=lambda x: dt.strptime(x, ENTRY_TIME_FORMAT)),
+                           self._make_timestamps(2000)]:
+            # WHEN the entries are split at puck drop
+            entries = EntryTable(timestamps)
+            on_time = entries.on_time_rows(to_epoch(game_time))
+
+            # THEN sorted (binary search) and unsorted (scan) sheets give the per row answer
+            self.assertEqual(on_time, self._on_time_per_row(timestamps, game_time))
+            self.assertEqual(sorted(on_time + entries.late_rows(to_epoch(game_time))), list(range(len(timestamps))))
+
+        self.assertFalse(entries.is_sorted)
+
+    def test_blank_rows_skipped_and_extend(self):
+        # GIVEN a game sheet with a blank row
+        entries = EntryTable(["2018/10/05 18:10", "", "2018/10/05 18:50"], time_format=RESULT_TIME_FORMAT,
+                             skip_blank=True)
+        cutoff = parse_epoch("2018/10/05 19:00", RESULT_TIME_FORMAT)
+        self.assertEqual(entries.on_time_rows(cutoff), [0, 2])
+
+        # WHEN rows are added on the end
+        entries.extend(["2018/10/05 18:40", "2018/10/05 19:05"])
+
+        # THEN the new rows are split too and the table knows it isn't sorted anymore
+        self.assertEqual(entries.on_time(cutoff), [True, False, True, True, False])
+        self.assertEqual(entries.late_rows(cutoff), [4])
+        self.assertFalse(entries.is_sorted)
+
+    def test_format_matches_strftime(self):
+        for timestamp in self._make_timestamps(50) + ["01/01/1970 00:00:00", "31/12/1969 23:59:59"]:
+            when = dt.strptime(timestamp, ENTRY_TIME_FORMAT)
+            self.assertEqual(format_epoch(parse_epoch(timestamp)), when.strftime("%Y/%m/%d %H:%M:%S"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -34,6 +34,54 @@ class TestGWGLeaderUpdater(unittest.TestCase):
         print("in test")
         self.assertEqual("foo", "foo")
 
+    def test_entry_table_extended_with_new_rows(self):
+        # GIVEN: Entries read before the game
+        header = [["Timestamp", "Username"]]
+        rows = [["05/10/2018 18:%02d:00" % x, "user%s" % x] for x in range(5)]
+        entries = self.gwg_leader_updater.get_entry_table({'id': "GM5", 'data': header + rows, 'new_from': 0})
+
+        # WHEN: The rest of the sheet comes in as a partial batch
+        rows += [["05/10/2018 19:%02d:00" % x, "late%s" % x] for x in range(2)]
+        extended = self.gwg_leader_updater.get_entry_table({'id': "GM5", 'data': header + rows, 'new_from': 6})
+
+        # THEN: The same table has every row
+        self.assertIs(entries, extended)
+        self.assertEqual(len(extended), 7)
+        self.assertEqual(extended.format_time(6), "2018/10/05 19:01:00")
+
+        # AND: A full reload starts over
+        reloaded = self.gwg_leader_updater.get_entry_table({'id': "GM5", 'data': header + rows, 'new_from': 0})
+        self.assertIsNot(reloaded, entries)
+
+    def test_provisional_standings_use_filled_answers_and_on_time_entries(self):
+        # GIVEN: A game underway with only the first answer filled in
+        gdrive = MagicMock()
+        gdrive.get_provisional_game.return_value = {'game': ["GM5", "2018/10/05 19:00"], 'row': 6}
+        gdrive.get_drive_filetype.return_value = [{'id': "GM5", 'title': "GWG 5 (Responses)"}]
+        gdrive.get_games_result.return_value = {'result': ["GM5", "2018/10/05 19:00", "Player A", "", "", "", "",
+                                                           "", "", "", ""]}
+        gdrive.get_file_entries.return_value = {'id': "GM5", 'new_from': 0, 'data': [
+            ["Timestamp", "Username", "GWG", "Other", "Other"],
+            ["05/10/2018 18:10:00", "user1", "player a", "", ""],
+            ["05/10/2018 18:20:00", "user2", "player b", "", ""],
+            ["05/10/2018 19:10:00", "user3", "player a", "", ""]]}
+        gdrive.get_current_leaders.return_value = {'user2': {'curr': 4, 'played': 1, 'rank': 1}}
+        self.gwg_leader_updater.gdrive = gdrive
+
+        # WHEN: Provisional standings are published
+        self.assertTrue(self.gwg_leader_updater.update_provisional_standings())
+
+        # THEN: Only the right, on time answer scored and the late user isn't on it
+        standings, game_id = gdrive.write_provisional_standings.call_args[0]
+        self.assertEqual(game_id, "GM5")
+        self.assertEqual(standings['user1']['curr'], 1)
+        self.assertEqual(standings['user2']['curr'], 4)
+        self.assertNotIn('user3', standings)
+
+        # AND: Nothing more is published until the interval is up
+        self.assertFalse(self.gwg_leader_updater.update_provisional_standings())
+        self.assertEqual(gdrive.write_provisional_standings.call_count, 1)
+
     @patch('gwg_leader_updater.r')
     def test_alert_late_user_happy_path(self, mock_reddit: MagicMock):
         # GIVEN: A Valid late user
@@ -0,0 +1,83 @@
+import sys
+
+sys.path.insert(0, './mocks')
+
+import logging
+import unittest
+from datetime import date, datetime, timedelta
+from unittest.mock import patch, MagicMock
+
+import gwg_poster
+
+
+class TestGWGPoster(unittest.TestCase):
+
+    # setup and teardown methods
+    # these get ran before EVERY test method below
+    def setUp(self):
+        gwg_args = lambda: None
+        gwg_args.test = False
+        gwg_args.metrics = None
+        gwg_poster.gwg_args = gwg_args
+        gwg_poster.log = logging.getLogger("gwg_poster")
+        gwg_poster.cached_inbox = None
+        gwg_poster.sent_reminders = set()
+
+    def _make_message(self, owner):
+        message = MagicMock()
+        message.dest.name = owner
+        message.body = "Hey you! Log in and make a form"
+        message.created_utc = datetime.now().timestamp()
+        return message
+
+    def test_next_check_follows_game_day(self):
+        now = datetime(2018, 10, 5, 13, 30)
+
+        # GIVEN a team still waiting on its form THEN it is checked again shortly
+        sleep_time, reason = gwg_poster.get_next_check({52: {'result': False, 'error': None},
+                                                       10: {'result': True, 'error': None}}, now)
+        self.assertEqual(sleep_time, gwg_poster.DAEMON_GAME_DAY_INTERVAL)
+        self.assertIn("52", reason)
+
+        # GIVEN every team is done THEN we wait for tomorrow morning
+        sleep_time, reason = gwg_poster.get_next_check({52: {'result': True, 'error': None}}, now)
+        self.assertEqual(now + timedelta(seconds=sleep_time), datetime(2018, 10, 6, gwg_poster.DAEMON_DAY_START_HOUR))
+
+    @patch('gwg_poster.get_reddit')
+    def test_sent_messages_cached_and_reusable(self, mock_reddit):
+        # GIVEN a reminder in the sent folder, handed back as a generator
+        mock_reddit.return_value.inbox.sent.side_effect = lambda limit: (message for message in
+                                                                         [self._make_message("owner")])
+
+        # WHEN we check a few times
+        for x in range(3):
+            self.assertTrue(gwg_poster.already_sent_reminder("Owner"))
+
+        # THEN reddit is only asked once and the messages are still there
+        self.assertEqual(mock_reddit.return_value.inbox.sent.call_count, 1)
+
+        # WHEN the cached copy is old
+        gwg_poster.cached_inbox['time'] -= gwg_poster.INBOX_REFRESH_INTERVAL
+
+        # THEN it is refreshed
+        self.assertFalse(gwg_poster.already_sent_reminder("someone else"))
+        self.assertEqual(mock_reddit.return_value.inbox.sent.call_count, 2)
+
+    @patch('gwg_poster.get_outbox')
+    @patch('gwg_poster.get_reddit')
+    def test_queued_reminder_not_sent_twice(self, mock_reddit, mock_outbox):
+        # GIVEN a reminder that is queued but not delivered yet
+        mock_reddit.return_value.inbox.sent.return_value = []
+        gwg_poster.secrets = MagicMock()
+        gwg_poster.secrets.get_team_contacts.return_value = ["owner"]
+        gwg_poster.alert_gwg_owners(52)
+
+        # WHEN the next check alerts the owners again
+        gwg_poster.alert_gwg_owners(52)
+
+        # THEN only one reminder was queued
+        self.assertEqual(mock_outbox.return_value.put_message.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import sys
+
+sys.path.insert(0, './mocks')
+
+import gzip
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+
+from http_transport import Transport
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """answers every request with a small gzipped json body and keeps the connection open"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = gzip.compress(json.dumps({'path': self.path}).encode())
+        self.send_response(404 if self.path.startswith("/missing") else 200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestHttpTransport(unittest.TestCase):
+
+    # setup and teardown methods
+    # these get ran before EVERY test method below
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        # kept alive connections would hold up shutdown
+        self.server.block_on_close = False
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.url = "http://127.0.0.1:%s" % self.server.server_port
+        self.transport = Transport(timeout=(5, 5))
+
+    def tearDown(self):
+        self.transport.adapter.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def test_sessions_share_keep_alive_connections(self):
+        # GIVEN two clients with sessions of their own
+        http = self.transport.http()
+        session = self.transport.new_session()
+
+        # WHEN both send a few requests
+        for x in range(3):
+            self.transport.get(self.url + "/schedule")
+            http.request(self.url + "/drive/v2/files", "GET")
+            session.get(self.url + "/feeds/cells")
+
+        # THEN one connection is opened and reused for all of them
+        stats = self.transport.get_pool_stats()["127.0.0.1:%s" % self.server.server_port]
+        self.assertEqual(stats['requests'], 9)
+        self.assertEqual(stats['connections'], 1)
+        self.assertEqual(stats['reused'], 8)
+        self.assertEqual(stats['open_sockets'], 1)
+
+        # AND the next call only counts what happened since
+        self.assertEqual(self.transport.get_pool_stats(), {})
+
+    def test_httplib_adapter_looks_like_httplib2(self):
+        # WHEN a request goes through the adapter
+        response, content = self.transport.http().request(self.url + "/missing", "GET", headers={'x-test': "1"})
+
+        # THEN the status and the un-gzipped body come back the way httplib2 returns them
+        self.assertEqual(response.status, 404)
+        self.assertEqual(json.loads(content.decode()), {'path': "/missing"})
+        self.assertEqual(response['content-length'], str(len(content)))
+        self.assertNotIn('content-encoding', response)
+
+    def test_clients_routed_through_the_pools(self):
+        # GIVEN a gspread client and praw
+        gc = MagicMock()
+        reddit = MagicMock()
+        praw_session = self.transport.new_session()
+        reddit._core._authorizer._authenticator._requestor._http = praw_session
+
+        # WHEN they are routed
+        self.transport.route_gspread(gc)
+        self.transport.route_praw(reddit)
+
+        # THEN both send through the shared adapter with a default timeout for gspread
+        self.assertIs(gc.session.requests_session.get_adapter("https://spreadsheets.google.com"), self.transport.adapter)
+        self.assertEqual(gc.session.requests_session.timeout, (5, 5))
+        self.assertIs(praw_session.get_adapter("https://oauth.reddit.com"), self.transport.adapter)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import os
+import sys
+
+sys.path.insert(0, './mocks')
+
+import tempfile
+import unittest
+from time import perf_counter, sleep
+from unittest.mock import MagicMock
+
+import prawcore.exceptions
+
+from gwg_leader_updater import GWGLeaderUpdater
+from message_queue import MessageQueue
+from rate_limit import TokenBucket
+
+# import test mocks
+from mock_drive_manager import MockDriveManager
+from mock_secret_manager import MockSecretManager
+
+
+class TestMessageQueue(unittest.TestCase):
+
+    # setup and teardown methods
+    # these get ran before EVERY test method below
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.queue_file = os.path.join(self.temp_dir.name, "outbox.json")
+        self.reddit = MagicMock()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _make_queue(self, reddit=None, bucket=None):
+        return MessageQueue(self.queue_file, reddit or self.reddit, bucket=bucket or TokenBucket(1000, 1000),
+                            retry_delay=0.01)
+
+    def test_messages_delivered_in_background(self):
+        # GIVEN a started queue
+        outbox = self._make_queue()
+        outbox.start()
+
+        # WHEN messages are queued
+        outbox.put_message("user1", "subject", "body")
+        outbox.put_reply("abc123", "leaderboard updated")
+
+        # THEN they are all delivered
+        self.assertTrue(outbox.flush(5))
+        outbox.stop(5)
+        self.reddit.redditor.assert_called_once_with("user1")
+        self.reddit.redditor.return_value.message.assert_called_once_with("subject", "body")
+        self.reddit.submission.assert_called_once_with(id="abc123")
+        self.reddit.submission.return_value.reply.return_value.disable_inbox_replies.assert_called_once_with()
+
+    def test_slow_delivery_does_not_block_callers(self):
+        # GIVEN reddit takes a while to answer
+        self.reddit.redditor.return_value.message.side_effect = lambda subject, body: sleep(0.2)
+        outbox = self._make_queue()
+        outbox.start()
+
+        # WHEN several messages are queued
+        start = perf_counter()
+        for x in range(5):
+            outbox.put_message("user%s" % x, "subject", "body")
+        queued = perf_counter() - start
+
+        # THEN queueing returns right away
+        self.assertLess(queued, 0.2)
+        self.assertTrue(outbox.flush(5))
+        outbox.stop(5)
+
+    def test_retry_with_backoff(self):
+        # GIVEN one flaky user and one good one
+        calls = []
+
+        def message(subject, body):
+            calls.append(subject)
+            if subject == "flaky" and calls.count("flaky") < 3:
+                raise Exception("reddit is down")
+
+        self.reddit.redditor.return_value.message.side_effect = message
+        outbox = self._make_queue()
+
+        # WHEN both are sent
+        outbox.put_message("flaky_user", "flaky", "body")
+        outbox.put_message("good_user", "good", "body")
+        outbox.start()
+
+        # THEN the good one isn't held up and the flaky one goes out on its third try
+        self.assertTrue(outbox.flush(5))
+        outbox.stop(5)
+        self.assertEqual(calls, ["flaky", "good", "flaky", "flaky"])
+
+    def test_missing_user_dropped(self):
+        # GIVEN a user that doesn't exist
+        self.reddit.redditor.return_value.message.side_effect = prawcore.exceptions.NotFound(MagicMock())
+        outbox = self._make_queue()
+
+        # WHEN we send them a message
+        outbox.put_message("fake reddit user", "subject", "body")
+        outbox.send_next()
+
+        # THEN we don't try again
+        self.assertEqual(outbox.pending(), 0)
+        self.assertEqual(self.reddit.redditor.return_value.message.call_count, 1)
+
+    def test_undelivered_messages_survive_restart(self):
+        # GIVEN messages queued by a program that stopped before sending them
+        outbox = self._make_queue()
+        outbox.put_message("user1", "subject", "body")
+        outbox.put_message("user1", "subject", "body")
+        self.assertEqual(outbox.pending(), 1)
+
+        # WHEN the program starts again
+        restarted = self._make_queue()
+        restarted.start()
+
+        # THEN they are delivered
+        self.assertTrue(restarted.flush(5))
+        restarted.stop(5)
+        self.reddit.redditor.return_value.message.assert_called_once_with("subject", "body")
+        self.assertEqual(self._make_queue().pending(), 0)
+
+    def test_rate_limited(self):
+        # GIVEN a bucket that allows 20 messages a second
+        outbox = self._make_queue(bucket=TokenBucket(20, 1))
+        for x in range(5):
+            outbox.put_message("user%s" % x, "subject", "body")
+
+        # WHEN they are all sent
+        start = perf_counter()
+        while outbox.send_next():
+            pass
+
+        # THEN it takes at least as long as the limit allows
+        self.assertGreaterEqual(perf_counter() - start, 0.19)
+
+    def test_late_users_queued(self):
+        # GIVEN the leader updater with an outbox
+        gwg_args = lambda: None
+        gwg_args.test = True
+        outbox = self._make_queue()
+        gwg_leader_updater = GWGLeaderUpdater(MockDriveManager(), MockSecretManager(), gwg_args, outbox=outbox)
+
+        # WHEN late users are alerted
+        gwg_leader_updater.alert_late_users("GM1", {'game_start': '18:00 CT',
+                                                    'users': [{'name': 'user1', 'entry_time': '18:01 CT'},
+                                                              {'name': 'user2', 'entry_time': '18:02 CT'}]})
+
+        # THEN the messages wait on the outbox instead of going to reddit right away
+        self.assertEqual(outbox.pending(), 2)
+        self.reddit.redditor.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import sys
+
+sys.path.insert(0, './mocks')
+
+import unittest
+from unittest.mock import MagicMock
+
+from gspread.exceptions import RequestError
+
+from request_scheduler import RequestScheduler, SheetsQuotaError, SheetsUnavailableError
+
+
+class FakeSession():
+    """stands in for gspread's HTTPSession, failing with the queued errors first"""
+
+    def __init__(self, errors=None):
+        self.errors = list(errors or [])
+        self.calls = 0
+
+    def request(self, method, url, data=None, params=None):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "response"
+
+
+class TestRequestScheduler(unittest.TestCase):
+
+    # setup and teardown methods
+    # these get ran before EVERY test method below
+    def setUp(self):
+        self.bucket = MagicMock()
+        self.bucket.acquire.return_value = 0
+        self.scheduler = RequestScheduler("sheets", self.bucket, max_attempts=4, base_delay=0.001, max_delay=0.01)
+
+    def _make_client(self, errors=None):
+        gc = MagicMock()
+        gc.session = FakeSession(errors)
+        session = gc.session
+        return self.scheduler.wrap_gspread(gc), session
+
+    def test_throttled_request_retried(self):
+        # GIVEN google answers 429 twice
+        gc, session = self._make_client([RequestError(429, "429: quota"), RequestError(503, "503: busy")])
+
+        # WHEN a request is sent
+        response = gc.session.request("GET", "https://spreadsheets.google.com/feeds/cells/key")
+
+        # THEN it succeeds on the third attempt and every attempt took a token
+        self.assertEqual(response, "response")
+        self.assertEqual(session.calls, 3)
+        self.assertEqual(self.bucket.acquire.call_count, 3)
+        self.assertEqual(self.scheduler.get_stats()['retries'], 2)
+
+    def test_quota_error_raised_when_retries_run_out(self):
+        # GIVEN google keeps answering 429
+        gc, session = self._make_client([RequestError(429, "429: quota")] * 4)
+
+        # WHEN a request is sent THEN a typed error is raised after every attempt
+        with self.assertRaises(SheetsQuotaError) as context:
+            gc.session.request("GET", "https://spreadsheets.google.com/feeds/cells/key")
+        self.assertEqual(context.exception.status, 429)
+        self.assertEqual(session.calls, 4)
+
+    def test_connection_errors_retried(self):
+        # GIVEN we can't reach google
+        gc, session = self._make_client([ConnectionError("reset")] * 4)
+
+        # WHEN a request is sent THEN it is retried and then reported as unavailable
+        with self.assertRaises(SheetsUnavailableError):
+            gc.session.request("GET", "https://spreadsheets.google.com/feeds/cells/key")
+        self.assertEqual(session.calls, 4)
+
+    def test_client_errors_not_retried(self):
+        # GIVEN a sheet that doesn't exist
+        gc, session = self._make_client([RequestError(404, "404: not found")])
+
+        # WHEN a request is sent THEN gspread's error comes straight back
+        with self.assertRaises(RequestError):
+            gc.session.request("GET", "https://spreadsheets.google.com/feeds/cells/key")
+        self.assertEqual(session.calls, 1)
+
+    def test_drive_http_retried_then_last_response_returned(self):
+        # GIVEN the drive service's connection answering 500 every time
+        http = MagicMock()
+        http.request.return_value = (MagicMock(status=500), b"")
+        request = http.request
+        self.scheduler.wrap_http(http)
+
+        # WHEN a request is sent
+        response, content = http.request("https://www.googleapis.com/drive/v2/files", "GET")
+
+        # THEN it is retried and the last answer is left for the api client to raise
+        self.assertEqual(response.status, 500)
+        self.assertEqual(request.call_count, 4)
+
+    def test_backoff_is_jittered_and_capped(self):
+        scheduler = RequestScheduler("sheets", self.bucket, base_delay=1, max_delay=8)
+        delays = [scheduler.get_delay(attempt) for attempt in range(10) for x in range(20)]
+
+        self.assertTrue(all(0 <= delay <= 8 for delay in delays))
+        self.assertGreater(len(set(delays)), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+import os
+import sys
+
+sys.path.insert(0, './mocks')
+
+import json
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+from urllib.parse import urlparse, parse_qs
+
+from schedule_cache import ScheduleCache
+
+
+def _game(game_date, home_id=52, away_id=10, record=None):
+    record = record or {'wins': 0, 'losses': 0, 'ot': 0}
+    return {'gameDate': game_date,
+            'gameType': 'R',
+            'teams': {'home': {'team': {'id': home_id, 'name': "Winnipeg Jets"}, 'leagueRecord': record},
+                      'away': {'team': {'id': away_id, 'name': "Toronto Maple Leafs"}, 'leagueRecord': record}}}
+
+
+SEASON = {'dates': [
+    {'date': "2018-09-20", 'games': [dict(_game("2018-09-21T00:00:00Z"), gameType='PR')]},
+    {'date': "2018-10-04", 'games': [_game("2018-10-05T00:00:00Z")]},
+    # evening game that is on the next day in UTC
+    {'date': "2018-10-06", 'games': [_game("2018-10-07T02:00:00Z", record={'wins': 1, 'losses': 0, 'ot': 0})]},
+    {'date': "2018-10-09", 'games': [_game("2018-10-10T00:00:00Z", record={'wins': 1, 'losses': 0, 'ot': 0})]},
+]}
+
+
+class StubStatsApi(BaseHTTPRequestHandler):
+    """answers statsapi schedule requests from SEASON and records every request made"""
+
+    requests = []
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        StubStatsApi.requests.append(query)
+
+        if 'season' in query:
+            body = SEASON
+        else:
+            day = query['startDate'][0]
+            dates = [dict(entry) for entry in SEASON['dates'] if entry['date'] == day]
+            for entry in dates:
+                game = dict(entry['games'][0])
+                game['linescore'] = {'periods': [{'startTime': "2018-10-07T02:08:00Z"}]}
+                entry['games'] = [game]
+            body = {'dates': dates}
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode())
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestScheduleCache(unittest.TestCase):
+
+    # setup and teardown methods
+    # these get ran before EVERY test method below
+    def setUp(self):
+        StubStatsApi.requests = []
+        self.server = HTTPServer(("127.0.0.1", 0), StubStatsApi)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.base_url = "http://127.0.0.1:%s" % self.server.server_port
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_file = os.path.join(self.temp_dir.name, "schedule_52.json")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp_dir.cleanup()
+
+    def _make_cache(self, base_url=None, ttl=60):
+        return ScheduleCache(52, base_url=base_url or self.base_url, cache_file=self.cache_file, ttl=ttl)
+
+    def test_season_loaded_once(self):
+        # GIVEN a schedule cache
+        schedule = self._make_cache()
+
+        # WHEN we ask several questions about different days
+        self.assertTrue(schedule.is_game_day("2018-10-4"))
+        self.assertFalse(schedule.is_game_day("2018-10-05"))
+        self.assertEqual(schedule.get_dates("2018-10-06")[0]['date'], "2018-10-06")
+        schedule.get_game_number("2018-10-09")
+
+        # THEN the season was only requested once
+        self.assertEqual(len(StubStatsApi.requests), 1)
+        self.assertEqual(StubStatsApi.requests[0]['season'], ["20182019"])
+
+    def test_cache_file_used_until_stale(self):
+        # GIVEN a season that has been loaded before
+        self._make_cache().is_game_day("2018-10-04")
+
+        # WHEN a new cache (like the next run of the poster) asks again
+        self._make_cache().is_game_day("2018-10-04")
+
+        # THEN it is answered from disk
+        self.assertEqual(len(StubStatsApi.requests), 1)
+
+        # WHEN the copy on disk is too old
+        self._make_cache(ttl=0).is_game_day("2018-10-04")
+
+        # THEN the season is requested again
+        self.assertEqual(len(StubStatsApi.requests), 2)
+
+    def test_cached_dates_never_use_the_network(self):
+        # GIVEN no season on disk
+        self.assertIsNone(self._make_cache().get_cached_dates("2018-10-05"))
+
+        # WHEN the season has been loaded by an earlier run
+        self._make_cache().is_game_day("2018-10-04")
+        schedule = self._make_cache(ttl=0)
+
+        # THEN days are answered from disk while the copy is young enough for the caller
+        self.assertEqual(schedule.get_cached_dates("2018-10-05", max_age=60), [])
+        self.assertEqual(len(schedule.get_cached_dates("2018-10-04", max_age=60)), 1)
+        self.assertIsNone(schedule.get_cached_dates("2018-10-05"))
+        self.assertEqual(len(StubStatsApi.requests), 1)
+
+    def test_game_number_from_schedule(self):
+        # GIVEN a season where the cached league record lags behind
+        schedule = self._make_cache()
+
+        # THEN game numbers come from the order of the schedule, skipping preseason games
+        self.assertEqual(schedule.get_game_number("2018-10-04"), 1)
+        self.assertEqual(schedule.get_game_number("2018-10-06"), 2)
+        self.assertEqual(schedule.get_game_number("2018-10-08"), 3)
+        self.assertEqual(schedule.get_game_number("2018-10-09"), 3)
+        self.assertEqual(schedule.get_game_date(2, "2018-10-09"), "2018-10-07T02:00:00Z")
+        self.assertEqual(schedule.get_league_record("2018-10-09"), {'wins': 1, 'losses': 0, 'ot': 0})
+
+    def test_start_time_from_linescore(self):
+        # GIVEN a game that has started
+        schedule = self._make_cache()
+
+        # WHEN we ask for its start time
+        start_time = schedule.get_start_time("2018-10-06")
+
+        # THEN the linescore time is used
+        self.assertEqual(start_time, "2018-10-07T02:08:00Z")
+        self.assertEqual(StubStatsApi.requests[0]['expand'], ["schedule.linescore"])
+
+    @patch('schedule_cache.sleep', lambda seconds: None)
+    def test_stale_schedule_used_when_offline(self):
+        # GIVEN a stale season on disk
+        self._make_cache().is_game_day("2018-10-04")
+
+        # WHEN the statsapi can't be reached
+        schedule = self._make_cache(base_url="http://127.0.0.1:1", ttl=0)
+
+        # THEN we still answer from the copy we have
+        self.assertTrue(schedule.is_game_day("2018-10-04"))
+        self.assertEqual(schedule.get_start_time("2018-10-06"), "2018-10-07T02:00:00Z")
+
+
+if __name__ == '__main__':
+    unittest.main()
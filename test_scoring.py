@@ -0,0 +1,92 @@
+import sys
+
+sys.path.insert(0, './mocks')
+
+import random
+import unittest
+from datetime import datetime as dt
+
+import scoring
+from gwg_leader_updater import GWGLeaderUpdater
+from scoring import parse_entry_time, score_entries
+
+# import test mocks
+from mock_drive_manager import MockDriveManager
+from mock_secret_manager import MockSecretManager
+
+PLAYERS = ["Scheifele", "Laine", "Wheeler", "Ehlers", "Connor", "Little", "Byfuglien", "none"]
+
+
+class TestScoring(unittest.TestCase):
+
+    # setup and teardown methods
+    # these get ran before EVERY test method below
+    def setUp(self):
+        gwg_args = lambda: None
+        gwg_args.test = True
+        self.gwg_leader_updater = GWGLeaderUpdater(MockDriveManager(), MockSecretManager(), gwg_args)
+
+        # answer key line: game, start time, then each answer followed by a blank column
+        self.answer_line = ["GM1", "2018/10/05 19:00", "Laine, scheifele ", "", "WHEELER", "", "Yes,No", ""]
+        self.gwg_answers = self.gwg_leader_updater.get_gwg_answers(self.answer_line)
+        self.game_time = dt.strptime(self.answer_line[1], "%Y/%m/%d %H:%M")
+
+    def _make_rows(self, num_rows, seed=5):
+        rand = random.Random(seed)
+        rows = []
+        for x in range(num_rows):
+            minute = rand.randint(0, 119)
+            timestamp = "%s/10/2018 %s:%02d:%02d" % (rand.choice(["5", "05"]), 18 + minute // 60, minute % 60, rand.randint(0, 59))
+            rows.append([timestamp, "user%s" % x,
+                         rand.choice(PLAYERS + ["laine", " Laine", "LAINE"]),
+                         rand.choice(PLAYERS + ["wheeler"]),
+                         rand.choice(["yes", "No", "maybe", ""])])
+        return rows
+
+    def _score_per_row(self, rows):
+        """the way create_game_history scored entries before the batch engine"""
+        points = [self.gwg_leader_updater.get_players_points(row, self.gwg_answers) for row in rows]
+        on_time = [dt.strptime(row[0], "%d/%m/%Y %H:%M:%S") <= self.game_time for row in rows]
+        return points, on_time
+
+    def _score_batch(self, rows, use_numpy):
+        return score_entries([row[0] for row in rows], [[row[2 + x] for row in rows] for x in range(3)],
+                             self.gwg_answers, self.game_time, use_numpy=use_numpy)
+
+    def test_python_matches_per_row(self):
+        # GIVEN a large game worth of entries
+        rows = self._make_rows(20000)
+
+        # WHEN they are scored in one pass
+        scores = self._score_batch(rows, use_numpy=False)
+
+        # THEN every row matches the per row result
+        self.assertEqual((scores['points'], scores['on_time']), self._score_per_row(rows))
+        self.assertIn(False, scores['on_time'])
+
+    @unittest.skipUnless(scoring.np, "numpy isn't installed")
+    def test_numpy_matches_per_row(self):
+        # GIVEN a large game worth of entries
+        rows = self._make_rows(20000)
+
+        # WHEN they are scored with numpy
+        scores = self._score_batch(rows, use_numpy=True)
+
+        # THEN every row matches the per row result
+        self.assertEqual((scores['points'], scores['on_time']), self._score_per_row(rows))
+
+    def test_parse_entry_time_matches_strptime(self):
+        for timestamp in ["05/10/2018 19:02:03", "5/1/2018 9:2:3", "31/12/2018 23:59:59"]:
+            self.assertEqual(parse_entry_time(timestamp), dt.strptime(timestamp, "%d/%m/%Y %H:%M:%S"))
+
+        # bad timestamps still fail like strptime does
+        for timestamp in ["31/02/2018 19:02:03", "05/10/2018 19:02:03 ", "2018-10-05 19:02:03"]:
+            with self.assertRaises(ValueError):
+                parse_entry_time(timestamp)
+
+    def test_empty_sheet(self):
+        self.assertEqual(self._score_batch([], use_numpy=False), {'entry_times': [], 'points': [], 'on_time': []})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import sys
+
+sys.path.insert(0, './mocks')
+
+import random
+import unittest
+from unittest.mock import MagicMock
+
+from gwg_leader_updater import GWGLeaderUpdater
+from standings_index import StandingsIndex
+
+# import test mocks
+from mock_secret_manager import MockSecretManager
+
+
+class TestStandingsIndex(unittest.TestCase):
+
+    # setup and teardown methods
+    # these get ran before EVERY test method below
+    def setUp(self):
+        gdrive = MagicMock()
+        gdrive.convert_rank = lambda rank: int(str(rank).replace("T", ""))
+
+        gwg_args = lambda: None
+        gwg_args.test = True
+        self.gwg_leader_updater = GWGLeaderUpdater(gdrive, MockSecretManager(), gwg_args)
+
+    def _random_game(self, rand, num_users):
+        """points for a random group of users, scores 0-3 so there are lots of ties"""
+        players = rand.sample(range(num_users), rand.randint(1, num_users))
+        return {"user%s" % player: rand.choice([0, 1, 1, 2, 3]) for player in players}
+
+    def _assert_same_as_add_user_rankings(self, seed, num_users, num_games, leaders=None):
+        rand = random.Random(seed)
+        leaders = leaders or {}
+        index = StandingsIndex(leaders)
+
+        for game in range(num_games):
+            points = self._random_game(rand, num_users)
+
+            leaders = self.gwg_leader_updater.add_new_user_points(dict(points), dict(leaders))
+            index.apply_game(points)
+
+            self.assertEqual(index.to_dict(), leaders, "seed %s game %s" % (seed, game))
+
+            # leaderboard order, ignoring the order of users that are tied on everything
+            ordered = [(-leaders[user]['curr'], leaders[user]['played'], -leaders[user]['last']) for user in index.ordered()]
+            self.assertEqual(ordered, sorted(ordered))
+            self.assertEqual(sorted(index.ordered()), sorted(leaders))
+
+    def test_randomized_equivalence(self):
+        for seed in range(40):
+            self._assert_same_as_add_user_rankings(seed, num_users=random.Random(seed).randint(1, 30), num_games=8)
+
+    def test_equivalence_from_loaded_standings(self):
+        # GIVEN standings read from the sheet with a tie at the top
+        leaders = {'user0': {'curr': 5, 'last': 2, 'played': 2, 'rank': "T1"},
+                   'user1': {'curr': 5, 'last': 3, 'played': 2, 'rank': "T1"},
+                   'user2': {'curr': 3, 'last': 0, 'played': 2, 'rank': 3},
+                   'user3': {'curr': 1, 'last': 1, 'played': 1, 'rank': "T5"},
+                   'user4': {'curr': 1, 'last': 1, 'played': 1, 'rank': "T5"}}
+
+        for seed in range(20):
+            self._assert_same_as_add_user_rankings(seed, num_users=8, num_games=5, leaders=leaders)
+
+    def test_tie_at_first_place(self):
+        # GIVEN two users tied at the top, a user alone and two tied behind them
+        index = StandingsIndex()
+        index.apply_game({'a': 3, 'b': 3, 'c': 2, 'd': 1, 'e': 1})
+
+        # THEN the top tie is T1 and the lower tie takes the position of its last user
+        self.assertEqual([index.get_rank(user) for user in "abcde"], ["T1", "T1", 3, "T5", "T5"])
+        self.assertEqual(index.ordered(), ['a', 'b', 'c', 'd', 'e'])
+
+
+if __name__ == '__main__':
+    unittest.main()
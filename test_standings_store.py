@@ -0,0 +1,123 @@
+import os
+import sys
+
+sys.path.insert(0, './mocks')
+
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from gwg_leader_updater import GWGLeaderUpdater
+from standings_store import StandingsStore
+
+# import test mocks
+from mock_secret_manager import MockSecretManager
+
+
+class TestStandingsStore(unittest.TestCase):
+
+    # setup and teardown methods
+    # these get ran before EVERY test method below
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.standings = StandingsStore(os.path.join(self.temp_dir.name, "standings.db"))
+
+        self.gdrive = MagicMock()
+        self.gdrive.convert_rank = lambda rank: int(str(rank).replace("T", ""))
+        self.gdrive.get_current_leaders.return_value = {
+            'user1': {'rank': 1, 'curr': 10, 'last': 5, 'played': "2"},
+            'user2': {'rank': 2, 'curr': 4, 'last': 4, 'played': "1"}}
+        self.gdrive.get_written_leaderboard_games.return_value = ["GM1", "GM2"]
+        self.gdrive.get_unwritten_leaderboard_games.return_value = [{'game': ["GM3"], 'row': 4}]
+        self.gdrive.get_history_game_points.return_value = {'/u/User2': 7, 'user3': 1}
+
+        gwg_args = lambda: None
+        gwg_args.test = True
+        self.gwg_leader_updater = GWGLeaderUpdater(self.gdrive, MockSecretManager(), gwg_args, standings=self.standings)
+
+    def tearDown(self):
+        self.standings.close()
+        self.temp_dir.cleanup()
+
+    def test_apply_game_is_idempotent(self):
+        # GIVEN a game applied to the store
+        leaders = {'user1': {'curr': 3, 'last': 3, 'played': 1, 'rank': 1, 'delta': "0"}}
+        self.assertTrue(self.standings.apply_game("GM1", {'user1': 3}, leaders))
+
+        # WHEN it is applied again
+        doubled = {'user1': {'curr': 6, 'last': 3, 'played': 2, 'rank': 1, 'delta': "0"}}
+        applied = self.standings.apply_game("GM1", {'user1': 3}, doubled)
+
+        # THEN nothing changes
+        self.assertFalse(applied)
+        self.assertEqual(self.standings.get_leaders()['user1']['curr'], 3)
+        self.assertEqual(self.standings.get_games(), ["GM1"])
+        self.assertEqual(self.standings.get_user_games("user1"), {"GM1": 3})
+
+    def test_update_master_list_seeds_and_applies_new_game(self):
+        # WHEN the master list is updated with an empty store
+        self.gwg_leader_updater.update_master_list()
+
+        # THEN the store is seeded from the sheet and the new game is added on top
+        leaders = self.standings.get_leaders()
+        self.assertEqual(self.standings.get_games(), ["GM1", "GM2", "GM3"])
+        self.assertEqual((leaders['user2']['curr'], leaders['user2']['played'], leaders['user2']['last']), (11, 2, 7))
+        self.assertEqual((leaders['user1']['curr'], leaders['user1']['played'], leaders['user1']['last']), (10, 2, 0))
+        self.assertEqual(leaders['user2']['rank'], 1)
+        self.assertEqual(leaders['user3']['curr'], 1)
+
+        # AND the sheet is written from the store
+        self.gdrive.overwrite_leaderboard.assert_called_once_with(leaders, mode="diff", ordered=['user2', 'user1', 'user3'])
+        self.gdrive.update_answerkey_results.assert_called_once_with([4])
+
+    def test_update_master_list_reads_sheet_once(self):
+        # GIVEN the store already has the standings
+        self.gwg_leader_updater.update_master_list()
+
+        # WHEN the same game is still unwritten on the next cycle (eg. we crashed before marking it)
+        self.gwg_leader_updater.update_master_list()
+
+        # THEN the sheet isn't read again and the game isn't counted twice
+        self.assertEqual(self.gdrive.get_current_leaders.call_count, 1)
+        self.assertEqual(self.gdrive.get_history_game_points.call_count, 1)
+        self.assertEqual(self.standings.get_leaders()['user2']['curr'], 11)
+
+    def test_update_master_list_keeps_deltas_after_restart(self):
+        # GIVEN a game in the store that we crashed before marking as written
+        self.gwg_leader_updater.update_master_list()
+        published = self.gdrive.overwrite_leaderboard.call_args[0][0]
+        self.assertEqual(published['user2']['delta'], "1")
+
+        # WHEN a new updater on the same store publishes the standings again
+        gwg_args = lambda: None
+        gwg_args.test = True
+        restarted = GWGLeaderUpdater(self.gdrive, MockSecretManager(), gwg_args, standings=self.standings)
+        restarted.update_master_list()
+
+        # THEN the deltas of that game are kept instead of zeroed
+        self.assertEqual(self.gdrive.get_history_game_points.call_count, 1)
+        self.assertEqual(self.gdrive.overwrite_leaderboard.call_args[0][0], published)
+        self.assertEqual(self.standings.get_leaders(), published)
+
+    def test_reconcile_finds_manual_edits(self):
+        # GIVEN standings in the store
+        self.gwg_leader_updater.update_master_list()
+
+        # WHEN an admin fixes a score on the sheet by hand
+        sheet = self.standings.get_leaders()
+        sheet['user3'] = dict(sheet['user3'], curr=2)
+        self.gdrive.get_current_leaders.return_value = sheet
+
+        differences = self.gwg_leader_updater.reconcile_standings()
+
+        # THEN the edit is reported and nothing changes until the sheet is taken
+        self.assertEqual(differences, [("user3", "curr", 1, 2)])
+        self.assertEqual(self.standings.get_leaders()['user3']['curr'], 1)
+
+        self.gwg_leader_updater.reconcile_standings(take_sheet=True)
+        self.assertEqual(self.standings.get_leaders()['user3']['curr'], 2)
+        self.assertEqual(self.standings.reconcile(sheet), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
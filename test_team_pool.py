@@ -0,0 +1,88 @@
+import sys
+
+sys.path.insert(0, './mocks')
+
+import threading
+import unittest
+from time import perf_counter, sleep
+
+from team_pool import new_team_pool, run_for_teams
+
+
+class TestTeamPool(unittest.TestCase):
+
+    def test_teams_run_concurrently(self):
+        # GIVEN four teams whose cycles each take a while
+        def cycle(team):
+            sleep(0.2)
+            return team * 2
+
+        # WHEN they are run together
+        start = perf_counter()
+        results = run_for_teams([1, 2, 3, 4], cycle, max_workers=4)
+
+        # THEN they overlap and every team gets its result and time
+        self.assertLess(perf_counter() - start, 0.6)
+        self.assertEqual({team: result['result'] for team, result in results.items()}, {1: 2, 2: 4, 3: 6, 4: 8})
+        self.assertTrue(all(result['seconds'] >= 0.2 for result in results.values()))
+
+    def test_pool_is_bounded(self):
+        # GIVEN more teams than workers
+        running = []
+        most_running = []
+        lock = threading.Lock()
+
+        def cycle(team):
+            with lock:
+                running.append(team)
+                most_running.append(len(running))
+            sleep(0.05)
+            with lock:
+                running.remove(team)
+
+        # WHEN they are run
+        run_for_teams(range(6), cycle, max_workers=2)
+
+        # THEN no more than max_workers run at once
+        self.assertEqual(max(most_running), 2)
+
+    def test_shared_pool_keeps_its_threads(self):
+        # GIVEN a pool kept between cycles
+        threads = set()
+        pool = new_team_pool(max_workers=2)
+
+        def cycle(team):
+            threads.add(threading.current_thread())
+            sleep(0.01)
+
+        # WHEN several cycles run on it
+        try:
+            for x in range(3):
+                run_for_teams(range(4), cycle, pool=pool)
+        finally:
+            pool.shutdown()
+
+        # THEN every cycle ran on the same threads (so their google clients are only built once)
+        self.assertLessEqual(len(threads), 2)
+
+    def test_failures_are_isolated(self):
+        # GIVEN one team that raises and one that exits
+        def cycle(team):
+            if team == "bad":
+                raise ValueError("broken sheet")
+            if team == "exit":
+                sys.exit(-1)
+            return "done"
+
+        # WHEN they run with a healthy team
+        results = run_for_teams(["bad", "exit", "good"], cycle)
+
+        # THEN the healthy team still finishes
+        self.assertEqual(results["good"]['result'], "done")
+        self.assertIsNone(results["good"]['error'])
+        self.assertIsInstance(results["bad"]['error'], ValueError)
+        self.assertIsInstance(results["exit"]['error'], SystemExit)
+
+
+if __name__ == '__main__':
+    unittest.main()
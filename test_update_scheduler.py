@@ -0,0 +1,111 @@
+import sys
+
+sys.path.insert(0, './mocks')
+
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from update_scheduler import UpdateScheduler, POST_GAME_INTERVAL, MIN_IDLE_INTERVAL, MAX_IDLE_INTERVAL, FAILED_CYCLE_INTERVAL
+
+
+class FakeSchedule():
+    """stands in for ScheduleCache with a fixed list of game times"""
+
+    def __init__(self, game_times):
+        self.game_times = game_times
+
+    def get_game_times(self, day):
+        return self.game_times
+
+
+def _utc(day, hour, minute=0):
+    return datetime(2018, 10, day, hour, minute, tzinfo=timezone.utc)
+
+
+class TestUpdateScheduler(unittest.TestCase):
+
+    # setup and teardown methods
+    # these get ran before EVERY test method below
+    def setUp(self):
+        # games on the 5th, 6th and 10th at midnight UTC
+        self.scheduler = UpdateScheduler(FakeSchedule([_utc(5, 0), _utc(6, 0), _utc(10, 0)]))
+
+    def test_post_game_window(self):
+        # GIVEN it is an hour after the game on the 6th ended
+        now = _utc(6, 3, 30)
+
+        # WHEN we ask when to wake up
+        sleep_time, reason = self.scheduler.next_wakeup(now)
+
+        # THEN we poll quickly
+        self.assertEqual(sleep_time, POST_GAME_INTERVAL)
+        self.assertIn("post-game", reason)
+
+    def test_idle_backoff(self):
+        # GIVEN the day before a game
+        now = _utc(5, 8)
+
+        # WHEN cycles keep finding nothing to do
+        waits = []
+        for x in range(6):
+            self.scheduler.record_cycle(False)
+            waits.append(self.scheduler.next_wakeup(now)[0])
+
+        # THEN the wait doubles up to the max
+        self.assertEqual(waits, [MIN_IDLE_INTERVAL * 2, MIN_IDLE_INTERVAL * 4, MIN_IDLE_INTERVAL * 8,
+                                 MIN_IDLE_INTERVAL * 16, MAX_IDLE_INTERVAL, MAX_IDLE_INTERVAL])
+
+        # WHEN a cycle does something
+        self.scheduler.record_cycle(True)
+
+        # THEN we go back to the shortest wait
+        self.assertEqual(self.scheduler.next_wakeup(now)[0], MIN_IDLE_INTERVAL)
+
+    def test_idle_wait_stops_at_next_game(self):
+        # GIVEN a long idle backoff an hour before the game ends
+        for x in range(10):
+            self.scheduler.record_cycle(False)
+        now = _utc(5, 1, 30)
+
+        # WHEN we ask when to wake up
+        sleep_time, reason = self.scheduler.next_wakeup(now)
+
+        # THEN we wake up when the post-game window starts
+        self.assertEqual(sleep_time, 60 * 60)
+
+    def test_off_day(self):
+        # GIVEN the day after a game with the next one days away
+        now = _utc(6, 12)
+
+        # WHEN we ask when to wake up
+        sleep_time, reason = self.scheduler.next_wakeup(now)
+
+        # THEN we sleep until the next game is over
+        self.assertEqual(now + timedelta(seconds=sleep_time), _utc(10, 2, 30))
+        self.assertIn("off day", reason)
+
+    def test_failed_cycle_retried_soon(self):
+        # GIVEN an off day with a long backoff built up
+        for x in range(3):
+            self.scheduler.record_cycle(False)
+        now = _utc(6, 12)
+
+        # WHEN a cycle fails
+        self.scheduler.record_cycle(False, failed=True)
+
+        # THEN it is retried soon and the backoff carries on once a cycle gets through
+        self.assertEqual(self.scheduler.next_wakeup(now)[0], FAILED_CYCLE_INTERVAL)
+        self.scheduler.record_cycle(False)
+        self.assertIn("off day", self.scheduler.next_wakeup(now)[1])
+        self.assertEqual(self.scheduler.idle_interval, MIN_IDLE_INTERVAL * 16)
+
+    def test_no_schedule(self):
+        # GIVEN we couldn't load the schedule
+        scheduler = UpdateScheduler(FakeSchedule([]))
+
+        # THEN we fall back to the idle backoff
+        self.assertEqual(scheduler.next_wakeup(_utc(6, 12))[0], MIN_IDLE_INTERVAL)
+
+
+if __name__ == '__main__':
+    unittest.main()
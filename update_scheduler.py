@@ -0,0 +1,93 @@
+import logging
+from datetime import datetime, timedelta, timezone
+
+# a game is usually over about this long after the scheduled puck drop
+GAME_LENGTH = timedelta(hours=2, minutes=30)
+# after a game we poll quickly for this long while the answer key and responses come in
+POST_GAME_WINDOW = timedelta(hours=4)
+POST_GAME_INTERVAL = 5 * 60
+# when there is nothing to do the wait doubles from the min up to the max
+MIN_IDLE_INTERVAL = 10 * 60
+MAX_IDLE_INTERVAL = 4 * 60 * 60
+# no game ending within this long means it's an off day and we sleep until the next one
+OFF_DAY_HORIZON = timedelta(hours=24)
+# a cycle that failed (eg. google throttled us) is tried again after this long
+FAILED_CYCLE_INTERVAL = 5 * 60
+# used when there are no games in the schedule at all, like the middle of the summer
+NO_GAMES_INTERVAL = 24 * 60 * 60
+
+log = logging.getLogger("update_scheduler")
+
+
+class UpdateScheduler():
+    """Works out how long gwg_leader_updater should sleep between cycles from the team's
+    game times instead of a fixed interval.
+
+    Right after a game (the post-game window) we poll every few minutes. Outside of it the wait
+    backs off exponentially while cycles find nothing to do, and on off days we sleep until the
+    next game's post-game window opens.
+    """
+
+    schedule = None
+    idle_interval = None
+    failed = False
+
+    def __init__(self, schedule, game_length=GAME_LENGTH, post_game_window=POST_GAME_WINDOW,
+                 post_game_interval=POST_GAME_INTERVAL, min_idle=MIN_IDLE_INTERVAL, max_idle=MAX_IDLE_INTERVAL):
+        self.schedule = schedule
+        self.game_length = game_length
+        self.post_game_window = post_game_window
+        self.post_game_interval = post_game_interval
+        self.min_idle = min_idle
+        self.max_idle = max_idle
+        self.idle_interval = min_idle
+
+    def record_cycle(self, work_done, failed=False):
+        """resets the idle backoff if the last cycle did something, otherwise doubles it. A failed
+        cycle leaves the backoff alone and is retried after FAILED_CYCLE_INTERVAL
+        """
+        self.failed = failed
+        if failed:
+            return
+        if work_done:
+            self.idle_interval = self.min_idle
+        else:
+            self.idle_interval = min(self.idle_interval * 2, self.max_idle)
+
+    def _get_game_windows(self, now):
+        """returns a (window start, window end, game start) tuple for every game we know about"""
+        try:
+            game_times = self.schedule.get_game_times(now)
+        except Exception as e:
+            log.error("Unable to get the game schedule: %s" % e)
+            game_times = []
+
+        return [(start + self.game_length, start + self.game_length + self.post_game_window, start)
+                for start in game_times]
+
+    def next_wakeup(self, now=None):
+        """returns how many seconds to sleep before the next cycle and why"""
+        if self.failed:
+            return FAILED_CYCLE_INTERVAL, "retrying the cycle that failed"
+
+        now = now or datetime.now(timezone.utc)
+        windows = self._get_game_windows(now)
+
+        for window_start, window_end, start in windows:
+            if window_start <= now < window_end:
+                return self.post_game_interval, "post-game window for the game that started %s" % start
+
+        upcoming = [window for window in windows if window[0] > now]
+        if not windows:
+            return self.idle_interval, "no game schedule available, idle backoff"
+        if not upcoming:
+            return NO_GAMES_INTERVAL, "no upcoming games in the schedule"
+
+        window_start, window_end, start = upcoming[0]
+        until_window = int((window_start - now).total_seconds())
+
+        if window_start - now > OFF_DAY_HORIZON:
+            return until_window, "off day, sleeping until the game that starts %s is over" % start
+        if until_window <= self.idle_interval:
+            return until_window, "waiting for the game that starts %s to end" % start
+        return self.idle_interval, "idle backoff until the game that starts %s" % start